@@ -17,6 +17,7 @@ from app.schemas.classification import (
 )
 from app.api.endpoints.user import user_vector_stores
 from app.core.redis import get_redis_client
+from app.core.circuit_breaker import get_circuit_breaker_metrics
 import json
 import random
 
@@ -108,6 +109,15 @@ async def stream_classification_progress(session_id: str, LLM: str):
         headers={"Content-Type": "text/event-stream; charset=utf-8"}
     )
 
+# LLM 제공자별 서킷 브레이커 상태 및 상태 전환 기록 반환
+@admin_router.get("/llm/circuit_breakers", summary="LLM 서킷 브레이커 상태 조회", description="LLM 제공자별 서킷 상태(closed, open, half_open), 연속 실패 수, 거부한 호출 수, 상태 전환 횟수와 최근 전환 기록을 반환합니다.")
+def get_llm_circuit_breakers():
+    try:
+        return get_circuit_breaker_metrics()
+    except Exception as e:
+        logger.error(f"서킷 브레이커 상태 조회 실패: {e}")
+        raise HTTPException(status_code=500, detail="서킷 브레이커 상태를 조회할 수 없습니다.")
+
 # 샘플링 결과 json으로 반환
 @admin_router.get(
     "/{session_id}/classification/sampling",
@@ -5,11 +5,15 @@ import logging
 import os
 import pickle
 import random
+from typing import Optional
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, logger, status
 from fastapi.responses import FileResponse, StreamingResponse
 import pandas as pd
 from requests import Session
-from app.coordinator.tasks import start_llm_classification_task
+from celery import chain, group
+from app.coordinator.tasks import embed_patent_file_task, start_classification_task, start_llm_classification_task
+from app.core.index_profile import get_index_profile
+from app.core.vectorstore import vectorstore_cache
 from app.core.redis import get_redis, get_redis_client, get_redis_async_pool
 from app.core.sse import format_sse
 from app.db.database import get_db
@@ -18,7 +22,7 @@ from app.schemas.conversation import ConversationResponse
 from app.schemas.message import Message
 from app.services.admin_classification import calculate_sample_size
 from app.services.celery_classification import process_patent_classification, process_patent_classification_evaluation
-from app.services.classification import create_faiss_database, process_standards_for_vectordb
+from app.services.classification import save_faiss_database, process_standards_for_vectordb
 from app.core.celery import celery_app
 from celery.result import AsyncResult
 
@@ -31,9 +35,8 @@ RESULT_DIR = "./classified_excels"
 os.makedirs(RESULT_DIR, exist_ok=True)
 
 @celery_router.post("/{session_id}/standard/save", status_code=status.HTTP_201_CREATED, summary="분류 체계 벡터 db에 저장", description="선택된 분류 체계를 Redis 및 FAISS에 저장")
-async def save_standard(session_id: str, standard: ConversationResponse, db: Session = Depends(get_db)):
+async def save_standard(session_id: str, standard: ConversationResponse, db: Session = Depends(get_db), index_profile: Optional[str] = None):
     standards = standard.standards
-    redis = get_redis_client()
     if not standards:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -43,23 +46,21 @@ async def save_standard(session_id: str, standard: ConversationResponse, db: Ses
     # 벡터 DB에 저장할 문서 준비
     documents = process_standards_for_vectordb(standards)
 
-    # FAISS 벡터 DB 생성
-    vectordb = create_faiss_database(documents, session_id)
-
-    # 로컬 경로에 저장 (세션별 디렉터리)
-    save_dir = f"./vectorstores/{session_id}"
-    
-    # 디렉토리가 존재하지 않으면 생성
-    import os
-    os.makedirs(save_dir, exist_ok=True)
-    
-    # 벡터 DB 저장
-    vectordb.save_local(save_dir)
-
-    # Redis에 경로 저장
-    vector_key=f"vectorstore:{session_id}:path"
-    redis.set(vector_key, f"./vectorstores/{session_id}")
-    redis.expire(vector_key, 86400)
+    # 인덱스 프로파일 확인 (지정하지 않으면 이전 프로파일 또는 기본 프로파일 사용)
+    if index_profile is not None:
+        try:
+            get_index_profile(index_profile, len(documents))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+    # FAISS 벡터 DB 생성 또는 변경분 갱신 후 저장
+    save_faiss_database(documents, session_id, index_profile)
+
+    # 이 프로세스에 캐시된 이전 벡터 저장소 무효화 (워커는 인덱스 버전으로 감지)
+    vectorstore_cache.invalidate(session_id)
     return True
 
 @celery_router.post("/{session_id}/upload", status_code=status.HTTP_202_ACCEPTED, response_model = Message, summary="특허 데이터 파일 업로드", description="분류 하고 싶은 특허 데이터 파일을 업로드합니다.")
@@ -97,8 +98,11 @@ async def upload_and_start_classification(
         os.makedirs("./temp_data", exist_ok=True)
         with open(f"./temp_data/{session_id}.pkl", "wb") as f:pickle.dump(df, f)
     
-        # celery 실행
-        process_patent_classification(session_id, LLM, df, redis)
+        # celery 실행 (파일 전체 일괄 임베딩 후 분류 시작)
+        chain(
+            embed_patent_file_task.si(session_id),
+            start_classification_task.si(session_id, LLM)
+        ).delay()
 
         message = Message(
             status="processing",
@@ -179,9 +183,11 @@ async def upload_and_start_classification_and_evaluation(
         os.makedirs("./temp_data", exist_ok=True)
         with open(f"./temp_data/{session_id}.pkl", "wb") as f:pickle.dump(df, f)
     
-        # celery 실행        
-        for LLM in ["gpt", "claude", "gemini", "grok"]:
-            start_llm_classification_task.delay(session_id, LLM)
+        # celery 실행 (파일 전체 일괄 임베딩 후 LLM별 분류 시작)
+        chain(
+            embed_patent_file_task.si(session_id),
+            group(start_llm_classification_task.si(session_id, LLM) for LLM in ["gpt", "claude", "gemini", "grok"])
+        ).delay()
             
         message = Message(
             status="processing",
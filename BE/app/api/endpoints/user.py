@@ -5,7 +5,7 @@ import logging
 import os
 import pickle
 import re
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from fastapi.responses import FileResponse, StreamingResponse
 import pandas as pd
@@ -14,6 +14,8 @@ from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from app.core import redis
+from app.core.index_profile import get_index_profile
+from app.core.vectorstore import vectorstore_cache
 from app.core.redis import get_redis, get_redis_async_pool, get_redis_client
 from app.core.sse import format_sse, progress_event_generator
 from app.crud.crud_best_llm import get_best_llm, update_best_llm
@@ -23,8 +25,10 @@ from app.schemas.conversation import ConversationResponse
 from app.db.database import get_db
 from app.core.llm import gpt, claude, gemini, grok
 from app.schemas.message import Message
-from app.services.classification import create_faiss_database, process_patent_classification, process_standards_for_vectordb
+from app.services.classification import save_faiss_database, process_patent_classification, process_standards_for_vectordb
 from app.services.celery_classification import process_patent_classification
+from celery import chain
+from app.coordinator.tasks import embed_patent_file_task, start_classification_task
 load_dotenv()
 
 # 로그
@@ -43,10 +47,9 @@ user_vector_stores: Dict[str, FAISS] = {}
 session_progress_queues: Dict[str, asyncio.Queue] = {}
     
 @user_router.post("/{session_id}/standard/save", status_code=status.HTTP_201_CREATED, summary="분류 체계 벡터 db에 저장", description="선택된 분류 체계를 Redis 및 FAISS에 저장")
-async def save_standard(session_id: str, standard: ConversationResponse, db:Session = Depends(get_db)):
+async def save_standard(session_id: str, standard: ConversationResponse, db:Session = Depends(get_db), index_profile: Optional[str] = None):
     
     standards = standard.standards
-    redis = get_redis_client()
 
     if not standards:
         raise HTTPException(
@@ -57,26 +60,24 @@ async def save_standard(session_id: str, standard: ConversationResponse, db:Sess
     # 벡터 DB에 저장할 문서 준비
     documents = process_standards_for_vectordb(standards)
     
-    # FAISS 벡터 DB 생성 및 메모리에 저장
-    vectordb = create_faiss_database(documents, session_id)
-    
-    # 로컬 경로에 저장 (세션별 디렉터리)
-    save_dir = f"./vectorstores/{session_id}"
-    
-    # 디렉토리가 존재하지 않으면 생성
-    import os
-    os.makedirs(save_dir, exist_ok=True)
+    # 인덱스 프로파일 확인 (지정하지 않으면 이전 프로파일 또는 기본 프로파일 사용)
+    if index_profile is not None:
+        try:
+            get_index_profile(index_profile, len(documents))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+    # FAISS 벡터 DB 생성 또는 변경분 갱신 후 저장
+    vectordb = save_faiss_database(documents, session_id, index_profile)
 
     # 전역 딕셔너리에 저장
     user_vector_stores[session_id] = vectordb
-    
-    # 벡터 DB 저장
-    vectordb.save_local(save_dir)
 
-    # Redis에 경로 저장
-    vector_key=f"vectorstore:{session_id}:path"
-    redis.set(vector_key, f"./vectorstores/{session_id}")
-    redis.expire(vector_key, 86400)
+    # 이 프로세스에 캐시된 이전 벡터 저장소 무효화 (워커는 인덱스 버전으로 감지)
+    vectorstore_cache.invalidate(session_id)
     return True
 
 # 1. 파일 업로드 엔드포인트 (작업 시작만 담당), 202 반환 -> 분류 작업을 background task로 수행
@@ -194,8 +195,11 @@ async def upload_and_start_classification(
         os.makedirs("./temp_data", exist_ok=True)
         with open(f"./temp_data/{session_id}.pkl", "wb") as f:pickle.dump(df, f)
     
-        # celery 실행
-        process_patent_classification(session_id, LLM, df, redis)
+        # celery 실행 (파일 전체 일괄 임베딩 후 분류 시작)
+        chain(
+            embed_patent_file_task.si(session_id),
+            start_classification_task.si(session_id, LLM)
+        ).delay()
 
         message = Message(
             status="processing",
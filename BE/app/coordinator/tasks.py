@@ -4,11 +4,40 @@ import pickle
 import os
 from app.core.celery import celery_app
 from app.core.redis import get_redis_client
-from app.services.celery_classification import process_patent_classification_evaluation
+from app.services.celery_classification import process_patent_classification, process_patent_classification_evaluation
+from app.services.patent_embedding import embed_patent_dataframe
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@celery_app.task
+def embed_patent_file_task(session_id):
+    """업로드된 특허 파일 전체를 배치로 미리 임베딩"""
+
+    # 임시 저장된 데이터프레임 로드
+    with open(f"./temp_data/{session_id}.pkl", "rb") as f:
+        df = pickle.load(f)
+
+    # 실패해도 분류는 진행 (각 태스크가 특허별로 임베딩)
+    try:
+        embed_patent_dataframe(session_id, df)
+    except Exception as e:
+        logger.error(f"[{session_id}] 특허 일괄 임베딩 중 오류 발생: {e}")
+
+    return {"status": "embedded", "session_id": session_id}
+
+@celery_app.task
+def start_classification_task(session_id, LLM):
+    """사용자 모드 특허 분류 작업 시작"""
+
+    # 임시 저장된 데이터프레임 로드
+    with open(f"./temp_data/{session_id}.pkl", "rb") as f:
+        df = pickle.load(f)
+
+    process_patent_classification(session_id, LLM, df, get_redis_client())
+
+    return {"status": "processing", "LLM": LLM, "session_id": session_id}
+
 @celery_app.task
 def start_llm_classification_task(session_id, LLM):
     """단일 LLM에 대한 특허 분류 평가 작업 시작"""
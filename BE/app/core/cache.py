@@ -0,0 +1,63 @@
+# Redis 기반 크기 제한 LRU 캐시
+import time
+from typing import Dict, List, Optional
+from app.core.redis import get_redis_client
+
+
+class RedisLRUCache:
+    """
+    네임스페이스 단위로 값을 Redis에 저장하고, 최근 사용 시각을 sorted set으로 관리하여
+    최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 제거합니다.
+    """
+
+    def __init__(self, namespace: str, max_entries: int, ttl: Optional[int] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lru_key = f"{namespace}:lru"
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        redis = get_redis_client()
+        values = redis.mget([self._key(key) for key in keys])
+
+        # 조회된 항목의 사용 시각 갱신
+        now = time.time()
+        touched = {key: now for key, value in zip(keys, values) if value is not None}
+        if touched:
+            redis.zadd(self.lru_key, touched)
+        return values
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key])[0]
+
+    def set_many(self, mapping: Dict[str, str]) -> None:
+        if not mapping:
+            return
+        redis = get_redis_client()
+        now = time.time()
+        pipe = redis.pipeline()
+        for key, value in mapping.items():
+            pipe.set(self._key(key), value, ex=self.ttl)
+        pipe.zadd(self.lru_key, {key: now for key in mapping})
+        pipe.execute()
+        self._trim()
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    def _trim(self) -> None:
+        redis = get_redis_client()
+        overflow = redis.zcard(self.lru_key) - self.max_entries
+        if overflow <= 0:
+            return
+        stale = redis.zrange(self.lru_key, 0, overflow - 1)
+        if stale:
+            pipe = redis.pipeline()
+            pipe.delete(*[self._key(key) for key in stale])
+            pipe.zrem(self.lru_key, *stale)
+            pipe.execute()
@@ -0,0 +1,289 @@
+# LLM 제공자별 서킷 브레이커 (모든 워커가 Redis로 상태 공유)
+#
+# 제공자 장애(연속된 타임아웃/5xx/연결 에러) 중에는 태스크마다 호출과 재시도를 반복하느라 워커가 오래 묶이므로,
+# 연속 실패가 CIRCUIT_BREAKER_FAILURE_THRESHOLD번이 되면 서킷을 열고 일정 시간 호출하지 않고 바로 실패시킵니다. (CircuitOpenError)
+# 열린 시간이 지나면 반 열림(half_open) 상태에서 한 번에 하나의 호출만 시험으로 보내고, 성공하면 닫고 실패하면 열린 시간을 두 배로 늘려 다시 엽니다.
+import asyncio
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from app.core.concurrency import classify_failure, get_llm_provider
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 서킷 상태를 관리하는 제공자
+PROVIDERS = ("openai", "anthropic", "google", "xai")
+
+# 시험 호출이 끝나지 않은 채 워커가 종료된 경우 다음 시험 호출을 허용하는 시간(초)
+PROBE_TTL = 120
+
+# 상태, 전환 기록 보관 시간(초)
+STATE_TTL = 7 * 86400
+
+# 보관할 최근 상태 전환 수
+EVENT_SAMPLES = 100
+
+EVENTS_KEY = "circuit:events"
+
+# 상태 전환 (전환 횟수 집계, 최근 전환 기록)
+TRANSITION_LUA = """
+local function transition(from, to, now)
+    redis.call('HSET', KEYS[1], 'state', to, 'changed_at', now)
+    redis.call('HINCRBY', KEYS[2], from .. '->' .. to, 1)
+    redis.call('LPUSH', KEYS[3], now .. '|' .. ARGV[1] .. '|' .. from .. '|' .. to)
+    redis.call('LTRIM', KEYS[3], 0, tonumber(ARGV[2]) - 1)
+end
+"""
+
+# 호출 허용 여부를 확인합니다. 반환값: {결과, 기다려야 하는 시간(초)}
+# closed: 허용, probe: 시험 호출로 허용, open: 거부
+ALLOW_SCRIPT = TRANSITION_LUA + """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'state', 'open_until', 'probe_until')
+local current = state[1] or 'closed'
+if current == 'closed' then
+    return {'closed', '0'}
+end
+if current == 'open' then
+    local open_until = tonumber(state[2]) or 0
+    if now < open_until then
+        redis.call('HINCRBY', KEYS[2], 'rejected', 1)
+        return {'open', tostring(open_until - now)}
+    end
+    transition('open', 'half_open', now)
+end
+local probe_until = tonumber(state[3]) or 0
+if current == 'half_open' and probe_until > now then
+    redis.call('HINCRBY', KEYS[2], 'rejected', 1)
+    return {'open', tostring(probe_until - now)}
+end
+redis.call('HSET', KEYS[1], 'probe_until', now + tonumber(ARGV[3]))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return {'probe', '0'}
+"""
+
+# 호출 결과를 반영하고 현재 상태를 반환합니다.
+# 닫힘: 성공하면 연속 실패 수 초기화, 실패가 기준 이상이면 열기
+# 반 열림: 성공하면 닫기, 시험 호출이 실패하면 열린 시간을 두 배로 늘려 다시 열기
+RECORD_SCRIPT = TRANSITION_LUA + """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local outcome = ARGV[3]
+local is_probe = ARGV[4] == '1'
+local threshold = tonumber(ARGV[5])
+local open_seconds = tonumber(ARGV[6])
+local max_open_seconds = tonumber(ARGV[7])
+local state = redis.call('HMGET', KEYS[1], 'state', 'open_seconds')
+local current = state[1] or 'closed'
+local last_open_seconds = tonumber(state[2]) or open_seconds
+if outcome == 'success' then
+    if current == 'half_open' then
+        transition('half_open', 'closed', now)
+        redis.call('HDEL', KEYS[1], 'probe_until', 'open_until')
+        redis.call('HSET', KEYS[1], 'failures', 0, 'open_seconds', open_seconds)
+        current = 'closed'
+    elseif current == 'closed' then
+        redis.call('HSET', KEYS[1], 'failures', 0)
+    end
+elseif current == 'half_open' and is_probe then
+    local backoff = math.min(max_open_seconds, last_open_seconds * 2)
+    transition('half_open', 'open', now)
+    redis.call('HDEL', KEYS[1], 'probe_until')
+    redis.call('HSET', KEYS[1], 'open_until', now + backoff, 'open_seconds', backoff)
+    current = 'open'
+elseif current == 'closed' then
+    local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+    if failures >= threshold then
+        transition('closed', 'open', now)
+        redis.call('HSET', KEYS[1], 'open_until', now + open_seconds, 'open_seconds', open_seconds)
+        current = 'open'
+    end
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[8]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[8]))
+redis.call('EXPIRE', KEYS[3], tonumber(ARGV[8]))
+return current
+"""
+
+
+class CircuitOpenError(Exception):
+    """
+    서킷이 열려 있어 LLM을 호출하지 않고 바로 실패한 경우의 에러입니다.
+    """
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} 서킷이 열려 있습니다. ({retry_after:.0f}초 후 다시 시도)")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def counts_as_failure(e: Exception) -> bool:
+    """
+    서킷 브레이커 실패로 집계할 에러인지 확인합니다. (타임아웃, 5xx, 연결 에러만 집계하고 잘못된 요청이나 응답 파싱 에러는 제외)
+    429는 제공자 장애가 아니라 호출량 초과이고 태스크에서 백오프 후 재시도하므로 집계하지 않습니다.
+    (집계하면 서킷이 열려 재시도했으면 분류될 특허가 바로 미분류로 끝남)
+    """
+    if isinstance(e, CircuitOpenError):
+        return False
+    failure = classify_failure(e)
+    if failure == "throttled":
+        return False
+    if failure == "timeout":
+        return True
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return "Connection" in type(e).__name__
+
+
+class CircuitBreaker:
+    """
+    제공자별 서킷 상태(closed, open, half_open)를 Redis에 두고 모든 워커가 공유합니다.
+    Redis에 접근할 수 없으면 서킷을 닫힌 것으로 보고 호출합니다.
+    """
+
+    def __init__(self, provider: str, failure_threshold: int, open_seconds: float, max_open_seconds: float):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state_key = f"circuit:{provider}:state"
+        self.metrics_key = f"circuit:{provider}:metrics"
+
+    def allow(self) -> bool:
+        """
+        호출을 허용하면 시험 호출인지 여부를 반환하고, 서킷이 열려 있으면 CircuitOpenError를 발생시킵니다.
+        """
+        try:
+            redis = get_redis_client()
+            result, wait = redis.eval(
+                ALLOW_SCRIPT, 3, self.state_key, self.metrics_key, EVENTS_KEY,
+                self.provider, EVENT_SAMPLES, PROBE_TTL, STATE_TTL,
+            )
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 서킷 상태 확인 실패, 호출합니다: {e}")
+            return False
+        if result == "open":
+            raise CircuitOpenError(self.provider, float(wait))
+        if result == "probe":
+            logger.info(f"[{self.provider}] 서킷 반 열림, 시험 호출")
+        return result == "probe"
+
+    def record(self, success: bool, probe: bool) -> None:
+        try:
+            redis = get_redis_client()
+            state = redis.eval(
+                RECORD_SCRIPT, 3, self.state_key, self.metrics_key, EVENTS_KEY,
+                self.provider, EVENT_SAMPLES, "success" if success else "failure", int(probe),
+                self.failure_threshold, self.open_seconds, self.max_open_seconds, STATE_TTL,
+            )
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 서킷 상태 반영 실패: {e}")
+            return
+        if probe:
+            logger.info(f"[{self.provider}] 시험 호출 {'성공' if success else '실패'}, 서킷 상태: {state}")
+        elif not success and state == "open":
+            logger.warning(f"[{self.provider}] 연속 실패로 서킷 열림")
+
+    @contextmanager
+    def guard(self):
+        probe = self.allow()
+        try:
+            yield
+        except Exception as e:
+            if counts_as_failure(e):
+                self.record(False, probe)
+            elif probe:
+                # 장애와 관계없는 에러는 성공으로 보고 서킷을 닫음 (응답은 받았으므로)
+                self.record(True, probe)
+            raise
+        self.record(True, probe)
+
+    @asynccontextmanager
+    async def aguard(self):
+        # guard의 비동기 버전 (Redis 호출이 이벤트 루프를 막지 않도록 스레드에서 실행)
+        probe = await asyncio.to_thread(self.allow)
+        try:
+            yield
+        except Exception as e:
+            if counts_as_failure(e):
+                await asyncio.to_thread(self.record, False, probe)
+            elif probe:
+                await asyncio.to_thread(self.record, True, probe)
+            raise
+        await asyncio.to_thread(self.record, True, probe)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        현재 상태, 연속 실패 수, 열린 상태 남은 시간, 거부한 호출 수, 상태별 전환 횟수를 반환합니다.
+        """
+        redis = get_redis_client()
+        state = redis.hgetall(self.state_key)
+        metrics = redis.hgetall(self.metrics_key)
+        open_until = float(state.get("open_until") or 0)
+        return {
+            "state": state.get("state", "closed"),
+            "failures": int(state.get("failures") or 0),
+            "open_for": round(max(0.0, open_until - time.time()), 1) if state.get("state") == "open" else 0.0,
+            "rejected": int(metrics.pop("rejected", 0)),
+            "transitions": {transition: int(count) for transition, count in metrics.items()},
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _breaker(provider: str) -> CircuitBreaker:
+    if provider not in breakers:
+        breakers[provider] = CircuitBreaker(
+            provider,
+            settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+            settings.CIRCUIT_BREAKER_MAX_OPEN_SECONDS,
+        )
+    return breakers[provider]
+
+
+def get_circuit_breaker(provider: Optional[str]) -> Optional[CircuitBreaker]:
+    """
+    제공자의 서킷 브레이커를 반환합니다. (비활성화되었거나 알 수 없는 제공자면 None)
+    """
+    if not settings.CIRCUIT_BREAKER_ENABLED or provider is None:
+        return None
+    return _breaker(provider)
+
+
+def circuit_guard(llm: Any):
+    """
+    LLM 호출을 감싸는 서킷 브레이커 (with 문, 비활성화되었으면 아무것도 하지 않음)
+    동시 호출 슬롯보다 먼저 확인해야 열린 서킷의 호출이 슬롯을 기다리지 않습니다.
+    """
+    breaker = get_circuit_breaker(get_llm_provider(llm))
+    return breaker.guard() if breaker else nullcontext()
+
+
+def acircuit_guard(llm: Any):
+    """
+    circuit_guard의 비동기 버전 (async with 문)
+    """
+    breaker = get_circuit_breaker(get_llm_provider(llm))
+    return breaker.aguard() if breaker else nullcontext()
+
+
+def get_circuit_breaker_metrics() -> Dict[str, Any]:
+    """
+    제공자별 서킷 상태와 최근 상태 전환 기록을 반환합니다.
+    """
+    events: List[Dict[str, Any]] = []
+    for event in get_redis_client().lrange(EVENTS_KEY, 0, -1):
+        at, provider, from_state, to_state = event.split("|")
+        events.append({"provider": provider, "from": from_state, "to": to_state, "at": float(at)})
+    return {
+        "enabled": settings.CIRCUIT_BREAKER_ENABLED,
+        "providers": {provider: _breaker(provider).snapshot() for provider in PROVIDERS},
+        "events": events,
+    }
@@ -0,0 +1,402 @@
+# LLM 제공자별 적응형 동시 호출 수 제어 (AIMD, 모든 워커가 Redis로 공유)
+import asyncio
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+import logging
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, Mapping, Optional
+from langchain_anthropic import ChatAnthropic
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+from langchain_xai import ChatXAI
+from app.core.config import settings
+from app.core.mock_llm import MockChatModel
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 호출이 끝나지 않은 채 워커가 종료된 경우 슬롯을 회수하는 시간(초)
+LEASE_TTL = 600
+
+# 학습한 동시 호출 수 보관 시간(초)
+STATE_TTL = 86400
+
+# 한 번의 429/타임아웃 폭주에 여러 번 줄이지 않도록 감소 후 다음 감소까지 기다리는 시간(초)
+DECREASE_COOLDOWN = 5
+
+# 슬롯을 기다리는 최대 시간(초), 넘으면 제한 없이 호출
+ACQUIRE_TIMEOUT = 300
+
+# 슬롯이 가득 찼을 때 다시 확인하는 간격(초)
+POLL_INTERVAL = 0.2
+
+# 응답 헤더로 rate limit 정보를 받을 수 있는 제공자 (include_response_headers)
+HEADER_PROVIDERS = ("openai", "xai")
+
+# 만료된 슬롯을 정리하고, 일시 중지 중이 아니며 사용 중인 슬롯이 현재 한도보다 적으면 슬롯을 획득합니다.
+# 반환값: "0" 획득, 양수 일시 중지 남은 시간(초), "-1" 슬롯 부족
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local lease_ttl = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease_ttl)
+local state = redis.call('HMGET', KEYS[2], 'limit', 'paused_until')
+local limit = tonumber(state[1]) or tonumber(ARGV[2])
+local paused_until = tonumber(state[2]) or 0
+if paused_until > now then
+    return tostring(paused_until - now)
+end
+if redis.call('ZCARD', KEYS[1]) < math.max(1, math.floor(limit)) then
+    redis.call('ZADD', KEYS[1], now, ARGV[1])
+    redis.call('EXPIRE', KEYS[1], lease_ttl)
+    return '0'
+end
+return '-1'
+"""
+
+# 슬롯을 반환하고 호출 결과에 따라 한도를 조정합니다.
+# 성공이고 지연 시간이 목표 이하이면 한도 +1/한도 (한도만큼 성공하면 +1), 429/타임아웃이면 한도 x 감소 비율
+RELEASE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+redis.call('ZREM', KEYS[1], ARGV[1])
+local outcome = ARGV[2]
+local latency = tonumber(ARGV[3])
+local target = tonumber(ARGV[4])
+local minimum = tonumber(ARGV[5])
+local maximum = tonumber(ARGV[6])
+local factor = tonumber(ARGV[7])
+local cooldown = tonumber(ARGV[8])
+local state = redis.call('HMGET', KEYS[2], 'limit', 'last_decrease', 'hold_until')
+local limit = tonumber(state[1]) or tonumber(ARGV[9])
+local last_decrease = tonumber(state[2]) or 0
+local hold_until = tonumber(state[3]) or 0
+if outcome == 'throttled' or outcome == 'timeout' then
+    if now - last_decrease >= cooldown then
+        limit = math.max(minimum, limit * factor)
+        redis.call('HSET', KEYS[2], 'last_decrease', now)
+    end
+elseif outcome == 'ok' and latency <= target and hold_until <= now then
+    limit = math.min(maximum, limit + 1 / limit)
+end
+redis.call('HSET', KEYS[2], 'limit', limit)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[10]))
+return tostring(limit)
+"""
+
+# 응답 헤더 신호 반영 (pause: 새 호출 중지 시간, hold: 한도 증가 중지 시간)
+OBSERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local pause = tonumber(ARGV[1])
+local hold = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'paused_until', 'hold_until')
+if pause > 0 then
+    redis.call('HSET', KEYS[1], 'paused_until', math.max(tonumber(state[1]) or 0, now + pause))
+end
+if hold > 0 then
+    redis.call('HSET', KEYS[1], 'hold_until', math.max(tonumber(state[2]) or 0, now + hold))
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 'OK'
+"""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    rate limit 헤더의 시간 값을 초로 변환합니다. ("5", "0.5", "1s", "6m0s", "20ms" 형식, 그 외는 None)
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def _header(headers: Mapping[str, Any], *names: str) -> Optional[str]:
+    lowered = {str(key).lower(): value for key, value in headers.items()}
+    for name in names:
+        if name in lowered:
+            return lowered[name]
+    return None
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def response_headers(e: Exception) -> Mapping[str, Any]:
+    # OpenAI/Anthropic(httpx), Grok(requests) 에러 응답의 헤더
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    return headers if headers is not None else {}
+
+
+def classify_failure(e: Exception) -> str:
+    """
+    LLM 호출 에러를 분류합니다. (throttled: 429, timeout: 시간 초과, error: 그 외)
+    """
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "code", None)
+    if status == 429:
+        return "throttled"
+    name = type(e).__name__
+    if isinstance(e, TimeoutError) or "Timeout" in name or "DeadlineExceeded" in name:
+        return "timeout"
+    return "error"
+
+
+class AdaptiveConcurrencyController:
+    """
+    제공자별 동시 호출 수를 AIMD로 조정합니다. 지연 시간이 목표 이하인 성공 호출마다 한도를 조금씩 늘리고,
+    429나 타임아웃이 발생하면 한도를 비율로 줄입니다. Retry-After, 남은 요청/토큰 수 헤더가 있으면
+    새 호출을 잠시 멈추거나 한도 증가를 멈춥니다. 한도와 사용 중인 슬롯은 Redis에 두어 모든 워커가 공유하며,
+    Redis에 접근할 수 없으면 제한 없이 호출합니다.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        latency_target: float,
+        decrease_factor: float,
+    ):
+        self.provider = provider
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.leases_key = f"concurrency:{provider}:leases"
+        self.state_key = f"concurrency:{provider}:state"
+
+    def try_acquire(self, lease: str) -> float:
+        """
+        슬롯 획득을 한 번 시도하고 기다려야 하는 시간(초)을 반환합니다. (0이면 획득)
+        """
+        try:
+            redis = get_redis_client()
+            wait = float(redis.eval(ACQUIRE_SCRIPT, 2, self.leases_key, self.state_key, lease, self.initial, LEASE_TTL))
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 동시 호출 슬롯 확인 실패, 제한 없이 호출합니다: {e}")
+            return 0.0
+        return POLL_INTERVAL if wait < 0 else wait
+
+    def _next_wait(self, wait: float) -> float:
+        # 여러 워커가 동시에 다시 확인하지 않도록 약간의 지터 추가
+        return min(wait, 1.0) + random.uniform(0, POLL_INTERVAL)
+
+    def acquire(self) -> str:
+        lease = uuid.uuid4().hex
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        while True:
+            wait = self.try_acquire(lease)
+            if wait <= 0:
+                return lease
+            if time.monotonic() > deadline:
+                logger.warning(f"[{self.provider}] 동시 호출 슬롯 대기 시간 초과, 제한 없이 호출합니다.")
+                return lease
+            time.sleep(self._next_wait(wait))
+
+    async def aacquire(self) -> str:
+        lease = uuid.uuid4().hex
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        while True:
+            # Redis 호출이 이벤트 루프를 막지 않도록 스레드에서 실행
+            wait = await asyncio.to_thread(self.try_acquire, lease)
+            if wait <= 0:
+                return lease
+            if time.monotonic() > deadline:
+                logger.warning(f"[{self.provider}] 동시 호출 슬롯 대기 시간 초과, 제한 없이 호출합니다.")
+                return lease
+            await asyncio.sleep(self._next_wait(wait))
+
+    def release(self, lease: str, latency: float, outcome: str) -> None:
+        try:
+            redis = get_redis_client()
+            limit = float(redis.eval(
+                RELEASE_SCRIPT, 2, self.leases_key, self.state_key,
+                lease, outcome, latency, self.latency_target, self.minimum, self.maximum,
+                self.decrease_factor, DECREASE_COOLDOWN, self.initial, STATE_TTL,
+            ))
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 동시 호출 슬롯 반환 실패: {e}")
+            return
+        if outcome != "ok":
+            logger.info(f"[{self.provider}] LLM 호출 {outcome}, 동시 호출 한도: {limit:.1f}")
+
+    def observe_headers(self, headers: Mapping[str, Any]) -> None:
+        """
+        응답 헤더의 rate limit 정보를 반영합니다.
+        Retry-After가 있거나 남은 요청/토큰이 없으면 초기화 시각까지 새 호출을 멈추고,
+        남은 토큰이 현재 한도만큼의 요청에 부족하면 초기화 시각까지 한도를 늘리지 않습니다.
+        """
+        if not headers:
+            return
+        pause = parse_duration(_header(headers, "retry-after")) or 0.0
+        remaining_requests = _to_int(_header(headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"))
+        remaining_tokens = _to_int(_header(headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"))
+        reset_requests = parse_duration(_header(headers, "x-ratelimit-reset-requests")) or 1.0
+        reset_tokens = parse_duration(_header(headers, "x-ratelimit-reset-tokens")) or 1.0
+
+        hold = 0.0
+        if remaining_requests == 0:
+            pause = max(pause, reset_requests)
+        if remaining_tokens is not None:
+            if remaining_tokens <= 0:
+                pause = max(pause, reset_tokens)
+            elif remaining_tokens < settings.LLM_ESTIMATED_TOKENS_PER_REQUEST * self.snapshot().get("limit", self.initial):
+                hold = reset_tokens
+
+        if pause <= 0 and hold <= 0:
+            return
+        try:
+            redis = get_redis_client()
+            redis.eval(OBSERVE_SCRIPT, 1, self.state_key, pause, hold, STATE_TTL)
+        except Exception as e:
+            logger.warning(f"[{self.provider}] rate limit 헤더 반영 실패: {e}")
+            return
+        if pause > 0:
+            logger.info(f"[{self.provider}] rate limit 헤더로 {pause:.1f}초 동안 새 호출 중지")
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        현재 한도, 사용 중인 슬롯 수, 일시 중지 남은 시간을 반환합니다.
+        """
+        try:
+            redis = get_redis_client()
+            limit, paused_until = redis.hmget(self.state_key, "limit", "paused_until")
+            in_flight = redis.zcard(self.leases_key)
+        except Exception:
+            return {"limit": self.initial}
+        return {
+            "limit": float(limit) if limit else self.initial,
+            "in_flight": in_flight,
+            "paused_for": max(0.0, float(paused_until) - time.time()) if paused_until else 0.0,
+        }
+
+    @contextmanager
+    def slot(self):
+        lease = self.acquire()
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            yield
+        except Exception as e:
+            outcome = classify_failure(e)
+            self.observe_headers(response_headers(e))
+            raise
+        finally:
+            self.release(lease, time.monotonic() - start, outcome)
+
+    @asynccontextmanager
+    async def aslot(self):
+        lease = await self.aacquire()
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            yield
+        except Exception as e:
+            outcome = classify_failure(e)
+            await asyncio.to_thread(self.observe_headers, response_headers(e))
+            raise
+        finally:
+            await asyncio.to_thread(self.release, lease, time.monotonic() - start, outcome)
+
+
+class RateLimitHeaderCallback(BaseCallbackHandler):
+    """
+    성공한 응답의 rate limit 헤더(OpenAI, Grok)를 동시 호출 수 제어에 반영하는 콜백입니다.
+    """
+
+    def __init__(self, controller: AdaptiveConcurrencyController):
+        self.controller = controller
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                headers = (generation.generation_info or {}).get("headers")
+                if headers is None:
+                    headers = getattr(getattr(generation, "message", None), "response_metadata", {}).get("headers")
+                if headers:
+                    self.controller.observe_headers(headers)
+                    return
+
+
+controllers: Dict[str, AdaptiveConcurrencyController] = {}
+
+
+def get_concurrency_controller(provider: Optional[str]) -> Optional[AdaptiveConcurrencyController]:
+    """
+    제공자의 동시 호출 수 제어기를 반환합니다. (비활성화되었거나 알 수 없는 제공자면 None)
+    """
+    if not settings.ADAPTIVE_CONCURRENCY_ENABLED or provider is None:
+        return None
+    if provider not in controllers:
+        controllers[provider] = AdaptiveConcurrencyController(
+            provider,
+            settings.ADAPTIVE_CONCURRENCY_INITIAL,
+            settings.ADAPTIVE_CONCURRENCY_MIN,
+            settings.ADAPTIVE_CONCURRENCY_MAX,
+            settings.ADAPTIVE_CONCURRENCY_LATENCY_TARGET,
+            settings.ADAPTIVE_CONCURRENCY_DECREASE,
+        )
+    return controllers[provider]
+
+
+def get_llm_provider(llm: Any) -> Optional[str]:
+    # LLM 모델 -> 제공자 (rate limit, 동시 호출 수를 제공자 단위로 공유)
+    if isinstance(llm, ChatXAI):
+        return "xai"
+    if isinstance(llm, ChatOpenAI):
+        return "openai"
+    if isinstance(llm, ChatAnthropic):
+        return "anthropic"
+    if isinstance(llm, ChatGoogleGenerativeAI):
+        return "google"
+    if isinstance(llm, MockChatModel):
+        return llm.provider
+    return None
+
+
+def llm_slot(llm: Any):
+    """
+    LLM 호출을 감싸는 동시 호출 슬롯 (with 문, 제어하지 않으면 아무것도 하지 않음)
+    """
+    controller = get_concurrency_controller(get_llm_provider(llm))
+    return controller.slot() if controller else nullcontext()
+
+
+def allm_slot(llm: Any):
+    """
+    LLM 호출을 감싸는 동시 호출 슬롯 (async with 문, 제어하지 않으면 아무것도 하지 않음)
+    """
+    controller = get_concurrency_controller(get_llm_provider(llm))
+    return controller.aslot() if controller else nullcontext()
+
+
+def concurrency_options(provider: str) -> Dict[str, Any]:
+    """
+    LLM 모델 생성자에 전달할 응답 헤더 옵션 및 콜백을 반환합니다. (비활성화되었으면 빈 dict)
+    """
+    controller = get_concurrency_controller(provider)
+    if controller is None:
+        return {}
+    options: Dict[str, Any] = {"callbacks": [RateLimitHeaderCallback(controller)]}
+    if provider in HEADER_PROVIDERS:
+        options["include_response_headers"] = True
+    return options
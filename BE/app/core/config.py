@@ -17,7 +17,124 @@ class Settings(BaseSettings):
     CLAUDE_API_KEY: str = os.getenv("CLAUDE_API_KEY")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
     GROK3_API_KEY: str = os.getenv("GROK3_API_KEY")
-    
+
+    # 워커 프로세스 당 메모리에 유지할 벡터 저장소 개수
+    VECTORSTORE_CACHE_SIZE: int = int(os.getenv("VECTORSTORE_CACHE_SIZE", 8))
+
+    # 업로드 파일 일괄 임베딩 설정 (배치 크기, 동시 요청 수)
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+
+    # 분류 체계 임베딩 캐시 (최대 항목 수, 만료 시간(초))
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 20000))
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", 30 * 86400))
+
+    # 계층 검색 설정 (검색할 대분류 개수, 계층 검색을 사용할 최소 분류 벡터 수)
+    HIERARCHICAL_SEARCH_BRANCHES: int = int(os.getenv("HIERARCHICAL_SEARCH_BRANCHES", 3))
+    HIERARCHICAL_SEARCH_MIN_VECTORS: int = int(os.getenv("HIERARCHICAL_SEARCH_MIN_VECTORS", 2000))
+
+    # 분류 체계 인덱스 기본 프로파일 (flat, d1024, d512-f16, d256-f16, hnsw-d1024, ivfpq-d1024, auto)
+    INDEX_PROFILE: str = os.getenv("INDEX_PROFILE", "flat")
+
+    # 검색 결과가 명확한 특허는 LLM 호출 없이 분류 (사용자 모드, 관련도 점수 및 1/2순위 점수 차이 기준)
+    LLM_BYPASS_ENABLED: bool = os.getenv("LLM_BYPASS_ENABLED", "false").lower() == "true"
+    LLM_BYPASS_MIN_SCORE: float = float(os.getenv("LLM_BYPASS_MIN_SCORE", 0.7))
+    LLM_BYPASS_MIN_MARGIN: float = float(os.getenv("LLM_BYPASS_MIN_MARGIN", 0.05))
+
+    # 분류 전 중복 특허 묶기 (정규화한 텍스트 기준, 임베딩 코사인 유사도 기준은 0보다 클 때만 사용)
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+    DEDUP_SIMILARITY_THRESHOLD: float = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", 0))
+
+    # 작업 간 분류 결과 캐시 (최대 항목 수, 만료 시간(초))
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", 200000))
+    CLASSIFICATION_CACHE_TTL: int = int(os.getenv("CLASSIFICATION_CACHE_TTL", 30 * 86400))
+
+    # 하나의 프롬프트로 분류할 특허 수 (사용자 모드, 1이면 특허마다 LLM 호출)
+    CLASSIFICATION_BATCH_SIZE: int = int(os.getenv("CLASSIFICATION_BATCH_SIZE", 1))
+
+    # 하나의 Celery 태스크에서 처리할 특허 수 (1이면 특허마다 태스크, 태스크에는 작업 ID와 행 범위만 담고 특허 정보는 저장된 작업 입력에서 읽음)
+    CLASSIFICATION_CHUNK_SIZE: int = int(os.getenv("CLASSIFICATION_CHUNK_SIZE", 1))
+
+    # LLM 제공자별 분당 요청 수/토큰 수 한도 (0이면 제한하지 않음, 계정 한도에 맞게 설정)
+    OPENAI_RPM: int = int(os.getenv("OPENAI_RPM", 0))
+    OPENAI_TPM: int = int(os.getenv("OPENAI_TPM", 0))
+    CLAUDE_RPM: int = int(os.getenv("CLAUDE_RPM", 0))
+    CLAUDE_TPM: int = int(os.getenv("CLAUDE_TPM", 0))
+    GEMINI_RPM: int = int(os.getenv("GEMINI_RPM", 0))
+    GEMINI_TPM: int = int(os.getenv("GEMINI_TPM", 0))
+    GROK_RPM: int = int(os.getenv("GROK_RPM", 0))
+    GROK_TPM: int = int(os.getenv("GROK_TPM", 0))
+
+    # 한도 대비 실제 사용 비율 (한도 바로 아래에서 호출), 요청 당 예상 토큰 수 (응답 후 실제 사용량으로 조정)
+    RATE_LIMIT_HEADROOM: float = float(os.getenv("RATE_LIMIT_HEADROOM", 0.9))
+    LLM_ESTIMATED_TOKENS_PER_REQUEST: int = int(os.getenv("LLM_ESTIMATED_TOKENS_PER_REQUEST", 2000))
+
+    # 분류 태스크 실행 방식 (celery: Celery 태스크, async: 비동기 워커가 Redis 큐에서 가져와 실행)
+    CLASSIFICATION_WORKER: str = os.getenv("CLASSIFICATION_WORKER", "celery")
+
+    # 비동기 워커 동시 처리 수 (전체 특허 수, LLM 제공자별 동시 호출 수)
+    ASYNC_WORKER_CONCURRENCY: int = int(os.getenv("ASYNC_WORKER_CONCURRENCY", 256))
+    ASYNC_WORKER_PROVIDER_CONCURRENCY: int = int(os.getenv("ASYNC_WORKER_PROVIDER_CONCURRENCY", 64))
+
+    # LLM 제공자별 적응형 동시 호출 수 (AIMD, 초기/최소/최대 한도, 한도를 늘리는 지연 시간 기준(초), 429/타임아웃 시 감소 비율)
+    ADAPTIVE_CONCURRENCY_ENABLED: bool = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "false").lower() == "true"
+    ADAPTIVE_CONCURRENCY_INITIAL: float = float(os.getenv("ADAPTIVE_CONCURRENCY_INITIAL", 8))
+    ADAPTIVE_CONCURRENCY_MIN: float = float(os.getenv("ADAPTIVE_CONCURRENCY_MIN", 1))
+    ADAPTIVE_CONCURRENCY_MAX: float = float(os.getenv("ADAPTIVE_CONCURRENCY_MAX", 64))
+    ADAPTIVE_CONCURRENCY_LATENCY_TARGET: float = float(os.getenv("ADAPTIVE_CONCURRENCY_LATENCY_TARGET", 30))
+    ADAPTIVE_CONCURRENCY_DECREASE: float = float(os.getenv("ADAPTIVE_CONCURRENCY_DECREASE", 0.5))
+
+    # LLM 요청 헤징 (응답 시간이 백분위 기준을 넘으면 같은 요청을 한 번 더 보냄, 최소 표본 수, 최소 대기 시간(초))
+    HEDGING_ENABLED: bool = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+    HEDGE_LATENCY_PERCENTILE: float = float(os.getenv("HEDGE_LATENCY_PERCENTILE", 95))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+    HEDGE_MIN_DELAY: float = float(os.getenv("HEDGE_MIN_DELAY", 5))
+    # 헤징 요청을 보낼 LLM (사용자 모드, 비어 있으면 같은 LLM, 관리자 모드는 LLM 비교가 목적이므로 항상 같은 LLM)
+    HEDGE_FALLBACK_LLM: str = os.getenv("HEDGE_FALLBACK_LLM", "")
+
+    # 늦게 끝나는 특허 재전송 (사용자 모드 Celery 작업, 남은 특허 비율, 중간값 처리 시간 대비 배수, 최소 대기 시간(초), 확인 주기(초))
+    STRAGGLER_REDISPATCH_ENABLED: bool = os.getenv("STRAGGLER_REDISPATCH_ENABLED", "false").lower() == "true"
+    STRAGGLER_TAIL_RATIO: float = float(os.getenv("STRAGGLER_TAIL_RATIO", 0.02))
+    STRAGGLER_MEDIAN_FACTOR: float = float(os.getenv("STRAGGLER_MEDIAN_FACTOR", 3))
+    STRAGGLER_MIN_WAIT: float = float(os.getenv("STRAGGLER_MIN_WAIT", 30))
+    STRAGGLER_CHECK_INTERVAL: int = int(os.getenv("STRAGGLER_CHECK_INTERVAL", 10))
+
+    # 특허별 결과를 Redis에 바로 모으고 마지막 결과를 저장한 태스크가 완료 처리 실행 (사용자 모드 Celery 작업, chord 콜백에 결과 목록을 넘기지 않음)
+    INCREMENTAL_COLLECTION_ENABLED: bool = os.getenv("INCREMENTAL_COLLECTION_ENABLED", "false").lower() == "true"
+
+    # 분류 결과를 평가하는 LLM (관리자 모드), 하나의 평가 요청으로 평가할 특허 수 (1이면 특허마다 평가)
+    EVALUATOR_LLM: str = os.getenv("EVALUATOR_LLM", "CLAUDE")
+    EVALUATION_BATCH_SIZE: int = int(os.getenv("EVALUATION_BATCH_SIZE", 1))
+
+    # LLM 제공자별 서킷 브레이커 (연속 실패 수 기준, 서킷을 여는 시간(초), 시험 호출 실패 시 두 배로 늘리는 최대 시간(초))
+    CIRCUIT_BREAKER_ENABLED: bool = os.getenv("CIRCUIT_BREAKER_ENABLED", "false").lower() == "true"
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 10))
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", 30))
+    CIRCUIT_BREAKER_MAX_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_MAX_OPEN_SECONDS", 300))
+    # 서킷이 열렸을 때 대신 호출할 LLM (사용자 모드, 비어 있으면 바로 실패, 관리자 모드는 LLM 비교가 목적이므로 항상 바로 실패)
+    CIRCUIT_BREAKER_FALLBACK_LLM: str = os.getenv("CIRCUIT_BREAKER_FALLBACK_LLM", "")
+
+    # 여러 워커에서 동시에 보내는 같은 (모델, 프롬프트) LLM 요청 합치기 (결과 최대 대기 시간(초), 락 만료 시간(초), 결과 보관 시간(초))
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "false").lower() == "true"
+    SINGLE_FLIGHT_WAIT: float = float(os.getenv("SINGLE_FLIGHT_WAIT", 60))
+    SINGLE_FLIGHT_LOCK_TTL: int = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 120))
+    SINGLE_FLIGHT_RESULT_TTL: int = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 60))
+
+    # LLM/임베딩 백엔드 (vendor: 실제 제공자 API, mock: 로컬 모의 모델, 부하/처리량 테스트용)
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "vendor")
+    # 모의 LLM 응답 시간 (로그정규 분포 중간값(초), 표준편차), 429/타임아웃 발생 비율, 타임아웃까지 걸리는 시간(초), 분당 요청 수 한도 (0이면 제한하지 않음)
+    MOCK_LLM_LATENCY_MEDIAN: float = float(os.getenv("MOCK_LLM_LATENCY_MEDIAN", 1.5))
+    MOCK_LLM_LATENCY_SIGMA: float = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", 0.5))
+    MOCK_LLM_RATE_LIMIT_RATE: float = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", 0))
+    MOCK_LLM_TIMEOUT_RATE: float = float(os.getenv("MOCK_LLM_TIMEOUT_RATE", 0))
+    MOCK_LLM_TIMEOUT_SECONDS: float = float(os.getenv("MOCK_LLM_TIMEOUT_SECONDS", 60))
+    MOCK_LLM_RPM: int = int(os.getenv("MOCK_LLM_RPM", 0))
+    # 제공자별 모의 LLM 설정 (JSON, 예: {"google": {"latency_median": 0.8, "requests_per_minute": 300}})
+    MOCK_LLM_PROFILES: str = os.getenv("MOCK_LLM_PROFILES", "")
+    # 모의 임베딩 요청 당 응답 시간(초), 모의 LLM/임베딩 난수 시드
+    MOCK_EMBEDDING_LATENCY: float = float(os.getenv("MOCK_EMBEDDING_LATENCY", 0.05))
+    MOCK_SEED: int = int(os.getenv("MOCK_SEED", 0))
+
     model_config = {
         "env_file": ".env",
         "extra": "allow"  
@@ -0,0 +1,79 @@
+# 임베딩 모델 초기화
+import base64
+import hashlib
+import logging
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from app.core.cache import RedisLRUCache
+from app.core.config import settings
+from app.core.mock_llm import MockEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# 분류 체계 및 특허 검색용 임베딩 모델 (프로세스 당 하나의 클라이언트를 공유)
+EMBEDDING_DIMENSIONS = 3072
+
+# 백엔드(LLM_BACKEND)별 (모델명, 임베딩 생성 함수), 모델명은 임베딩 캐시 키에 사용하므로 백엔드마다 달라야 함
+EMBEDDING_BACKENDS = {
+    "vendor": ("text-embedding-3-large", lambda: OpenAIEmbeddings(model="text-embedding-3-large", dimensions=EMBEDDING_DIMENSIONS)),
+    "mock": ("mock-embedding", lambda: MockEmbeddings(EMBEDDING_DIMENSIONS, settings.MOCK_EMBEDDING_LATENCY, settings.MOCK_SEED)),
+}
+
+if settings.LLM_BACKEND not in EMBEDDING_BACKENDS:
+    raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {settings.LLM_BACKEND}")
+EMBEDDING_MODEL, _create_embeddings = EMBEDDING_BACKENDS[settings.LLM_BACKEND]
+
+# 기존 이름을 유지하며, LLM_BACKEND=mock이면 모의 임베딩
+embeddings_openai = _create_embeddings()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    (모델명, 차원, 텍스트)의 해시를 키로 문서 임베딩을 Redis에 저장하는 임베딩 래퍼입니다.
+    캐시에 없는 텍스트만 한 번의 요청으로 임베딩하며, 검색 쿼리는 캐시하지 않습니다.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, dimensions: int, cache: RedisLRUCache):
+        self.underlying = underlying
+        self.model = model
+        self.dimensions = dimensions
+        self.cache = cache
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}:{self.dimensions}:{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._cache_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        vectors: Dict[str, List[float]] = {
+            key: np.frombuffer(base64.b64decode(value), dtype=np.float32).tolist()
+            for key, value in zip(keys, cached) if value is not None
+        }
+
+        # 캐시에 없는 텍스트만 임베딩 (중복 텍스트는 한 번만)
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            self.cache.set_many({
+                key: base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+                for key, vector in zip(missing.keys(), new_vectors)
+            })
+            vectors.update(zip(missing.keys(), new_vectors))
+
+        logger.info(f"임베딩 캐시: 전체 {len(texts)}건, 신규 임베딩 {len(missing)}건")
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+
+# 분류 체계 텍스트용 캐시 임베딩
+taxonomy_embeddings = CachedEmbeddings(
+    embeddings_openai,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    RedisLRUCache("embedding_cache", settings.EMBEDDING_CACHE_MAX_ENTRIES, settings.EMBEDDING_CACHE_TTL),
+)
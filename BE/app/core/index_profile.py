@@ -0,0 +1,121 @@
+# 분류 체계 인덱스 프로파일 (차원 축소, 저장 형식, 인덱스 종류)
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+import numpy as np
+
+# PQ/IVF 학습에 필요한 최소 벡터 수 (PQ 코드북 256개 x 39, 이보다 적으면 축소 차원 전체 검색으로 대체)
+MIN_TRAINING_VECTORS = 10000
+
+
+@dataclass(frozen=True)
+class IndexProfile:
+    """
+    분류 체계 인덱스를 저장하고 검색하는 방식입니다.
+    - dimensions: 앞쪽 차원만 사용하고 다시 정규화 (None이면 원본 3072차원)
+    - storage: float32 | float16 | pq (product quantization)
+    - index_type: flat (전체 검색) | hnsw | ivf
+    """
+    name: str
+    dimensions: Optional[int] = None
+    storage: str = "float32"
+    index_type: str = "flat"
+    hnsw_neighbors: int = 32
+    ef_search: int = 64
+    nprobe: int = 16
+
+    @property
+    def uses_ann(self) -> bool:
+        # numpy 전체 검색 대신 FAISS 인덱스를 사용하는지 여부 (float16/PQ 디코딩은 FAISS가 더 빠름)
+        return self.index_type != "flat" or self.storage != "float32"
+
+    @property
+    def numpy_dtype(self):
+        return np.float32 if self.storage == "float32" else np.float16
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def factory_string(self, dimensions: int, count: int) -> str:
+        """
+        faiss.index_factory에 전달할 인덱스 정의 문자열을 만듭니다.
+        """
+        pq_m = _pq_subquantizers(dimensions)
+        if self.index_type == "hnsw":
+            return {
+                "float32": f"HNSW{self.hnsw_neighbors}",
+                "float16": f"HNSW{self.hnsw_neighbors},SQfp16",
+                "pq": f"HNSW{self.hnsw_neighbors}_PQ{pq_m}",
+            }[self.storage]
+
+        encoding = {"float32": "Flat", "float16": "SQfp16", "pq": f"PQ{pq_m}x8"}[self.storage]
+        if self.index_type == "ivf":
+            return f"IVF{_ivf_lists(count)},{encoding}"
+        return encoding
+
+    def needs_training(self) -> bool:
+        return self.index_type == "ivf" or self.storage == "pq"
+
+
+def _pq_subquantizers(dimensions: int) -> int:
+    # 벡터 당 약 dimensions/16 바이트, dimensions의 약수여야 함
+    m = max(1, dimensions // 16)
+    while dimensions % m:
+        m -= 1
+    return m
+
+
+def _ivf_lists(count: int) -> int:
+    # 리스트 당 학습 벡터가 39개 이상 되도록 제한
+    return int(max(1, min(4 * np.sqrt(count), count // 39)))
+
+
+# 기본 제공 프로파일 (flat은 기존 3072차원 float32 전체 검색과 동일)
+PROFILES: Dict[str, IndexProfile] = {
+    profile.name: profile
+    for profile in (
+        IndexProfile("flat"),
+        IndexProfile("d1024", dimensions=1024),
+        IndexProfile("d512-f16", dimensions=512, storage="float16"),
+        IndexProfile("d256-f16", dimensions=256, storage="float16"),
+        IndexProfile("hnsw-d1024", dimensions=1024, index_type="hnsw"),
+        IndexProfile("ivfpq-d1024", dimensions=1024, storage="pq", index_type="ivf"),
+    )
+}
+
+FLAT_PROFILE = PROFILES["flat"]
+
+
+def choose_profile(count: int) -> IndexProfile:
+    """
+    분류 체계 크기에 따라 인덱스 프로파일을 고릅니다. (auto)
+    """
+    if count < 5000:
+        return PROFILES["flat"]
+    if count < 50000:
+        return PROFILES["hnsw-d1024"]
+    return PROFILES["ivfpq-d1024"]
+
+
+def get_index_profile(name: str, count: int) -> IndexProfile:
+    """
+    프로파일 이름으로 인덱스 프로파일을 반환합니다. "auto"이면 분류 체계 크기로 고릅니다.
+    """
+    if name == "auto":
+        return choose_profile(count)
+    if name not in PROFILES:
+        raise ValueError(f"지원하지 않는 인덱스 프로파일입니다: {name} (가능한 값: auto, {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def project(vectors, dimensions: Optional[int]) -> np.ndarray:
+    """
+    임베딩의 앞쪽 dimensions개 차원만 남기고 다시 정규화합니다.
+    text-embedding-3 모델은 앞쪽 차원에 정보가 집중되도록 학습되어 있어 축소 후에도 검색에 사용할 수 있습니다.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if dimensions is None or dimensions >= vectors.shape[1]:
+        return vectors
+    reduced = vectors[:, :dimensions]
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(reduced / norms, dtype=np.float32)
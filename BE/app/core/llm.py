@@ -1,27 +1,69 @@
 # LLM 초기화
+from typing import Any, Callable, Dict
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from langchain_xai import ChatXAI
+from app.core.concurrency import concurrency_options
 from app.core.config import settings
+from app.core.mock_llm import create_mock_chat_model
+from app.core.rate_limit import rate_limit_options
 
-# 분류용 LLM 모델
-gpt = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model_name="gpt-4o", temperature=0)
-claude = ChatAnthropic(model="claude-3-7-sonnet-20250219", temperature=0, api_key=settings.CLAUDE_API_KEY)
-gemini = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=settings.GEMINI_API_KEY)
-grok = ChatXAI(model="grok-3-beta", temperature=0, xai_api_key=settings.GROK3_API_KEY)
+
+# 제공자별 rate limiter, 동시 호출 수 제어 옵션을 합쳐 모델 생성자에 전달
+def provider_options(provider: str):
+    options = {}
+    callbacks = []
+    for extra in (rate_limit_options(provider), concurrency_options(provider)):
+        callbacks += extra.pop("callbacks", [])
+        options.update(extra)
+    if callbacks:
+        options["callbacks"] = callbacks
+    return options
+
+
+# 백엔드(LLM_BACKEND)별, 제공자별 모델 생성 함수: (모델명, 제공자 옵션) -> 채팅 모델
+CHAT_MODEL_FACTORIES: Dict[str, Dict[str, Callable[[str, Dict[str, Any]], Any]]] = {
+    "vendor": {
+        "openai": lambda model, options: ChatOpenAI(api_key=settings.OPENAI_API_KEY, model_name=model, temperature=0, **options),
+        "anthropic": lambda model, options: ChatAnthropic(model=model, temperature=0, api_key=settings.CLAUDE_API_KEY, **options),
+        "google": lambda model, options: ChatGoogleGenerativeAI(model=model, temperature=0, google_api_key=settings.GEMINI_API_KEY, **options),
+        "xai": lambda model, options: ChatXAI(model=model, temperature=0, xai_api_key=settings.GROK3_API_KEY, **options),
+    },
+    "mock": {
+        provider: (lambda model, options, provider=provider: create_mock_chat_model(provider, model, options))
+        for provider in ("openai", "anthropic", "google", "xai")
+    },
+}
+
+
+def register_chat_model(backend: str, provider: str, factory: Callable[[str, Dict[str, Any]], Any]) -> None:
+    """
+    백엔드의 제공자별 모델 생성 함수를 등록합니다. (모듈 로드 전에 등록해야 아래 모델에 반영됨)
+    """
+    CHAT_MODEL_FACTORIES.setdefault(backend, {})[provider] = factory
+
+
+def create_chat_model(provider: str, model: str):
+    factories = CHAT_MODEL_FACTORIES.get(settings.LLM_BACKEND)
+    if factories is None or provider not in factories:
+        raise ValueError(f"지원하지 않는 LLM 백엔드입니다: {settings.LLM_BACKEND} ({provider})")
+    return factories[provider](model, provider_options(provider))
+
+
+# 분류용 LLM 모델 (호출 전 제공자별 Redis 토큰 버킷에서 획득, 응답 헤더는 동시 호출 수 제어에 반영)
+gpt = create_chat_model("openai", "gpt-4o")
+claude = create_chat_model("anthropic", "claude-3-7-sonnet-20250219")
+gemini = create_chat_model("google", "gemini-2.0-flash")
+grok = create_chat_model("xai", "grok-3-beta")
 
 # 평가용 LLM 모델 (Reasoning에 더 적합한 모델들)
 # gpt, claude는 좀 더 reasoning에 적합한 모델로 변경할 수 있을 것 같으나, 현재는 모델 변경 시 소요 시간이 커지고 제대로 작동하지 않음.
 # 따라서 현 모델을 사용하여 Reasoning 모델을 구현함. (현 모델로도 충분히 수행 가능)
-gpt_reasoning = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model_name="gpt-4o", temperature=0)
-claude_reasoning = ChatAnthropic(model="claude-3-7-sonnet-20250219", temperature=0, api_key=settings.CLAUDE_API_KEY)
-gemini_reasoning = ChatGoogleGenerativeAI(
-    model="gemini-2.5-pro-preview-03-25",
-    temperature=0,
-    google_api_key=settings.GEMINI_API_KEY
-)
-grok_reasoning = ChatXAI(model="grok-3-beta", temperature=0, xai_api_key=settings.GROK3_API_KEY)
+gpt_reasoning = create_chat_model("openai", "gpt-4o")
+claude_reasoning = create_chat_model("anthropic", "claude-3-7-sonnet-20250219")
+gemini_reasoning = create_chat_model("google", "gemini-2.5-pro-preview-03-25")
+grok_reasoning = create_chat_model("xai", "grok-3-beta")
 
 # LLM 매핑 딕셔너리
 classification_llms = {
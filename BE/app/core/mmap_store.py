@@ -0,0 +1,390 @@
+# 메모리 매핑 기반 분류 체계 벡터 저장소
+import json
+import logging
+import mmap
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from app.core.index_profile import FLAT_PROFILE, MIN_TRAINING_VECTORS, IndexProfile, project
+
+logger = logging.getLogger(__name__)
+
+# 저장소 파일 (벡터, 벡터 제곱 노름, 저장소 정보, 문서 레코드, 문서 레코드 위치)
+# 문서 레코드(메타데이터, page_content)는 한 줄에 하나씩 JSON으로 저장하고, 검색 결과에 해당하는 레코드만 위치로 찾아 읽습니다.
+#
+# 저장소 정보를 제외한 파일은 저장할 때마다 새 빌드 ID를 붙인 이름(vectors.<빌드 ID>.npy)으로 쓰고,
+# 마지막에 빌드 ID를 담은 저장소 정보 파일을 원자적으로 교체합니다. 로드하는 쪽은 저장소 정보의 빌드 ID로 파일을 열므로
+# 저장 도중에 로드해도 이전 빌드와 새 빌드의 파일이 섞이지 않습니다. (빌드 ID가 없는 이전 형식은 빌드 ID 없는 이름 사용)
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+METADATA_FILE = "metadata.json"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "offsets.npy"
+NATIVE_FILES = (VECTORS_FILE, NORMS_FILE, DOCUMENTS_FILE, OFFSETS_FILE)
+
+# 대분류별 하위 분류 벡터의 중심 벡터, 대분류 순서로 이어 붙인 하위 분류 벡터 인덱스 (계층 검색용, 없으면 전체 검색)
+CENTROIDS_FILE = "centroids.npy"
+CHILDREN_FILE = "children.npy"
+
+# 인덱스 프로파일이 HNSW/IVF/PQ일 때 사용하는 FAISS 인덱스
+ANN_FILE = "ann.faiss"
+
+# float16 벡터를 검색할 때 한 번에 float32로 변환하는 행 수
+SEARCH_BLOCK_ROWS = 8192
+
+# 문서 레코드에 저장하는 메타데이터 필드 (text는 page_content로 한 번만 저장)
+METADATA_COLUMNS = (
+    "code",
+    "level",
+    "name",
+    "parent_code",
+    "parent_name",
+    "grand_parent_code",
+    "grand_parent_name",
+    "description",
+)
+
+
+# 빌드 ID가 붙는 파일
+BUILD_FILES = NATIVE_FILES + (CENTROIDS_FILE, CHILDREN_FILE, ANN_FILE)
+
+
+def build_file(filename: str, build: Optional[str]) -> str:
+    """
+    빌드 ID를 붙인 파일 이름을 반환합니다. (vectors.npy -> vectors.<빌드 ID>.npy, 빌드 ID가 없으면 그대로)
+    """
+    if not build:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{build}{ext}"
+
+
+def _read_metadata(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def has_native_store(path: str) -> bool:
+    metadata = _read_metadata(path)
+    if metadata is None:
+        return False
+    return all(os.path.exists(os.path.join(path, build_file(filename, metadata.get("build")))) for filename in NATIVE_FILES)
+
+
+def get_root_code(metadata: Dict[str, Any]) -> Optional[str]:
+    """
+    분류 문서가 속한 대분류 코드를 반환합니다. (소분류: grand_parent_code, 중분류: parent_code)
+    """
+    return metadata.get("grand_parent_code") or metadata.get("parent_code") or metadata.get("code")
+
+
+def _replace_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def read_store_profile(path: str) -> Optional[str]:
+    """
+    저장된 메모리 매핑 저장소의 인덱스 프로파일 이름을 반환합니다. (없으면 None)
+    """
+    metadata = _read_metadata(path)
+    return metadata.get("profile", {}).get("name") if metadata else None
+
+
+def build_ann_index(vectors: np.ndarray, profile: IndexProfile) -> Optional[Any]:
+    """
+    인덱스 프로파일에 맞는 FAISS 인덱스를 만듭니다.
+    학습이 필요한 인덱스인데 벡터 수가 부족하면 None을 반환하여 전체 검색을 사용합니다.
+    """
+    count, dimensions = vectors.shape
+    if profile.needs_training() and count < MIN_TRAINING_VECTORS:
+        logger.warning(f"{profile.name} 인덱스 학습에 필요한 벡터가 부족하여({count}건) 전체 검색을 사용합니다.")
+        return None
+
+    index = faiss.index_factory(dimensions, profile.factory_string(dimensions, count))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def _document_record(doc: Document) -> bytes:
+    record = {
+        "metadata": {column: doc.metadata[column] for column in METADATA_COLUMNS if doc.metadata.get(column) is not None},
+        "page_content": doc.page_content,
+    }
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def export_native_store(vectordb: Any, path: str, profile: IndexProfile = FLAT_PROFILE) -> None:
+    """
+    FAISS 벡터 저장소를 읽기 전용 메모리 매핑이 가능한 형식으로 내보냅니다.
+    벡터는 인덱스 프로파일의 차원과 형식(float32/float16)의 .npy 파일로, 문서는 한 줄에 하나씩 JSON 레코드로 저장하고
+    레코드 위치를 .npy 파일로 저장합니다. (저장소 정보 JSON 파일에는 문서 수와 관계없는 값만 저장)
+    프로파일이 HNSW/IVF/PQ이면 검색용 FAISS 인덱스를 함께 저장합니다.
+    """
+    count = vectordb.index.ntotal
+    vectors = vectordb.index.reconstruct_n(0, count) if count else np.zeros((0, vectordb.index.d), dtype=np.float32)
+    vectors = project(vectors, profile.dimensions)
+    vectors = np.ascontiguousarray(vectors, dtype=profile.numpy_dtype)
+    search_vectors = vectors.astype(np.float32)
+
+    documents = [vectordb.docstore.search(vectordb.index_to_docstore_id[i]) for i in range(count)]
+
+    # 대분류 -> 하위 분류 벡터 인덱스 목록, 대분류별 중심 벡터
+    children: Dict[str, List[int]] = {}
+    for i, doc in enumerate(documents):
+        children.setdefault(get_root_code(doc.metadata), []).append(i)
+    root_codes = list(children.keys())
+    children_indices = np.array([i for code in root_codes for i in children[code]], dtype=np.int64)
+    centroids = np.array(
+        [search_vectors[children[code]].mean(axis=0) for code in root_codes],
+        dtype=np.float32,
+    ).reshape(len(root_codes), vectors.shape[1])
+
+    build = uuid.uuid4().hex[:12]
+    metadata = {
+        "build": build,
+        "count": count,
+        "dimensions": int(vectors.shape[1]),
+        "profile": profile.to_dict(),
+        "hierarchy": {
+            "codes": root_codes,
+            "counts": [len(children[code]) for code in root_codes],
+        },
+    }
+
+    ann_index = build_ann_index(search_vectors, profile) if profile.uses_ann and count else None
+
+    os.makedirs(path, exist_ok=True)
+    previous = _read_metadata(path)
+
+    def file_path(filename: str) -> str:
+        return os.path.join(path, build_file(filename, build))
+
+    # 새 빌드 파일은 저장소 정보가 가리키기 전까지 읽히지 않으므로 바로 씀
+    if ann_index is not None:
+        faiss.write_index(ann_index, file_path(ANN_FILE))
+
+    # 문서 레코드와 레코드 시작 위치 (마지막 값은 파일 끝)
+    records = [_document_record(doc) for doc in documents]
+    offsets = np.concatenate([[0], np.cumsum([len(record) for record in records], dtype=np.int64)]).astype(np.int64)
+    with open(file_path(DOCUMENTS_FILE), "wb") as f:
+        f.writelines(records)
+    np.save(file_path(OFFSETS_FILE), offsets)
+    np.save(file_path(CHILDREN_FILE), children_indices)
+    np.save(file_path(NORMS_FILE), np.einsum("ij,ij->i", search_vectors, search_vectors))
+    np.save(file_path(CENTROIDS_FILE), centroids)
+    np.save(file_path(VECTORS_FILE), vectors)
+
+    # 저장소 정보를 교체하면 새 빌드로 전환
+    _replace_atomic(os.path.join(path, METADATA_FILE), lambda f: f.write(json.dumps(metadata, ensure_ascii=False).encode("utf-8")))
+
+    # 현재 빌드와 직전 빌드(저장 중에 이전 저장소 정보를 읽은 워커가 열 수 있음)를 제외한 빌드 파일 삭제
+    _remove_stale_builds(path, {build, previous.get("build", "") if previous else None})
+
+
+def _remove_stale_builds(path: str, keep: Set[Optional[str]]) -> None:
+    for entry in os.listdir(path):
+        for filename in BUILD_FILES:
+            stem, ext = os.path.splitext(filename)
+            if entry == filename:
+                entry_build = ""
+            elif entry.startswith(f"{stem}.") and entry.endswith(ext) and entry.count(".") == 2:
+                entry_build = entry[len(stem) + 1:-len(ext)]
+            else:
+                continue
+            if entry_build not in keep:
+                os.remove(os.path.join(path, entry))
+            break
+
+
+class MmapVectorStore(VectorStore):
+    """
+    export_native_store로 저장된 벡터와 문서 레코드를 읽기 전용으로 메모리 매핑하여 검색하는 저장소입니다.
+    prefork 워커들이 페이지 캐시를 공유하고 검색 결과에 해당하는 문서만 읽으므로, 로드 시간과 워커 당 추가 메모리가 분류 체계 크기와 거의 관계없습니다.
+    FAISS IndexFlatL2와 같은 제곱 L2 거리와 관련도 점수를 사용합니다.
+
+    벡터 개수가 min_hierarchical_size 이상이고 계층 정보가 있으면, 대분류 중심 벡터를 먼저 검색한 뒤
+    가장 가까운 branches개 대분류의 하위 분류만 검색합니다. (branches가 0이면 항상 전체 검색)
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, branches: int = 0, min_hierarchical_size: int = 0):
+        self.path = path
+        self.embedding = embedding
+        self.branches = branches
+        self.min_hierarchical_size = min_hierarchical_size
+
+        # 저장소 정보를 먼저 읽고 그 빌드의 파일만 엶
+        with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.build = metadata.get("build")
+        self.vectors = np.load(self.file_path(VECTORS_FILE), mmap_mode="r")
+        self.norms = np.load(self.file_path(NORMS_FILE), mmap_mode="r")
+        self.offsets = np.load(self.file_path(OFFSETS_FILE), mmap_mode="r")
+
+        if (
+            metadata["count"] != self.vectors.shape[0]
+            or self.norms.shape[0] != self.vectors.shape[0]
+            or self.offsets.shape[0] != self.vectors.shape[0] + 1
+        ):
+            raise ValueError(f"벡터 저장소 파일이 일치하지 않습니다: {path}")
+
+        # 문서 레코드 (빈 파일은 메모리 매핑할 수 없음)
+        self.documents: Optional[mmap.mmap] = None
+        with open(self.file_path(DOCUMENTS_FILE), "rb") as f:
+            if self.ntotal:
+                self.documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # 계층 검색 정보
+        self.root_codes: List[str] = []
+        self.children: List[np.ndarray] = []
+        self.centroids: Optional[np.ndarray] = None
+        centroids_path = self.file_path(CENTROIDS_FILE)
+        children_path = self.file_path(CHILDREN_FILE)
+        if "hierarchy" in metadata and os.path.exists(centroids_path) and os.path.exists(children_path):
+            self.root_codes = metadata["hierarchy"]["codes"]
+            children = np.load(children_path, mmap_mode="r")
+            bounds = np.cumsum([0] + metadata["hierarchy"]["counts"])
+            self.children = [children[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+            self.centroids = np.load(centroids_path)
+            self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+        # 인덱스 프로파일 (이전 형식은 3072차원 float32 전체 검색)
+        self.profile = IndexProfile(**metadata["profile"]) if "profile" in metadata else FLAT_PROFILE
+        self.ann: Optional[Any] = None
+        self.ann_path = self.file_path(ANN_FILE)
+        if self.profile.uses_ann and os.path.exists(self.ann_path):
+            self.ann = faiss.read_index(self.ann_path)
+            parameters = faiss.ParameterSpace()
+            if self.profile.index_type == "hnsw":
+                parameters.set_index_parameter(self.ann, "efSearch", self.profile.ef_search)
+            elif self.profile.index_type == "ivf":
+                parameters.set_index_parameter(self.ann, "nprobe", self.profile.nprobe)
+
+    def file_path(self, filename: str) -> str:
+        return os.path.join(self.path, build_file(filename, self.build))
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    @property
+    def ntotal(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def document(self, i: int) -> Document:
+        """
+        i번째 벡터의 문서를 문서 레코드 파일에서 읽어 만듭니다. 값이 없는 메타데이터 필드는 포함하지 않습니다.
+        """
+        record = json.loads(self.documents[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def project_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        """
+        쿼리 임베딩을 저장소의 차원으로 축소합니다. (원본 차원이면 그대로)
+        """
+        return project(query_vectors, self.dimensions)
+
+    def _inner_products(self, query_vectors: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        # float16 벡터는 블록 단위로 float32로 변환하여 곱함
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return query_vectors @ vectors.T
+        return np.concatenate(
+            [query_vectors @ vectors[start:start + SEARCH_BLOCK_ROWS].astype(np.float32).T
+             for start in range(0, len(vectors), SEARCH_BLOCK_ROWS)],
+            axis=1,
+        )
+
+    def search_matrix(self, query_vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        여러 쿼리 벡터에 대해 제곱 L2 거리 기준 상위 k개의 (인덱스, 거리)를 반환합니다.
+        FAISS 인덱스가 있으면 해당 인덱스로 검색합니다.
+        """
+        k = min(k, self.ntotal)
+        query_vectors = self.project_queries(query_vectors)
+        if self.ann is not None:
+            distances, indices = self.ann.search(query_vectors, k)
+            return indices, distances
+
+        query_norms = np.einsum("ij,ij->i", query_vectors, query_vectors)
+        distances = query_norms[:, None] + self.norms[None, :] - 2.0 * self._inner_products(query_vectors)
+
+        indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, indices, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(top_distances, order, axis=1)
+
+    @property
+    def hierarchical(self) -> bool:
+        return (
+            self.branches > 0
+            and self.ann is None
+            and self.centroids is not None
+            and len(self.root_codes) > self.branches
+            and self.ntotal >= self.min_hierarchical_size
+        )
+
+    def search_branches(self, query_vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        가장 가까운 대분류 branches개를 고른 뒤, 그 하위 분류 벡터만 검색하여 상위 k개의 (인덱스, 거리)를 반환합니다.
+        """
+        query_vector = self.project_queries(query_vector)[0]
+        query_norm = float(query_vector @ query_vector)
+
+        # 1단계: 대분류 중심 벡터 검색
+        centroid_distances = query_norm + self.centroid_norms - 2.0 * (self.centroids @ query_vector)
+        branches = np.argpartition(centroid_distances, self.branches - 1)[:self.branches]
+
+        # 2단계: 선택된 대분류의 하위 분류만 검색
+        candidates = np.sort(np.concatenate([self.children[b] for b in branches]))
+        distances = query_norm + self.norms[candidates] - 2.0 * self._inner_products(query_vector[None, :], candidates)[0]
+
+        k = min(k, len(candidates))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return candidates[top], distances[top]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if self.ntotal == 0:
+            return []
+        if self.hierarchical:
+            indices, distances = self.search_branches(np.asarray(embedding, dtype=np.float32), k)
+        else:
+            indices, distances = self.search_matrix(np.asarray(embedding, dtype=np.float32), k)
+            indices, distances = indices[0], distances[0]
+        return [(self.document(int(i)), float(d)) for i, d in zip(indices, distances) if i >= 0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("MmapVectorStore는 읽기 전용입니다. 분류 체계를 다시 저장하세요.")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "MmapVectorStore":
+        raise NotImplementedError("MmapVectorStore는 export_native_store로만 생성합니다.")
@@ -0,0 +1,332 @@
+# 로컬 모의 LLM 및 임베딩 (LLM_BACKEND=mock, 비용과 외부 rate limit 없이 처리량/재시도/백프레셔 측정용)
+#
+# 모의 LLM은 프롬프트의 분류 체계 context에서 분류 결과 JSON을, 평가 프롬프트에는 평가 텍스트(또는 구조화된 출력)를 만들어 반환합니다.
+# 응답 시간은 로그정규 분포를 따르고, 설정한 비율로 각 제공자의 429/타임아웃 예외(헤더 포함)를 발생시킵니다.
+# 모의 임베딩은 텍스트의 문자 3-gram을 해싱해 만들므로 같은 텍스트는 항상 같은 벡터, 비슷한 텍스트는 가까운 벡터가 됩니다.
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import anthropic
+from google.api_core import exceptions as google_exceptions
+import httpx
+import numpy as np
+import openai
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 제공자별 API 주소 (예외의 요청 정보에 사용)
+PROVIDER_URLS = {
+    "openai": "https://api.openai.com/v1/chat/completions",
+    "xai": "https://api.x.ai/v1/chat/completions",
+    "anthropic": "https://api.anthropic.com/v1/messages",
+    "google": "https://generativelanguage.googleapis.com",
+}
+
+# 429 응답까지 걸리는 시간(초)
+RATE_LIMIT_LATENCY = 0.05
+
+UNCLASSIFIED = "미분류"
+
+# 분류 체계 context의 "분류 정보:" 블록과 항목
+FRAGMENT_PATTERN = re.compile(r"분류 정보:\n((?:- [^\n]*\n?)+)")
+FIELD_PATTERN = re.compile(r"^- ([^:\n]+): ?(.*)$", re.MULTILINE)
+
+# 여러 특허 프롬프트의 특허 구분
+PATENT_BLOCK_PATTERN = re.compile(r"\[특허 \d+\]\n출원번호: ([^\n]*)\n")
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    parts = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list):
+            content = "\n".join(block if isinstance(block, str) else str(block.get("text", "")) for block in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _patent_blocks(text: str) -> List[Tuple[str, str]]:
+    # [(출원번호, 해당 특허 부분), ...]
+    matches = list(PATENT_BLOCK_PATTERN.finditer(text))
+    return [
+        (match.group(1).strip(), text[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)])
+        for i, match in enumerate(matches)
+    ]
+
+
+def mock_classification(text: str) -> Dict[str, str]:
+    """
+    context의 가장 앞(가장 유사한) 소분류(없으면 중분류) 분류 체계로 분류 결과를 만듭니다.
+    """
+    fragments = [dict(FIELD_PATTERN.findall(block)) for block in FRAGMENT_PATTERN.findall(text)]
+    for fragment in fragments:
+        if fragment.get("레벨") == "소분류":
+            return {
+                "majorCode": fragment.get("최상위 코드") or UNCLASSIFIED,
+                "majorTitle": fragment.get("최상위 명칭") or UNCLASSIFIED,
+                "middleCode": fragment.get("상위 코드") or UNCLASSIFIED,
+                "middleTitle": fragment.get("상위 명칭") or UNCLASSIFIED,
+                "smallCode": fragment.get("코드") or UNCLASSIFIED,
+                "smallTitle": fragment.get("명칭") or UNCLASSIFIED,
+            }
+    for fragment in fragments:
+        if fragment.get("레벨") == "중분류":
+            return {
+                "majorCode": fragment.get("상위 코드") or UNCLASSIFIED,
+                "majorTitle": fragment.get("상위 명칭") or UNCLASSIFIED,
+                "middleCode": fragment.get("코드") or UNCLASSIFIED,
+                "middleTitle": fragment.get("명칭") or UNCLASSIFIED,
+                "smallCode": UNCLASSIFIED,
+                "smallTitle": UNCLASSIFIED,
+            }
+    return {field: UNCLASSIFIED for field in ("majorCode", "majorTitle", "middleCode", "middleTitle", "smallCode", "smallTitle")}
+
+
+def mock_evaluation(text: str) -> Dict[str, Any]:
+    # 프롬프트 해시로 점수 결정 (1.0: 60%, 0.5: 30%, 0.0: 10%)
+    bucket = _digest(text) % 10
+    score = 1.0 if bucket < 6 else 0.5 if bucket < 9 else 0.0
+    reasons = {1.0: "추천 분류 체계와 현재 분류 결과가 일치합니다.", 0.5: "추천 분류 체계와 현재 분류 결과가 부분적으로 일치합니다.", 0.0: "추천 분류 체계와 현재 분류 결과가 일치하지 않습니다."}
+    return {"analysis": "유사도 기반 추천 분류 체계와 현재 분류 결과를 비교했습니다.", "score": score, "reason": reasons[score]}
+
+
+def mock_response(text: str, tools: Optional[Sequence[Dict[str, Any]]] = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    프롬프트 종류에 맞는 (응답 텍스트, 도구 호출 목록)을 만듭니다.
+    """
+    blocks = _patent_blocks(text)
+    if tools:
+        name = tools[0]["function"]["name"]
+        if "Batch" in name:
+            args: Dict[str, Any] = {"results": [{"applicationNumber": number, **mock_evaluation(block)} for number, block in blocks]}
+        else:
+            args = mock_evaluation(text)
+        return "", [{"name": name, "args": args, "id": f"call_{_digest(text):x}"}]
+
+    if "majorCode" in text:
+        if blocks:
+            results = [{"applicationNumber": number, **mock_classification(block)} for number, block in blocks]
+            return json.dumps({"results": results}, ensure_ascii=False), []
+        return json.dumps(mock_classification(text), ensure_ascii=False), []
+
+    evaluation = mock_evaluation(text)
+    return f"1. 분석: {evaluation['analysis']}\n2. 점수: {evaluation['score']}\n3. 이유: {evaluation['reason']}", []
+
+
+def _rate_limit_headers(provider: str, limit: int, remaining: int, reset: float) -> Dict[str, str]:
+    if provider == "anthropic":
+        return {
+            "retry-after": str(max(1, math.ceil(reset))),
+            "anthropic-ratelimit-requests-limit": str(limit),
+            "anthropic-ratelimit-requests-remaining": str(remaining),
+        }
+    return {
+        "retry-after": str(max(1, math.ceil(reset))),
+        "x-ratelimit-limit-requests": str(limit),
+        "x-ratelimit-remaining-requests": str(remaining),
+        "x-ratelimit-reset-requests": f"{reset:.3f}s",
+    }
+
+
+def rate_limit_error(provider: str, limit: int = 0, remaining: int = 0, reset: float = 1.0) -> Exception:
+    """
+    제공자 SDK가 발생시키는 것과 같은 형식의 429 예외를 만듭니다.
+    """
+    if provider == "google":
+        return google_exceptions.ResourceExhausted("Resource has been exhausted (mock)")
+    request = httpx.Request("POST", PROVIDER_URLS[provider])
+    response = httpx.Response(429, headers=_rate_limit_headers(provider, limit, remaining, reset), request=request)
+    if provider == "anthropic":
+        return anthropic.RateLimitError("rate_limit_error (mock)", response=response, body=None)
+    return openai.RateLimitError("Rate limit reached (mock)", response=response, body=None)
+
+
+def timeout_error(provider: str) -> Exception:
+    if provider == "google":
+        return google_exceptions.DeadlineExceeded("Deadline exceeded (mock)")
+    request = httpx.Request("POST", PROVIDER_URLS[provider])
+    if provider == "anthropic":
+        return anthropic.APITimeoutError(request=request)
+    return openai.APITimeoutError(request=request)
+
+
+class MockChatModel(BaseChatModel):
+    """
+    외부 API를 호출하지 않는 모의 채팅 모델입니다. 응답 시간, 429/타임아웃 비율, 분당 요청 수 한도를 설정할 수 있습니다.
+    분당 요청 수 한도는 Redis 카운터로 모든 워커가 공유하며, 넘으면 제공자 형식의 429 예외와 헤더를 반환합니다.
+    """
+
+    provider: str = "openai"
+    model_name: str = "mock"
+    latency_median: float = 1.5
+    latency_sigma: float = 0.5
+    rate_limit_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 60.0
+    requests_per_minute: int = 0
+    include_response_headers: bool = False
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(f"{self.seed}:{self.provider}:{self.model_name}")
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"provider": self.provider, "model_name": self.model_name}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _admit(self) -> Tuple[bool, int, float]:
+        # 분당 요청 수 한도 (허용 여부, 남은 요청 수, 초기화까지 남은 시간)
+        now = time.time()
+        reset = 60 - now % 60
+        if self.requests_per_minute <= 0:
+            return True, 0, reset
+        try:
+            redis = get_redis_client()
+            key = f"mock_llm:{self.provider}:{int(now // 60)}"
+            pipe = redis.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, 120)
+            count = pipe.execute()[0]
+        except Exception as e:
+            logger.warning(f"[mock:{self.provider}] 분당 요청 수 확인 실패: {e}")
+            return True, 0, reset
+        return count <= self.requests_per_minute, max(0, self.requests_per_minute - count), reset
+
+    def _plan(self) -> Tuple[float, Optional[Exception], Dict[str, str]]:
+        # (대기 시간, 발생시킬 예외, 응답 헤더)
+        allowed, remaining, reset = self._admit()
+        if not allowed:
+            return RATE_LIMIT_LATENCY, rate_limit_error(self.provider, self.requests_per_minute, 0, reset), {}
+
+        with self._lock:
+            fault, latency_noise = self._rng.random(), self._rng.gauss(0, 1)
+        if fault < self.rate_limit_rate:
+            return RATE_LIMIT_LATENCY, rate_limit_error(self.provider, self.requests_per_minute, remaining, 1.0), {}
+        if fault < self.rate_limit_rate + self.timeout_rate:
+            return self.timeout_seconds, timeout_error(self.provider), {}
+
+        headers = _rate_limit_headers(self.provider, self.requests_per_minute, remaining, reset) if self.requests_per_minute > 0 else {}
+        headers.pop("retry-after", None)
+        return self.latency_median * math.exp(self.latency_sigma * latency_noise), None, headers
+
+    def _result(self, messages: List[BaseMessage], headers: Dict[str, str], **kwargs: Any) -> ChatResult:
+        text = _prompt_text(messages)
+        content, tool_calls = mock_response(text, kwargs.get("tools"))
+        input_tokens = max(1, len(text) // 4)
+        output_tokens = max(1, len(content or json.dumps([call["args"] for call in tool_calls], ensure_ascii=False)) // 4)
+        message = AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        )
+        generation_info = {"headers": headers} if self.include_response_headers and headers else None
+        return ChatResult(generations=[ChatGeneration(message=message, generation_info=generation_info)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay, error, headers = self._plan()
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return self._result(messages, headers, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay, error, headers = await asyncio.to_thread(self._plan)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self._result(messages, headers, **kwargs)
+
+
+class MockEmbeddings(Embeddings):
+    """
+    문자 3-gram 특징 해싱으로 만든 결정적 임베딩입니다. (정규화된 벡터, 요청마다 latency초 대기)
+    """
+
+    def __init__(self, dimensions: int, latency: float = 0.0, seed: int = 0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.seed = seed
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        normalized = " ".join(text.split()).lower()
+        for i in range(max(1, len(normalized) - 2)):
+            value = _digest(f"{self.seed}:{normalized[i:i + 3]}")
+            vector[value % self.dimensions] += 1.0 if (value >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+def mock_profile(provider: str) -> Dict[str, Any]:
+    """
+    모의 모델 설정 (MOCK_LLM_* 기본값에 MOCK_LLM_PROFILES의 제공자별 값을 덮어씀)
+    """
+    profile: Dict[str, Any] = {
+        "latency_median": settings.MOCK_LLM_LATENCY_MEDIAN,
+        "latency_sigma": settings.MOCK_LLM_LATENCY_SIGMA,
+        "rate_limit_rate": settings.MOCK_LLM_RATE_LIMIT_RATE,
+        "timeout_rate": settings.MOCK_LLM_TIMEOUT_RATE,
+        "timeout_seconds": settings.MOCK_LLM_TIMEOUT_SECONDS,
+        "requests_per_minute": settings.MOCK_LLM_RPM,
+        "seed": settings.MOCK_SEED,
+    }
+    if settings.MOCK_LLM_PROFILES:
+        profile.update(json.loads(settings.MOCK_LLM_PROFILES).get(provider, {}))
+    return profile
+
+
+def create_mock_chat_model(provider: str, model: str, options: Dict[str, Any]) -> MockChatModel:
+    return MockChatModel(provider=provider, model_name=f"mock-{model}", **mock_profile(provider), **options)
@@ -0,0 +1,224 @@
+# LLM 제공자별 Redis 토큰 버킷 (모든 워커가 공유하는 분당 요청 수/토큰 수 제한)
+import asyncio
+from contextvars import ContextVar
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 버킷 여러 개(요청 수, 토큰 수)를 한 번에 확인하고, 모두 충분할 때만 차감합니다.
+# ARGV: 버킷마다 (최대 용량, 초당 충전량, 차감량), 반환값: 기다려야 하는 시간(초, 0이면 획득)
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local wait = 0
+local levels = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 1])
+    local rate = tonumber(ARGV[(i - 1) * 3 + 2])
+    local cost = tonumber(ARGV[(i - 1) * 3 + 3])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+for i = 1, #KEYS do
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - tonumber(ARGV[(i - 1) * 3 + 3])
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 300)
+end
+return tostring(wait)
+"""
+
+# 실제 사용량과 예상 사용량의 차이만큼 버킷을 조정합니다. (음수면 반환, 최대 용량의 -1배까지 빚을 허용)
+ADJUST_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+tokens = math.max(-capacity, math.min(capacity, tokens - amount))
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 300)
+return tostring(tokens)
+"""
+
+# 한 번에 기다리는 최대 시간(초), 기다린 뒤 다시 확인
+MAX_WAIT_STEP = 1.0
+
+# 응답 시간을 측정 중인 LLM 호출에서 rate limit으로 기다린 시간(초)을 누적할 리스트 (hedging.provider_call_timer에서 설정)
+# LangChain은 체인 단계를 복사한 컨텍스트에서 실행하므로 값을 바꾸지 않고 리스트 내용을 바꿉니다.
+rate_limit_waits: ContextVar[Optional[List[float]]] = ContextVar("rate_limit_waits", default=None)
+
+
+def _record_wait(seconds: float) -> None:
+    waits = rate_limit_waits.get()
+    if waits is not None:
+        waits.append(seconds)
+
+
+class RedisTokenBucketRateLimiter(BaseRateLimiter):
+    """
+    제공자별 분당 요청 수(RPM)와 분당 토큰 수(TPM) 토큰 버킷을 Redis에 두고, 모든 워커가 LLM 호출 전에 획득합니다.
+    요청 시점에는 토큰 사용량을 알 수 없으므로 예상 토큰 수를 차감하고, 응답 후 실제 사용량과의 차이를 조정합니다.
+    Redis에 접근할 수 없으면 제한 없이 호출합니다.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        estimated_tokens: int,
+        headroom: float = 1.0,
+    ):
+        self.provider = provider
+        self.requests_per_minute = requests_per_minute * headroom
+        self.tokens_per_minute = tokens_per_minute * headroom
+        self.estimated_tokens = estimated_tokens
+        self.requests_key = f"rate_limit:{provider}:requests"
+        self.tokens_key = f"rate_limit:{provider}:tokens"
+
+    def _buckets(self) -> Tuple[List[str], List[float]]:
+        keys: List[str] = []
+        args: List[float] = []
+        if self.requests_per_minute > 0:
+            keys.append(self.requests_key)
+            args += [self.requests_per_minute, self.requests_per_minute / 60, 1]
+        if self.tokens_per_minute > 0:
+            keys.append(self.tokens_key)
+            args += [self.tokens_per_minute, self.tokens_per_minute / 60, min(self.estimated_tokens, self.tokens_per_minute)]
+        return keys, args
+
+    def try_acquire(self) -> float:
+        """
+        버킷에서 한 번 획득을 시도하고 기다려야 하는 시간(초)을 반환합니다. (0이면 획득)
+        """
+        keys, args = self._buckets()
+        if not keys:
+            return 0.0
+        try:
+            redis = get_redis_client()
+            return float(redis.eval(ACQUIRE_SCRIPT, len(keys), *keys, *args))
+        except Exception as e:
+            logger.warning(f"[{self.provider}] rate limit 버킷 확인 실패, 제한 없이 호출합니다: {e}")
+            return 0.0
+
+    def _next_wait(self, wait: float) -> float:
+        # 여러 워커가 동시에 깨어나지 않도록 약간의 지터 추가
+        return min(wait, MAX_WAIT_STEP) + random.uniform(0, 0.05)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                _record_wait(time.monotonic() - start)
+                return True
+            if not blocking:
+                return False
+            time.sleep(self._next_wait(wait))
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        while True:
+            # Redis 호출이 이벤트 루프를 막지 않도록 스레드에서 실행
+            wait = await asyncio.to_thread(self.try_acquire)
+            if wait <= 0:
+                _record_wait(time.monotonic() - start)
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(self._next_wait(wait))
+
+    def record_usage(self, total_tokens: int) -> None:
+        """
+        응답의 실제 토큰 사용량을 반영합니다. (예상보다 많이 쓰면 추가 차감, 적게 쓰면 반환)
+        """
+        if self.tokens_per_minute <= 0:
+            return
+        try:
+            redis = get_redis_client()
+            redis.eval(
+                ADJUST_SCRIPT, 1, self.tokens_key,
+                self.tokens_per_minute, self.tokens_per_minute / 60, total_tokens - min(self.estimated_tokens, self.tokens_per_minute),
+            )
+        except Exception as e:
+            logger.warning(f"[{self.provider}] rate limit 토큰 사용량 반영 실패: {e}")
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    LLM 응답의 토큰 사용량을 rate limiter에 반영하는 콜백입니다.
+    """
+
+    def __init__(self, rate_limiter: RedisTokenBucketRateLimiter):
+        self.rate_limiter = rate_limiter
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        total_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    total_tokens += usage.get("total_tokens", 0)
+        if not total_tokens and response.llm_output:
+            total_tokens = (response.llm_output.get("token_usage") or {}).get("total_tokens", 0)
+        if total_tokens:
+            self.rate_limiter.record_usage(total_tokens)
+
+
+# 제공자별 (분당 요청 수, 분당 토큰 수) 설정, 0이면 제한하지 않음
+PROVIDER_LIMITS: Dict[str, Tuple[int, int]] = {
+    "openai": (settings.OPENAI_RPM, settings.OPENAI_TPM),
+    "anthropic": (settings.CLAUDE_RPM, settings.CLAUDE_TPM),
+    "google": (settings.GEMINI_RPM, settings.GEMINI_TPM),
+    "xai": (settings.GROK_RPM, settings.GROK_TPM),
+}
+
+
+def create_rate_limiter(provider: str) -> Optional[RedisTokenBucketRateLimiter]:
+    requests_per_minute, tokens_per_minute = PROVIDER_LIMITS[provider]
+    if requests_per_minute <= 0 and tokens_per_minute <= 0:
+        return None
+    return RedisTokenBucketRateLimiter(
+        provider,
+        requests_per_minute,
+        tokens_per_minute,
+        settings.LLM_ESTIMATED_TOKENS_PER_REQUEST,
+        settings.RATE_LIMIT_HEADROOM,
+    )
+
+
+# 같은 제공자의 모델(분류용, 평가용)은 하나의 버킷을 공유
+rate_limiters: Dict[str, Optional[RedisTokenBucketRateLimiter]] = {
+    provider: create_rate_limiter(provider) for provider in PROVIDER_LIMITS
+}
+
+
+def rate_limit_options(provider: str) -> Dict[str, Any]:
+    """
+    LLM 모델 생성자에 전달할 rate limiter 및 사용량 콜백 옵션을 반환합니다. (제한이 없으면 빈 dict)
+    """
+    rate_limiter = rate_limiters[provider]
+    if rate_limiter is None:
+        return {}
+    return {"rate_limiter": rate_limiter, "callbacks": [TokenUsageCallback(rate_limiter)]}
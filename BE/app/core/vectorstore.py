@@ -0,0 +1,171 @@
+# 세션별 벡터 저장소 로딩 및 워커 프로세스 캐시
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from langchain_community.vectorstores import FAISS
+from app.core.config import settings
+from app.core.embeddings import embeddings_openai
+from app.core.mmap_store import METADATA_FILE, MmapVectorStore, has_native_store
+from app.core.redis import get_redis_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# FAISS.save_local이 생성하는 파일, export_native_store가 마지막에 교체하는 저장소 정보 파일
+INDEX_FILES = ("index.faiss", "index.pkl", METADATA_FILE)
+
+
+def get_vectorstore_path(session_id: str) -> str:
+    """
+    Redis에 저장된 세션의 벡터 저장소 경로를 반환합니다.
+    """
+    redis = get_redis_client()
+    path = redis.get(f"vectorstore:{session_id}:path")
+    if path is None:
+        raise Exception(f"{session_id}에 해당하는 벡터 저장소가 없습니다.")
+    return path.decode("utf-8") if isinstance(path, bytes) else path
+
+
+def get_index_version(session_id: str) -> int:
+    """
+    분류 체계가 저장될 때마다 증가하는 세션의 인덱스 버전을 반환합니다.
+    """
+    redis = get_redis_client()
+    version = redis.get(f"vectorstore:{session_id}:version")
+    return int(version) if version else 0
+
+
+def get_taxonomy_hash(session_id: str) -> Optional[str]:
+    """
+    세션에 저장된 분류 체계 내용의 해시를 반환합니다. (저장된 적이 없으면 None)
+    같은 내용의 분류 체계는 세션이나 인덱스 버전과 상관없이 같은 값을 가집니다.
+    """
+    redis = get_redis_client()
+    return redis.get(f"vectorstore:{session_id}:content_hash")
+
+
+def get_index_mtime(path: str) -> int:
+    """
+    벡터 저장소 파일들의 최종 수정 시각(ns)을 반환합니다.
+    save_standard가 디렉터리를 다시 쓰면 값이 바뀌므로 캐시 무효화 기준으로 사용합니다.
+    """
+    mtimes = []
+    for filename in INDEX_FILES:
+        file_path = os.path.join(path, filename)
+        if os.path.exists(file_path):
+            mtimes.append(os.stat(file_path).st_mtime_ns)
+    if not mtimes:
+        raise Exception(f"벡터 저장소 파일이 존재하지 않습니다: {path}")
+    return max(mtimes)
+
+
+def _store_size(store: Any) -> Tuple[int, int]:
+    # (벡터 개수, 대략적인 벡터 바이트 수)
+    if isinstance(store, MmapVectorStore):
+        ann_bytes = os.path.getsize(store.ann_path) if store.ann is not None else 0
+        return store.ntotal, store.vectors.nbytes + ann_bytes
+    return store.index.ntotal, store.index.ntotal * store.index.d * 4
+
+
+class VectorStoreCache:
+    """
+    워커 프로세스 내에서 로드된 벡터 저장소를 보관하는 크기 제한 LRU 캐시입니다.
+    키는 (session_id, 경로, 인덱스 버전, 수정 시각)이며, 같은 세션의 오래된 버전은 새 버전이 로드될 때 제거됩니다.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._stores: "OrderedDict[Tuple[str, str, int, int], Any]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple[str, str, int, int]) -> Optional[Any]:
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                self.misses += 1
+                return None
+            self._stores.move_to_end(key)
+            self.hits += 1
+            return store
+
+    def put(self, key: Tuple[str, str, int, int], store: Any) -> None:
+        with self._lock:
+            # 같은 세션의 이전 버전 제거
+            for stale_key in [k for k in self._stores if k[0] == key[0] and k != key]:
+                del self._stores[stale_key]
+                self.invalidations += 1
+
+            self._stores[key] = store
+            self._stores.move_to_end(key)
+
+            # 용량 초과 시 가장 오래 사용하지 않은 저장소 제거
+            while len(self._stores) > self.max_size:
+                evicted_key, _ = self._stores.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"벡터 저장소 캐시 제거: {evicted_key[0]} ({self.stats()})")
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            for stale_key in [k for k in self._stores if k[0] == session_id]:
+                del self._stores[stale_key]
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = [_store_size(store) for store in self._stores.values()]
+            total_vectors = sum(count for count, _ in sizes)
+            approx_bytes = sum(size for _, size in sizes)
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._stores),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "vectors": total_vectors,
+                "approx_bytes": approx_bytes,
+            }
+
+
+vectorstore_cache = VectorStoreCache(settings.VECTORSTORE_CACHE_SIZE)
+
+
+def load_vectorstore(session_id: str):
+    """
+    세션의 벡터 저장소를 캐시에서 가져오고, 없거나 디스크의 저장소가 바뀌었으면 새로 로드합니다.
+    """
+    path = get_vectorstore_path(session_id)
+    key = (session_id, path, get_index_version(session_id), get_index_mtime(path))
+
+    vector_store = vectorstore_cache.get(key)
+    if vector_store is not None:
+        return vector_store
+
+    # 메모리 매핑 저장소가 있으면 우선 사용하고, 없으면(이전 형식) FAISS pickle 로드
+    vector_store = None
+    if has_native_store(path):
+        try:
+            vector_store = MmapVectorStore(
+                path,
+                embeddings_openai,
+                branches=settings.HIERARCHICAL_SEARCH_BRANCHES,
+                min_hierarchical_size=settings.HIERARCHICAL_SEARCH_MIN_VECTORS,
+            )
+            logger.info(f"메모리 매핑 벡터 저장소 로드: {path}")
+        except Exception as e:
+            logger.warning(f"메모리 매핑 벡터 저장소 로드 실패, FAISS index로 대체합니다: {e}")
+
+    if vector_store is None:
+        logger.info(f"FAISS index 로드: {path}")
+        vector_store = FAISS.load_local(path, embeddings_openai, allow_dangerous_deserialization=True)
+
+    vectorstore_cache.put(key, vector_store)
+    return vector_store
@@ -1,6 +1,6 @@
 from typing import Any, Dict, List
 from fastapi import UploadFile
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 # 특허 정보를 위한 Pydantic 모델
 class Patent(BaseModel):
@@ -29,6 +29,35 @@ class ClassificationSchema(BaseModel):
     smallCode: str
     smallTitle: str
 
+class BatchClassificationItem(ClassificationSchema):
+    applicationNumber: str
+
+class BatchClassificationSchema(BaseModel):
+    results: List[BatchClassificationItem]
+
+# LLM 평가 점수로 허용하는 값
+EVALUATION_SCORES = (0.0, 0.5, 1.0)
+
+def snap_evaluation_score(value: float) -> float:
+    # 허용 점수 중 가장 가까운 값으로 맞춤
+    return min(EVALUATION_SCORES, key=lambda score: abs(score - float(value)))
+
+class EvaluationSchema(BaseModel):
+    analysis: str = Field(..., description="유사도 기반 추천 분류 체계와 현재 분류 결과 비교 분석")
+    score: float = Field(..., description="평가 점수, 0.0(부적절), 0.5(부분적으로 적절), 1.0(완벽하게 적절) 중 하나")
+    reason: str = Field(..., description="분석을 1줄 요약한 평가 이유")
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def snap_score(cls, value):
+        return snap_evaluation_score(value)
+
+class BatchEvaluationItem(EvaluationSchema):
+    applicationNumber: str
+
+class BatchEvaluationSchema(BaseModel):
+    results: List[BatchEvaluationItem]
+
 class LLMClassificationResult(BaseModel):
     name: str = Field(..., description="LLM 이름 (GPT, Claude, Gemini, Grok)")
     patents: List[Patent] = Field(..., description="분류된 특허 목록")
@@ -1,3 +1,4 @@
+from typing import Any, Dict, Optional
 from pydantic import BaseModel, Field
 
 class Progress(BaseModel):
@@ -7,4 +8,5 @@ class Progress(BaseModel):
 
 class Message(BaseModel):
     status: str = Field(..., )
-    message: str = Field(..., )
\ No newline at end of file
+    message: str = Field(..., )
+    stats: Optional[Dict[str, Any]] = Field(None, description="작업 통계 (LLM 호출 생략 비율 등)")
\ No newline at end of file
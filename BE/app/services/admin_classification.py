@@ -3,108 +3,42 @@ from datetime import datetime
 import logging
 import json
 import math
-import re
 from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 from fastapi import Depends, HTTPException
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
-from langchain.schema.output_parser import StrOutputParser
-from langchain.output_parsers import PydanticOutputParser
 from app.core.redis import get_redis_client
-from app.schemas.classification import ClassificationSchema, Patent
+from app.schemas.classification import Patent
 from app.core.config import settings
 from app.core.llm import classification_llms, reasoning_llms
 from app.schemas.message import Message, Progress
+from app.services.evaluation import aevaluate_with_llm
+from app.services.pipeline import ClassificationPipeline, get_classification_pipeline, unclassified
+from app.services.result_cache import cache_classification, get_cached_classification, get_classification_cache_key
 
 logger = logging.getLogger(__name__)
 
 # 유사도 평가 기준점 설정
 THRESHOLD = 0.5  # 단일 임계값으로 변경
 
-async def classify_with_llm(llm: Any, retriever: Any, patent_info: str) -> Dict[str, str]:
+async def classify_with_llm(pipeline: ClassificationPipeline, retriever: Any, patent_info: str, application_number: str) -> Tuple[Dict[str, str], bool]:
     """
-    특정 LLM을 사용하여 특허를 분류합니다.
+    특정 LLM의 분류 체인으로 특허를 분류합니다.
+    반환값: (분류 결과, 응답을 파싱했는지 여부), 파싱에 실패하면 미분류 결과를 반환합니다.
     """
-    # 출력 파서 정의
-    parser = PydanticOutputParser(pydantic_object=ClassificationSchema)
+    # 유사한 분류 체계 검색
+    docs = await retriever.ainvoke(patent_info)
     
-    # 프롬프트 템플릿 정의
-    template = """
-    다음은 특허 분류 데이터베이스에서 검색된 유사한 특허 정보입니다:
-    
-    {context}
-    
-    위 참고 정보를 바탕으로, 다음 특허 정보에 대한 대분류, 중분류, 소분류를 제공해주세요.
-    대분류 코드와 명칭, 중분류 코드와 명칭, 소분류 코드와 명칭을 모두 포함해야 합니다.
-    꼭 context안에 있는 기준으로 결과를 내세요.
-    해당하는게 없으면 미분류로 결과 내세요.
-    이유를 적지말고 응답 형식만 맞게 답 하세요.
-    
-    특허 정보: {query}
-    
-    너는 다음 JSON 형태로만 응답해야 해: {format_instructions}
-    """
-
-    prompt = ChatPromptTemplate.from_template(template)
-    
-    # 메타데이터를 포함한 형식으로 문서 포맷팅
-    def format_docs(docs: List[Any]) -> str:
-        formatted_docs = []
-        for doc in docs:
-            metadata = doc.metadata
-            formatted_doc = f"""
-분류 정보:
-- 코드: {metadata.get('code', '')}
-- 명칭: {metadata.get('name', '')}
-- 레벨: {metadata.get('level', '')}
-- 상위 코드: {metadata.get('parent_code', '')}
-- 상위 명칭: {metadata.get('parent_name', '')}
-- 설명: {metadata.get('description', '')}
+    # 체인 실행 (LLM 에러는 호출한 쪽으로 전달)
+    result = await pipeline.ainvoke(docs, patent_info)
 
-{doc.page_content}
-"""
-            formatted_docs.append(formatted_doc)
-        return "\n\n---\n\n".join(formatted_docs)
-    
-    rag_chain = (
-        {
-            "context": retriever | format_docs,
-            "query": RunnablePassthrough(),
-            "format_instructions": lambda _: parser.get_format_instructions()
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    # 체인 실행
-    result = await rag_chain.ainvoke(patent_info)
-    
     # 결과 파싱
     try:
-        cleaned = re.sub(r"```(?:json)?\s*([\s\S]+?)\s*```", r"\1", result.strip())
-        parsed = json.loads(cleaned)
-
-        return {
-            "majorCode": parsed.get("majorCode", "미분류"),
-            "majorTitle": parsed.get("majorTitle", "미분류"),
-            "middleCode": parsed.get("middleCode", "미분류"),
-            "middleTitle": parsed.get("middleTitle", "미분류"),
-            "smallCode": parsed.get("smallCode", "미분류"),
-            "smallTitle": parsed.get("smallTitle", "미분류"),
-        }
+        return pipeline.parse(result, application_number), True
 
     except Exception as e:
         logger.error(f"분류 결과 파싱 중 오류: {str(e)}")
-        return {
-            "majorCode": "미분류",
-            "middleCode": "미분류",
-            "smallCode": "미분류",
-            "majorTitle": "미분류",
-            "middleTitle": "미분류",
-            "smallTitle": "미분류"
-        }
+        return unclassified(application_number), False
 
 async def evaluate_classification_by_vector(
     patent_info: str,
@@ -263,8 +197,13 @@ async def process_patent_classification(
         if not llm:
             raise HTTPException(status_code=400, detail=f"지원하지 않는 LLM 타입입니다: {llm_type}")
 
+        # 분류 체인은 작업 당 한 번만 생성
+        pipeline = get_classification_pipeline(llm, retriever.vectorstore)
+
         patents: List[Patent] = []
         evaluations: List[Dict[str, Any]] = []
+        cache_hits = 0
+        llm_calls = 0
 
         total_patents = len(df)
         
@@ -286,8 +225,17 @@ async def process_patent_classification(
             # 특허 정보 구성
             patent_info = f"특허명: {title} 요약: {abstract}"
             
-            # RAG를 통한 분류
-            classifications = await classify_with_llm(llm, retriever, patent_info)
+            # 같은 분류 체계, 같은 LLM으로 이전에 분류한 특허면 캐시된 결과 사용, 없으면 RAG를 통한 분류
+            cache_key = get_classification_cache_key(session_id, llm_type, patent_info)
+            classifications = get_cached_classification(cache_key)
+            if classifications is not None:
+                cache_hits += 1
+            else:
+                classifications, parsed = await classify_with_llm(pipeline, retriever, patent_info, application_number)
+                llm_calls += 1
+                # 파싱에 실패한 미분류 결과는 캐시하지 않음 (다음 작업에서 다시 분류)
+                if parsed:
+                    cache_classification(cache_key, classifications)
             def replace_na(value):
                 return value if value and value != "N/A" else "미분류"
         
@@ -380,9 +328,15 @@ async def process_patent_classification(
         redis.expire(evaluation_key, 86400)
         
         # 작업 완료 메시지
+        classified = cache_hits + llm_calls
         completion_data = Message(
             status="completed",
             message="분류 및 평가 작업이 완료되었습니다.",
+            stats={
+                "llm_calls": llm_calls,
+                "cache_hits": cache_hits,
+                "cache_hit_ratio": round(cache_hits / classified, 4) if classified else 0.0,
+            },
         )
 
         await progress_queue.put(completion_data.model_dump())  
@@ -458,9 +412,9 @@ async def evaluate_classification_by_reasoning(
     3. 이유: 분석을 1줄 요약하여 작성해주세요.
     
     [응답 예시]
-    분석: 분석 내용
-    점수: 0.5
-    이유: 유사도 기반 추천 분류 체계와 현재 분류 결과가 부분적으로 일치합니다.
+    analysis: 분석 내용
+    score: 0.5
+    reason: 유사도 기반 추천 분류 체계와 현재 분류 결과가 부분적으로 일치합니다.
 
     [주의사항]
     1. 반드시 분류 체계를 기반으로 평가해야 합니다.
@@ -468,7 +422,7 @@ async def evaluate_classification_by_reasoning(
         - 분류 체계에 없는 분류는 '미분류'로 간주합니다.
         - 주어진 분류 체계만으로 분류가 힘들 경우, '미분류'가 정답이 됩니다. 따라서 이런 경우 '미분류'는 높은 점수를 받습니다.
         - 반대로 주어진 분류 체계 내에서 분류가 가능한 경우, '미분류'는 낮은 점수를 받습니다.
-    3. 응답은 평가 필수 요구 사항의 포맷 [1. 분석 2. 점수 3. 이유]를 반드시 지켜야 합니다.
+    3. 응답은 평가 필수 요구 사항의 항목 [analysis(분석), score(점수), reason(이유)]를 반드시 모두 포함해야 합니다.
     """
 
     prompt = ChatPromptTemplate.from_template(template)
@@ -485,35 +439,11 @@ async def evaluate_classification_by_reasoning(
         similar_classifications=similar_classifications_text
     )
     
-    # 선택된 LLM 호출
-    response = await llm.ainvoke(filled_prompt)
-    
-    # 응답에서 점수 추출 (0.0~1.0 사이의 숫자)
-    try:
-        score_match = re.search(r'(?:점수|score)[:：\s]*(\d*\.?\d+)', response.content, re.IGNORECASE)
-        if score_match:
-            score = float(score_match.group(1))
-            # 0.0~1.0 범위로 정규화
-            score = max(0.0, min(1.0, score))
-        else:
-            # 이유(reason) 추출
-            reason_match = re.search(r"이유.*?[:：\s]\s*(.+?)(?:\n##|$)", response.content, re.DOTALL)
-            reason = reason_match.group(1).strip() if reason_match else response.content
-            logger.warning(f"점수를 찾을 수 없어 LLM에 이유를 재질문합니다. reason: {reason}")
-            score = await get_score_from_reason_with_llm(reason, llm)
-    except Exception as e:
-        logger.error(f"점수를 추출 중 오류 발생: {str(e)}")
-        score = 0.0
-
-    # 응답에서 평가 이유 추출
-    reason_match = re.search(r"이유.*?[:：\s]\s*(.+?)(?:\n##|$)", response.content, re.DOTALL)
-    reason = reason_match.group(1).strip() if reason_match else ""
-    logger.info(reason)
+    # 선택된 LLM을 구조화된 출력으로 호출 (형식이 잘못된 응답은 추가 호출 없이 로컬에서 복구)
+    evaluation = await aevaluate_with_llm(llm, filled_prompt)
+    logger.info(evaluation["reason"])
 
-    return {
-        "score": score,
-        "reason": reason
-    }
+    return evaluation
 
 def calculate_sample_size(total_population: int, confidence_level: float, margin_error: float) -> int:
     """
@@ -552,18 +482,3 @@ def calculate_sample_size(total_population: int, confidence_level: float, margin
     sample_size = min(round(sample_size), total_population)
     
     return sample_size
-
-async def get_score_from_reason_with_llm(reason_text, llm):
-    prompt = (
-        f"다음 설명은 분류에 대한 평가의 이유야. 이 설명을 보고 0.0, 0.5, 1.0 중 어떤 점수를 줬을지 추측해줘."
-        f"설명: {reason_text}"
-        f"점수만 숫자로 답변해줘."
-    )
-    response = await llm.ainvoke(prompt)
-    import re
-    match = re.search(r"\d*\.?\d+", response.content)
-    if match:
-        score = float(match.group())
-        return max(0.0, min(1.0, score))
-    else:
-        return 0.5  # 기본값
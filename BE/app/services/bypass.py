@@ -0,0 +1,33 @@
+# 검색 결과가 명확한 특허는 LLM 호출 없이 분류
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+
+def classify_from_context(context: Dict[str, Any], application_number: str) -> Optional[Dict[str, str]]:
+    """
+    가장 유사한 분류 체계가 소분류이고, 관련도 점수와 2순위와의 점수 차이가 기준 이상이면
+    해당 분류 체계의 메타데이터로 분류 결과를 만듭니다. 조건을 만족하지 않으면 None을 반환합니다.
+    """
+    if not settings.LLM_BYPASS_ENABLED or not context["hits"]:
+        return None
+
+    hits = context["hits"]
+    top = hits[0]
+    metadata = top["metadata"]
+    if metadata.get("level") != "소분류":
+        return None
+
+    # 2순위 결과가 없으면 점수 차이 조건은 만족한 것으로 봄
+    margin = top["score"] - hits[1]["score"] if len(hits) > 1 else top["score"]
+    if top["score"] < settings.LLM_BYPASS_MIN_SCORE or margin < settings.LLM_BYPASS_MIN_MARGIN:
+        return None
+
+    return {
+        "applicationNumber": application_number,
+        "majorCode": metadata.get("grand_parent_code") or "미분류",
+        "majorTitle": metadata.get("grand_parent_name") or "미분류",
+        "middleCode": metadata.get("parent_code") or "미분류",
+        "middleTitle": metadata.get("parent_name") or "미분류",
+        "smallCode": metadata.get("code") or "미분류",
+        "smallTitle": metadata.get("name") or "미분류",
+    }
@@ -1,13 +1,22 @@
 from datetime import datetime
+import json
 import logging
 import time
 from celery import chain, chord, group
 from langchain_openai import OpenAIEmbeddings
 import pandas as pd
 from langchain_community.vectorstores import FAISS
+from app.core.config import settings
 from app.core.redis import get_redis_client
 from app.schemas.message import Progress
-from app.tasks import classification_completion, classify_patent, collect_evaluation_results, evaluate_classification_by_reasoning, evaluate_classification_by_vector, evaluation_completion
+from app.services.dedup import group_duplicate_rows
+from app.services.job_input import save_job_input
+from app.services.job_stats import increment_job_stat, reset_job_stats
+from app.services.patent_embedding import get_patent_info
+from app.services.retrieval import get_index_signature, get_query_context_key
+from app.services.stragglers import reset_straggler_state
+from app.tasks import classification_completion, classify_and_evaluate_chunk, classify_patent, classify_patent_batch, classify_patent_chunk, collect_evaluation_results, dispatch_batch_evaluation, evaluate_classification_by_reasoning, evaluation_completion, evaluation_failed, finalize_classification, watch_stragglers
+from app.workers.async_worker import enqueue_classification_jobs
 
 # 로그
 logging.basicConfig(level=logging.INFO)
@@ -41,38 +50,109 @@ def process_patent_classification(
     redis.set(f"{session_id}:progress", progress_data.model_dump_json())
     redis.set(f"{session_id}:total_count", total_patents)
     redis.set(f"{session_id}:progress_counter", 0)
+    reset_job_stats(session_id)
+
+    # 현재 분류 체계 인덱스 식별값 (특허별 검색 결과 키에 사용)
+    signature = get_index_signature(session_id)
+
+    # 분류할 행의 특허 정보
+    patent_infos = {}
+    for row_index, (index, row) in enumerate(df.iterrows()):
+        patent_info = get_patent_info(row)
+        if patent_info is None:
+            logger.warning(f"[{index}] 제목과 요약이 비어있어 건너뜀")
+            continue
+        patent_infos[row_index] = patent_info
+
+    # 중복 특허는 대표 행만 분류하고, 결과는 classification_completion에서 나머지 행에 복사
+    duplicates_key = f"{session_id}:duplicates"
+    redis.delete(duplicates_key)
+    if settings.DEDUP_ENABLED:
+        groups = group_duplicate_rows(session_id, patent_infos)
+    else:
+        groups = {row_index: [] for row_index in patent_infos}
+
+    collapsed = sum(len(members) for members in groups.values())
+    if collapsed:
+        logger.info(f"[{session_id}] 중복 특허 {collapsed}건은 대표 특허의 분류 결과를 사용")
+        increment_job_stat(session_id, "deduplicated", collapsed)
         
     # 개별 특허 분류 태스크 생성
     tasks = []
+    items = []
+    duplicates = {}
 
-    # 각 행에 대해 RAG 처리 및 분류 추가
-    for index, row in df.iterrows():
+    # 대표 행에 대해 RAG 처리 및 분류 추가
+    for row_index, members in groups.items():
+        index = df.index[row_index]
         try:
+            row = df.iloc[row_index]
             application_number = row.get('출원번호', f"KR10-XXXX-{index:07d}")
-            title = row.get('특허명', row.get('발명의 명칭', ''))
-            abstract = row.get('요약', '')
+            patent_info = patent_infos[row_index]
 
-            if not title and not abstract:
-                logger.warning(f"[{index}] 제목과 요약이 비어있어 건너뜀")
-                continue
+            # 대표 특허 출원번호 -> 같은 분류 결과를 사용할 행 위치
+            if members:
+                duplicates.setdefault(str(application_number), []).extend(members)
 
-            patent_info = f"특허명: {title} 요약: {abstract}"
-
-            # celery 
-            logger.info(f"[{index}] Celery 태스크 시작")
-            tasks.append(
-                classify_patent.s(LLM, session_id, patent_info, application_number, False)
-            )   
+            context_key = get_query_context_key(session_id, patent_info, signature)
+            items.append({
+                "patent_info": patent_info,
+                "application_number": application_number,
+                "context_key": context_key,
+                "row_index": row_index,
+            })
         
         except Exception as e:
             logger.error(f"[{index}] 에러 발생: {e}")
 
+    # celery (CLASSIFICATION_CHUNK_SIZE건씩 하나의 태스크로 처리, CLASSIFICATION_BATCH_SIZE건씩 하나의 프롬프트로 분류, 1이면 특허마다 분류)
+    async_worker = settings.CLASSIFICATION_WORKER == "async"
+    chunk_size = settings.CLASSIFICATION_CHUNK_SIZE
+    batch_size = settings.CLASSIFICATION_BATCH_SIZE
+    if async_worker:
+        logger.info(f"[{session_id}] 비동기 워커 큐에 특허 {len(items)}건 추가")
+    elif chunk_size > 1:
+        # 특허 정보는 작업 입력으로 한 번만 저장하고 태스크에는 작업 ID와 행 범위만 전달
+        job_id = save_job_input(items)
+        for start in range(0, len(items), chunk_size):
+            tasks.append(classify_patent_chunk.s(LLM, session_id, job_id, start, min(start + chunk_size, len(items))))
+    elif batch_size > 1:
+        for start in range(0, len(items), batch_size):
+            tasks.append(classify_patent_batch.s(LLM, session_id, items[start:start + batch_size]))
+    else:
+        for item in items:
+            tasks.append(
+                classify_patent.s(LLM, session_id, item["patent_info"], item["application_number"], False, item["context_key"], item["row_index"])
+            )
+    logger.info(f"[{session_id}] Celery 태스크 {len(tasks)}개 시작 (특허 {len(items)}건)")
+
+    if duplicates:
+        redis.hset(duplicates_key, mapping={number: json.dumps(members) for number, members in duplicates.items()})
+
+    # 진행률은 실제로 분류하는 특허 수 기준
+    redis.set(f"{session_id}:total_count", max(len(items), 1))
+
     redis.expire(f"{session_id}:time", 86400)
     redis.expire(f"{session_id}:progress", 86400)
     redis.expire(f"{session_id}:total_count", 86400)
     redis.expire(f"{session_id}:progress_counter", 86400)
+    redis.expire(duplicates_key, 86400)
+
+    # 특허별 결과, 완료 표시 초기화 (늦게 끝나는 특허 재전송은 Celery 태스크로 실행할 때만 사용)
+    reset_straggler_state(session_id, [] if async_worker else items)
 
-    chord(group(tasks))(classification_completion.s(session_id))    
+    if async_worker:
+        enqueue_classification_jobs(session_id, LLM, False, items)
+    elif settings.INCREMENTAL_COLLECTION_ENABLED:
+        # 태스크가 특허별 결과를 Redis에 저장하고, 마지막 결과를 저장한 태스크가 finalize_classification 실행
+        if tasks:
+            group(tasks).apply_async()
+        else:
+            finalize_classification.delay(session_id)
+    else:
+        chord(group(tasks))(classification_completion.s(session_id))
+        if settings.STRAGGLER_REDISPATCH_ENABLED and items:
+            watch_stragglers.apply_async((LLM, session_id), countdown=settings.STRAGGLER_CHECK_INTERVAL)
         
 # 특허 분류 및 평가를 celery에서 실행하는 함수
 def process_patent_classification_evaluation(
@@ -103,41 +183,60 @@ def process_patent_classification_evaluation(
     redis.set(f"{key}:progress", progress_data.model_dump_json())
     redis.set(f"{key}:total_count", total_patents)
     redis.set(f"{key}:progress_counter", 0)
+    reset_job_stats(key)
+
+    # 현재 분류 체계 인덱스 식별값 (특허별 검색 결과 키에 사용)
+    signature = get_index_signature(session_id)
         
     # 개별 특허 분류 태스크 생성
     tasks = []
+    items = []
+
+    # 평가를 여러 특허씩 묶으면 분류가 모두 끝난 뒤 평가 태스크를 따로 실행
+    batch_evaluation = settings.EVALUATION_BATCH_SIZE > 1
+
+    # CLASSIFICATION_CHUNK_SIZE건씩 하나의 태스크에서 분류 -> LLM 평가 -> 결과 합침 실행
+    chunk_size = settings.CLASSIFICATION_CHUNK_SIZE
 
     # 각 행에 대해 RAG 처리 및 분류 추가
-    for index, row in df.iterrows():
+    for row_index, (index, row) in enumerate(df.iterrows()):
         try:
             application_number = row.get('출원번호', f"KR10-XXXX-{index:07d}")
-            title = row.get('특허명', row.get('발명의 명칭', ''))
-            abstract = row.get('요약', '')
+            patent_info = get_patent_info(row)
 
-            if not title and not abstract:
+            if patent_info is None:
                 logger.warning(f"[{index}] 제목과 요약이 비어있어 건너뜀")
                 continue
 
-            patent_info = f"특허명: {title} 요약: {abstract}"
-
             # celery 
             logger.info(f"[{index}] Celery 태스크 시작")
             
+            # 특허 임베딩 및 검색 결과는 한 번만 계산하고 키로 각 단계에 전달
+            context_key = get_query_context_key(session_id, patent_info, signature)
+            items.append({
+                "patent_info": patent_info,
+                "application_number": application_number,
+                "context_key": context_key,
+                "row_index": row_index,
+            })
+            if chunk_size > 1:
+                continue
+
             # 특허 분류
-            initial_task = classify_patent.s(LLM, session_id, patent_info, application_number, True)
+            initial_task = classify_patent.s(LLM, session_id, patent_info, application_number, True, context_key, row_index)
+            if batch_evaluation:
+                tasks.append(initial_task)
+                continue
             
-            # 평가 실행
-            evaluation_tasks = group(
-                evaluate_classification_by_vector.s(LLM, session_id, patent_info, application_number),
-                evaluate_classification_by_reasoning.s(LLM, session_id, patent_info, application_number)
-            )
+            # LLM 평가 실행 (벡터 기반 평가는 evaluation_completion에서 작업 단위로 일괄 수행)
+            evaluation_task = evaluate_classification_by_reasoning.s(LLM, session_id, patent_info, application_number, context_key, row_index)
 
             # 진행률 업데이트
             finalize_task = collect_evaluation_results.s(LLM, session_id, application_number)
 
             workflow = chain(
                 initial_task,
-                evaluation_tasks,
+                evaluation_task,
                 finalize_task
             )
 
@@ -151,4 +250,26 @@ def process_patent_classification_evaluation(
     redis.expire(f"{key}:total_count", 86400)
     redis.expire(f"{key}:progress_counter", 86400)
 
-    chord(group(tasks))(evaluation_completion.s(LLM, session_id))    
+    # 태스크가 최종 실패하면 chord 콜백이 실행되지 않으므로 진행률을 오류로 바꿈
+    on_failure = evaluation_failed.s(LLM, session_id)
+
+    # 비동기 워커는 특허마다 분류 -> LLM 평가 -> 결과 합침을 한 번에 실행
+    if settings.CLASSIFICATION_WORKER == "async":
+        enqueue_classification_jobs(session_id, LLM, True, items)
+    elif chunk_size > 1:
+        # 특허 정보는 작업 입력으로 한 번만 저장하고 태스크에는 작업 ID와 행 범위만 전달
+        job_id = save_job_input(items)
+        tasks = [
+            classify_and_evaluate_chunk.s(LLM, session_id, job_id, start, min(start + chunk_size, len(items)))
+            for start in range(0, len(items), chunk_size)
+        ]
+        logger.info(f"[{key}] Celery 태스크 {len(tasks)}개 시작 (특허 {len(items)}건)")
+        if batch_evaluation:
+            chord(group(tasks))(dispatch_batch_evaluation.s(LLM, session_id, None, job_id).on_error(on_failure))
+        else:
+            chord(group(tasks))(evaluation_completion.s(LLM, session_id).on_error(on_failure))
+    elif batch_evaluation:
+        # 분류 -> EVALUATION_BATCH_SIZE건씩 LLM 평가 및 결과 합침 -> 완료 처리
+        chord(group(tasks))(dispatch_batch_evaluation.s(LLM, session_id, items).on_error(on_failure))
+    else:
+        chord(group(tasks))(evaluation_completion.s(LLM, session_id).on_error(on_failure))    
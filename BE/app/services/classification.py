@@ -1,30 +1,29 @@
 import asyncio
 from datetime import datetime
+import hashlib
 import io
 import json
 import logging
 import os
-import re
-from typing import Any, Dict, List
-from langchain_openai import OpenAIEmbeddings
+from typing import Any, Dict, List, Optional
 import pandas as pd
 from langchain_community.vectorstores import FAISS
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
 
-from app.schemas.classification import ClassificationSchema, Patent
+from app.core.config import settings
+from app.core.embeddings import taxonomy_embeddings
+from app.core.index_profile import get_index_profile
+from app.core.mmap_store import export_native_store, read_store_profile
+from app.core.redis import get_redis_client
+from app.schemas.classification import Patent
 from app.schemas.message import Message, Progress
+from app.services.pipeline import ClassificationPipeline, get_classification_pipeline, unclassified
 
 # 로그
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-embeddings_openai = OpenAIEmbeddings(model="text-embedding-3-large", dimensions=3072)
-
 # 특허 분류 작업을 백그라운드에서 실행하는 함수
 async def process_patent_classification(
     session_id: str,
@@ -39,6 +38,9 @@ async def process_patent_classification(
         logger.info(f"시작")
         patents = []
         total_patents = len(df)
+
+        # 분류 체인은 작업 당 한 번만 생성
+        pipeline = get_classification_pipeline(llm, retriever.vectorstore)
         
         # 로그 추가
         start_time = datetime.now()
@@ -59,7 +61,7 @@ async def process_patent_classification(
             patent_info = f"특허명: {title} 요약: {abstract}"
             
             # RAG를 통한 분류
-            classifications = await classify_patent(llm, retriever, patent_info)
+            classifications = await classify_patent(pipeline, retriever, patent_info, application_number)
             
             # 원본 데이터프레임에 분류 결과 추가
             df.loc[index, '대분류코드'] = classifications["majorCode"]
@@ -153,111 +155,21 @@ async def process_patent_classification(
         await progress_queue.put(error_message.model_dump())
 
 # 특허 정보를 바탕으로 분류하는 함수
-async def classify_patent(llm, retriever, patent_info: str) -> Dict[str, str]:
-    
-    # 출력 파서 정의
-    parser = PydanticOutputParser(pydantic_object=ClassificationSchema)
-    
-    # 프롬프트 템플릿 정의
-    template = """
-    다음은 특허 분류 데이터베이스에서 검색된 유사한 특허 정보입니다:
-    
-    {context}
-    
-    위 참고 정보를 바탕으로, 다음 특허 정보에 대한 대분류, 중분류, 소분류를 제공해주세요.
-    대분류 코드와 명칭, 중분류 코드와 명칭, 소분류 코드와 명칭을 모두 포함해야 합니다.
-    꼭 context안에 있는 기준으로 결과를 내세요.
-    해당하는게 없으면 미분류로 결과 내세요.
-    이유를 적지말고 응답 형식만 맞게 답 하세요.
-    
-    특허 정보: {query}
-    
-    너는 다음 JSON 형태로만 응답해야 해: {format_instructions}
-    """
+async def classify_patent(pipeline: ClassificationPipeline, retriever, patent_info: str, application_number: str) -> Dict[str, str]:
+    # 유사한 분류 체계 검색
+    docs = await retriever.ainvoke(patent_info)
 
+    # 체인 실행 (LLM 에러는 호출한 쪽으로 전달)
+    result = await pipeline.ainvoke(docs, patent_info)
 
-    prompt = ChatPromptTemplate.from_template(template)
-    
-        # 메타데이터를 포함한 형식으로 문서 포맷팅
-    def format_docs(docs):
-        formatted_docs = []
-        for doc in docs:
-            metadata = doc.metadata
-            
-            # 문서 레벨에 따라 다르게 포맷팅
-            if metadata.get('level') == '중분류':
-                formatted_doc = f"""
-분류 정보:
-- 코드: {metadata.get('code', '')}
-- 명칭: {metadata.get('name', '')}
-- 레벨: {metadata.get('level', '')}
-- 상위 코드: {metadata.get('parent_code', '')}
-- 상위 명칭: {metadata.get('parent_name', '')}
-- 설명: {metadata.get('description', '')}
-
-{doc.page_content}
-"""
-            elif metadata.get('level') == '소분류':
-                formatted_doc = f"""
-분류 정보:
-- 코드: {metadata.get('code', '')}
-- 명칭: {metadata.get('name', '')}
-- 레벨: {metadata.get('level', '')}
-- 상위 코드: {metadata.get('parent_code', '')}
-- 상위 명칭: {metadata.get('parent_name', '')}
-- 최상위 코드: {metadata.get('grand_parent_code', '')}
-- 최상위 명칭: {metadata.get('grand_parent_name', '')}
-- 설명: {metadata.get('description', '')}
-
-{doc.page_content}
-"""
-            else:
-                # 기타 레벨이나 메타데이터가 없는 경우
-                formatted_doc = doc.page_content
-                
-            formatted_docs.append(formatted_doc)
-            
-        return "\n\n---\n\n".join(formatted_docs)
-    
-    rag_chain = (
-        {
-            "context": retriever | format_docs,
-            "query": RunnablePassthrough(),
-            "format_instructions": lambda _: parser.get_format_instructions()
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    # 체인 실행
-    result = await rag_chain.ainvoke(patent_info)
-    
     # 결과 파싱
     try:
-        cleaned = re.sub(r"```(?:json)?\s*([\s\S]+?)\s*```", r"\1", result.strip())
-        parsed = json.loads(cleaned)
-
-        return {
-            "majorCode": parsed.get("majorCode", "미분류"),
-            "majorTitle": parsed.get("majorTitle", "미분류"),
-            "middleCode": parsed.get("middleCode", "미분류"),
-            "middleTitle": parsed.get("middleTitle", "미분류"),
-            "smallCode": parsed.get("smallCode", "미분류"),
-            "smallTitle": parsed.get("smallTitle", "미분류"),
-        }
+        return pipeline.parse(result, application_number)
 
     except Exception as e:
-        print(f"분류 결과 파싱 중 오류: {str(e)}")
+        logger.error(f"분류 결과 파싱 중 오류: {str(e)}")
         # 파싱 실패 시 기본값 반환
-        return {
-            "majorCode": "미분류",
-            "middleCode": "미분류",
-            "smallCode": "미분류",
-            "majorTitle": "미분류",
-            "middleTitle": "미분류",
-            "smallTitle": "미분류"
-        }
+        return unclassified(application_number)
 
 
 def process_standards_for_vectordb(standards: List[Dict[Any, Any]]) -> List[Dict[Any, Any]]:
@@ -357,11 +269,96 @@ def create_faiss_database(documents: List[Dict[Any, Any]], session_id: str, embe
     texts = [doc['text'] for doc in documents]
     metadatas = documents  # 전체 문서를 메타데이터로 사용
     
-    # FAISS 벡터 데이터베이스 생성
+    # FAISS 벡터 데이터베이스 생성 (이전에 임베딩한 텍스트는 캐시에서 가져옴)
+    # 분류 코드를 문서 ID로 사용하여 이후 변경분만 갱신할 수 있도록 함
     vectordb = FAISS.from_texts(
         texts=texts,
-        embedding=embeddings_openai,
-        metadatas=metadatas
+        embedding=taxonomy_embeddings,
+        metadatas=metadatas,
+        ids=[doc['code'] for doc in documents]
     )
     
     return vectordb
+
+
+def update_faiss_database(vectordb: FAISS, documents: List[Dict[Any, Any]]) -> Dict[str, int]:
+    """
+    기존 FAISS 벡터 데이터베이스를 새 분류 체계와 코드 기준으로 비교하여
+    추가, 수정, 삭제된 분류만 벡터와 docstore에 반영합니다.
+    """
+    # 기존에 인덱싱된 분류 (코드 -> 문서 ID, 메타데이터)
+    indexed = {
+        doc.metadata.get('code'): (doc_id, doc.metadata)
+        for doc_id, doc in vectordb.docstore._dict.items()
+    }
+    new_documents = {doc['code']: doc for doc in documents}
+
+    removed = [code for code in indexed if code not in new_documents]
+    updated = [code for code in new_documents if code in indexed and indexed[code][1] != new_documents[code]]
+    added = [code for code in new_documents if code not in indexed]
+
+    # 삭제 및 수정된 분류의 기존 벡터 제거
+    stale_ids = [indexed[code][0] for code in removed + updated]
+    if stale_ids:
+        vectordb.delete(stale_ids)
+
+    # 수정 및 추가된 분류만 임베딩하여 추가
+    codes = updated + added
+    if codes:
+        vectordb.add_texts(
+            texts=[new_documents[code]['text'] for code in codes],
+            metadatas=[new_documents[code] for code in codes],
+            ids=codes
+        )
+
+    return {"added": len(added), "updated": len(updated), "removed": len(removed)}
+
+
+def get_taxonomy_content_hash(documents: List[Dict[Any, Any]]) -> str:
+    """
+    분류 체계 문서 내용의 해시를 계산합니다. (문서 순서와 상관없이 같은 내용이면 같은 값)
+    """
+    content = json.dumps(sorted(documents, key=lambda doc: doc['code']), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def save_faiss_database(documents: List[Dict[Any, Any]], session_id: str, index_profile: Optional[str] = None) -> FAISS:
+    """
+    세션의 FAISS 벡터 데이터베이스를 저장합니다.
+    이미 저장된 인덱스가 있으면 변경된 분류만 갱신하고, 인덱스 버전을 올려 워커 캐시를 무효화합니다.
+    index_profile을 지정하지 않으면 이전에 저장된 프로파일, 없으면 설정의 기본 프로파일을 사용합니다.
+    """
+    redis = get_redis_client()
+    save_dir = f"./vectorstores/{session_id}"
+    profile = get_index_profile(
+        index_profile or read_store_profile(save_dir) or settings.INDEX_PROFILE,
+        len(documents)
+    )
+
+    if os.path.exists(os.path.join(save_dir, "index.faiss")):
+        vectordb = FAISS.load_local(save_dir, taxonomy_embeddings, allow_dangerous_deserialization=True)
+        changes = update_faiss_database(vectordb, documents)
+        logger.info(f"[{session_id}] 분류 체계 인덱스 갱신: {changes}")
+    else:
+        vectordb = create_faiss_database(documents, session_id)
+        logger.info(f"[{session_id}] 분류 체계 인덱스 생성: {len(documents)}건")
+
+    # 로컬 경로에 저장 (세션별 디렉터리)
+    # FAISS 형식은 다음 저장 시 변경분 비교용, 메모리 매핑 형식은 워커 검색용
+    os.makedirs(save_dir, exist_ok=True)
+    vectordb.save_local(save_dir)
+    export_native_store(vectordb, save_dir, profile)
+    logger.info(f"[{session_id}] 분류 체계 인덱스 프로파일: {profile.name}")
+
+    # Redis에 경로, 인덱스 버전 및 분류 체계 내용 해시 저장
+    vector_key = f"vectorstore:{session_id}:path"
+    version_key = f"vectorstore:{session_id}:version"
+    content_hash_key = f"vectorstore:{session_id}:content_hash"
+    redis.set(vector_key, save_dir)
+    redis.incr(version_key)
+    redis.set(content_hash_key, get_taxonomy_content_hash(documents))
+    redis.expire(vector_key, 86400)
+    redis.expire(version_key, 86400)
+    redis.expire(content_hash_key, 86400)
+
+    return vectordb
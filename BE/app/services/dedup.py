@@ -0,0 +1,87 @@
+# 분류 전 중복 특허 묶기
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.redis import get_redis_client
+from app.services.patent_embedding import get_embedding_matrix_path
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 유사도 비교 시 한 번에 계산하는 행 수
+SIMILARITY_BLOCK_ROWS = 512
+
+
+def normalize_patent_info(patent_info: str) -> str:
+    """
+    공백, 대소문자, 전각/반각 차이를 없앤 특허 정보 문자열을 반환합니다.
+    """
+    text = unicodedata.normalize("NFKC", patent_info).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _text_hash(patent_info: str) -> str:
+    return hashlib.sha1(normalize_patent_info(patent_info).encode("utf-8")).hexdigest()
+
+
+def _merge_similar(session_id: str, representatives: List[int], threshold: float) -> Optional[Dict[int, int]]:
+    """
+    업로드 시 저장된 임베딩 행렬로 코사인 유사도가 threshold 이상인 대표 행을 앞쪽 대표 행에 합칩니다.
+    (합쳐지는 행 -> 남는 대표 행) 매핑을 반환하며, 임베딩 행렬이 없으면 None을 반환합니다.
+    """
+    redis = get_redis_client()
+    if redis.get(f"{session_id}:embeddings") is None:
+        return None
+
+    matrix = np.load(get_embedding_matrix_path(session_id), mmap_mode="r")
+    vectors = np.asarray(matrix[representatives], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+
+    merged: Dict[int, int] = {}
+    assigned = np.zeros(len(representatives), dtype=bool)
+    for start in range(0, len(representatives), SIMILARITY_BLOCK_ROWS):
+        similarities = vectors[start:start + SIMILARITY_BLOCK_ROWS] @ vectors.T
+        for offset, row in enumerate(similarities):
+            i = start + offset
+            if assigned[i]:
+                continue
+            # 뒤쪽의 아직 묶이지 않은 행 중 유사한 행을 현재 대표 행에 합침
+            candidates = np.flatnonzero(row[i + 1:] >= threshold) + i + 1
+            candidates = candidates[~assigned[candidates]]
+            assigned[candidates] = True
+            for j in candidates:
+                merged[representatives[j]] = representatives[i]
+    return merged
+
+
+def group_duplicate_rows(session_id: str, patent_infos: Dict[int, str]) -> Dict[int, List[int]]:
+    """
+    특허 정보가 같은 행(정규화한 텍스트 해시 기준)을 묶어 {대표 행 위치: [같은 그룹의 나머지 행 위치]}를 반환합니다.
+    DEDUP_SIMILARITY_THRESHOLD가 0보다 크면 임베딩 코사인 유사도가 기준 이상인 그룹도 함께 묶습니다.
+    """
+    groups: Dict[int, List[int]] = {}
+    representative_by_hash: Dict[str, int] = {}
+    for position, patent_info in patent_infos.items():
+        digest = _text_hash(patent_info)
+        if digest in representative_by_hash:
+            groups[representative_by_hash[digest]].append(position)
+        else:
+            representative_by_hash[digest] = position
+            groups[position] = []
+
+    threshold = settings.DEDUP_SIMILARITY_THRESHOLD
+    if threshold > 0 and len(groups) > 1:
+        merged = _merge_similar(session_id, list(groups.keys()), threshold)
+        if merged is None:
+            logger.info(f"[{session_id}] 임베딩 행렬이 없어 유사도 기준 중복 제거를 건너뜀")
+        else:
+            for position, representative in merged.items():
+                groups[representative].extend([position] + groups.pop(position))
+
+    return groups
@@ -0,0 +1,226 @@
+# LLM 평가 응답 (제공자의 구조화된 출력 사용, 형식이 잘못된 응답은 추가 LLM 호출 없이 로컬에서 복구)
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Dict, Optional, Tuple
+from app.core.circuit_breaker import acircuit_guard, circuit_guard
+from app.core.concurrency import allm_slot, get_llm_provider, llm_slot
+from app.core.redis import get_redis_client
+from app.schemas.classification import BatchEvaluationSchema, EvaluationSchema, snap_evaluation_score
+from app.services.job_stats import increment_job_stat
+from app.services.single_flight import asingle_flight, request_key, single_flight
+
+logger = logging.getLogger(__name__)
+
+# 제공자별 평가 응답 처리 결과 집계 (structured: 구조화된 출력, repaired: 로컬 복구, failed: 복구 실패)
+EVALUATION_STATS_KEY = "evaluation_stats"
+
+# 복구에 실패한 평가 결과
+FAILED_EVALUATION = {"score": 0.0, "reason": ""}
+
+_structured_llms: Dict[Tuple[int, type], Tuple[Any, Any]] = {}
+
+
+def get_structured_llm(llm: Any, schema: type) -> Any:
+    """
+    LLM과 스키마별 구조화된 출력 실행 체인을 캐시에서 가져옵니다.
+    include_raw=True로 만들어 파싱에 실패해도 원본 응답을 받아 복구할 수 있게 합니다.
+    """
+    key = (id(llm), schema)
+    cached = _structured_llms.get(key)
+    if cached is None or cached[0] is not llm:
+        cached = (llm, llm.with_structured_output(schema, include_raw=True))
+        _structured_llms[key] = cached
+    return cached[1]
+
+
+def _raw_candidates(raw: Any) -> Tuple[list, str]:
+    # 원본 응답에서 도구 호출 인자(dict)와 텍스트를 꺼냄
+    if raw is None:
+        return [], ""
+    tool_args = [call.get("args") for call in getattr(raw, "tool_calls", None) or [] if call.get("args")]
+    content = getattr(raw, "content", raw)
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict):
+                if block.get("type") == "text":
+                    parts.append(block.get("text", ""))
+                elif block.get("type") == "tool_use" and isinstance(block.get("input"), dict):
+                    tool_args.append(block["input"])
+        content = "\n".join(parts)
+    return tool_args, str(content or "")
+
+
+def load_json_loosely(text: str) -> Any:
+    """
+    코드 블록, 앞뒤 설명, 끝의 쉼표, 특수 따옴표가 섞인 JSON을 최대한 읽습니다. 실패하면 None
+    """
+    cleaned = re.sub(r"```(?:json)?\s*([\s\S]+?)\s*```", r"\1", text.strip())
+    candidates = [cleaned]
+    for opener, closer in (("{", "}"), ("[", "]")):
+        start, end = cleaned.find(opener), cleaned.rfind(closer)
+        if start != -1 and end > start:
+            candidates.append(cleaned[start:end + 1])
+
+    for candidate in candidates:
+        for attempt in (
+            candidate,
+            re.sub(r",\s*([}\]])", r"\1", candidate.replace("“", '"').replace("”", '"').replace("’", "'")),
+        ):
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                continue
+    return None
+
+
+def _to_evaluation(entry: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(entry, dict) or entry.get("score") is None:
+        return None
+    try:
+        score = snap_evaluation_score(entry["score"])
+    except (TypeError, ValueError):
+        return None
+    return {"score": score, "reason": str(entry.get("reason") or "").strip()}
+
+
+def repair_evaluation(raw: Any) -> Optional[Dict[str, Any]]:
+    """
+    구조화된 출력 파싱에 실패한 원본 응답에서 점수와 이유를 복구합니다. (도구 호출 인자 -> JSON -> "점수: 0.5" 형식 텍스트 순서)
+    """
+    tool_args, text = _raw_candidates(raw)
+    for candidate in tool_args + [load_json_loosely(text)]:
+        evaluation = _to_evaluation(candidate)
+        if evaluation is not None:
+            return evaluation
+
+    score_match = re.search(r"(?:점수|score)[\"'*\s]*[:：=]?\s*(\d*\.?\d+)", text, re.IGNORECASE) \
+        or re.search(r"0\.\d+|1\.0", text)
+    if not score_match:
+        return None
+    score = score_match.group(1) if score_match.re.groups else score_match.group()
+
+    reason_match = re.search(r"(?:이유|reason)[\"'*\s]*[:：]\s*(.+?)(?:\n##|\n|$)", text, re.IGNORECASE)
+    return {"score": snap_evaluation_score(score), "reason": reason_match.group(1).strip().strip('"') if reason_match else ""}
+
+
+def repair_batch_evaluation(raw: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    여러 특허 평가 응답에서 출원번호별 점수와 이유를 복구합니다. 형식이 잘못된 항목은 제외합니다.
+    """
+    tool_args, text = _raw_candidates(raw)
+    for candidate in tool_args + [load_json_loosely(text)]:
+        entries = candidate.get("results") if isinstance(candidate, dict) else candidate
+        if not isinstance(entries, list):
+            continue
+        evaluations = {}
+        for entry in entries:
+            evaluation = _to_evaluation(entry)
+            if evaluation is not None and entry.get("applicationNumber") is not None:
+                evaluations[str(entry["applicationNumber"])] = evaluation
+        if evaluations:
+            return evaluations
+    return {}
+
+
+def record_evaluation_outcome(llm: Any, outcome: str, stats_key: Optional[str] = None) -> None:
+    """
+    평가 응답 처리 결과를 제공자별로 집계하고, 작업 통계에는 복구/실패 횟수를 남깁니다.
+    """
+    provider = get_llm_provider(llm) or "unknown"
+    try:
+        get_redis_client().hincrby(EVALUATION_STATS_KEY, f"{provider}:{outcome}", 1)
+        if stats_key and outcome != "structured":
+            increment_job_stat(stats_key, f"evaluation_{outcome}")
+    except Exception as e:
+        logger.warning(f"평가 응답 처리 결과 기록 실패: {e}")
+
+
+def get_evaluation_stats() -> Dict[str, Dict[str, int]]:
+    """
+    제공자별 평가 응답 처리 결과와 복구 비율(repair_rate)을 반환합니다.
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    for field, value in get_redis_client().hgetall(EVALUATION_STATS_KEY).items():
+        provider, outcome = field.rsplit(":", 1)
+        stats.setdefault(provider, {})[outcome] = int(value)
+    for counts in stats.values():
+        total = sum(counts.values())
+        counts["repair_rate"] = round((counts.get("repaired", 0) + counts.get("failed", 0)) / total, 4) if total else 0.0
+    return stats
+
+
+def _evaluation_result(llm: Any, output: Dict[str, Any], stats_key: Optional[str]) -> Dict[str, Any]:
+    parsed = output.get("parsed")
+    if parsed is not None:
+        record_evaluation_outcome(llm, "structured", stats_key)
+        return {"score": parsed.score, "reason": parsed.reason}
+
+    logger.warning(f"구조화된 평가 응답 파싱 실패, 로컬에서 복구합니다: {output.get('parsing_error')}")
+    repaired = repair_evaluation(output.get("raw"))
+    if repaired is not None:
+        record_evaluation_outcome(llm, "repaired", stats_key)
+        return repaired
+
+    logger.error("평가 응답에서 점수를 찾을 수 없어 기본값 0.0을 사용합니다.")
+    record_evaluation_outcome(llm, "failed", stats_key)
+    return dict(FAILED_EVALUATION)
+
+
+def _batch_evaluation_result(llm: Any, output: Dict[str, Any], stats_key: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    parsed = output.get("parsed")
+    if parsed is not None:
+        record_evaluation_outcome(llm, "structured", stats_key)
+        return {str(entry.applicationNumber): {"score": entry.score, "reason": entry.reason} for entry in parsed.results}
+
+    logger.warning(f"구조화된 일괄 평가 응답 파싱 실패, 로컬에서 복구합니다: {output.get('parsing_error')}")
+    repaired = repair_batch_evaluation(output.get("raw"))
+    record_evaluation_outcome(llm, "repaired" if repaired else "failed", stats_key)
+    return repaired
+
+
+def _record_coalesced(stats_key: Optional[str], shared: bool) -> None:
+    if shared and stats_key:
+        increment_job_stat(stats_key, "coalesced_requests")
+
+
+def evaluate_with_llm(llm: Any, prompt: str, stats_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    평가 프롬프트 하나를 구조화된 출력으로 실행하고 {"score", "reason"}을 반환합니다.
+    다른 워커가 같은 평가 LLM으로 같은 프롬프트를 실행 중이면 그 결과를 사용합니다.
+    """
+    def call() -> Dict[str, Any]:
+        structured = get_structured_llm(llm, EvaluationSchema)
+        with circuit_guard(llm), llm_slot(llm):
+            output = structured.invoke(prompt)
+        return _evaluation_result(llm, output, stats_key)
+
+    evaluation, shared = single_flight(request_key(llm, "evaluation", prompt), call)
+    _record_coalesced(stats_key, shared)
+    return evaluation
+
+
+async def aevaluate_with_llm(llm: Any, prompt: str, stats_key: Optional[str] = None) -> Dict[str, Any]:
+    async def call() -> Dict[str, Any]:
+        structured = get_structured_llm(llm, EvaluationSchema)
+        async with acircuit_guard(llm), allm_slot(llm):
+            output = await structured.ainvoke(prompt)
+        return await asyncio.to_thread(_evaluation_result, llm, output, stats_key)
+
+    evaluation, shared = await asingle_flight(request_key(llm, "evaluation", prompt), call)
+    await asyncio.to_thread(_record_coalesced, stats_key, shared)
+    return evaluation
+
+
+def evaluate_batch_with_llm(llm: Any, prompt: str, stats_key: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    여러 특허 평가 프롬프트를 구조화된 출력으로 실행하고 출원번호 -> {"score", "reason"}을 반환합니다.
+    """
+    structured = get_structured_llm(llm, BatchEvaluationSchema)
+    with circuit_guard(llm), llm_slot(llm):
+        output = structured.invoke(prompt)
+    return _batch_evaluation_result(llm, output, stats_key)
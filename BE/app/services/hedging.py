@@ -0,0 +1,240 @@
+# LLM 요청 헤징 (응답이 느린 호출에 같은 요청을 한 번 더 보내고 먼저 온 정상 응답 사용)
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+import logging
+import math
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.concurrency import get_llm_provider
+from app.core.config import settings
+from app.core.rate_limit import rate_limit_waits
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 제공자별로 보관할 최근 응답 시간 수
+LATENCY_SAMPLES = 500
+
+# 헤징 기준 시간을 다시 계산하는 주기(초)
+THRESHOLD_REFRESH = 30
+
+# 동기 호출 헤징에 사용하는 스레드 수 (워커 프로세스 당)
+# 동기 호출은 취소할 수 없으므로 진 요청도 끝날 때까지 스레드를 차지합니다.
+# 스레드가 모두 사용 중이면 새 요청은 헤징하지 않고 호출한 스레드에서 바로 실행합니다. (진 요청이 쌓이지 않도록)
+HEDGE_THREADS = 8
+
+
+class LatencyTracker:
+    """
+    제공자별 최근 LLM 응답 시간을 Redis 리스트에 모아 두고(모든 워커 공유),
+    HEDGE_LATENCY_PERCENTILE 백분위 응답 시간을 헤징 기준 시간으로 사용합니다.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.key = f"latency:{provider}"
+        self._threshold: Optional[float] = None
+        self._expires_at = 0.0
+
+    def record(self, seconds: float) -> None:
+        try:
+            redis = get_redis_client()
+            pipe = redis.pipeline()
+            pipe.lpush(self.key, round(seconds, 3))
+            pipe.ltrim(self.key, 0, LATENCY_SAMPLES - 1)
+            pipe.expire(self.key, 86400)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 응답 시간 기록 실패: {e}")
+
+    def threshold(self) -> Optional[float]:
+        """
+        헤징 기준 시간(초)을 반환합니다. 응답 시간 표본이 부족하면 None (헤징하지 않음)
+        """
+        now = time.monotonic()
+        if now < self._expires_at:
+            return self._threshold
+
+        try:
+            samples = sorted(float(value) for value in get_redis_client().lrange(self.key, 0, -1))
+        except Exception as e:
+            logger.warning(f"[{self.provider}] 응답 시간 조회 실패: {e}")
+            samples = []
+
+        if len(samples) < settings.HEDGE_MIN_SAMPLES:
+            self._threshold = None
+        else:
+            index = max(0, math.ceil(settings.HEDGE_LATENCY_PERCENTILE / 100 * len(samples)) - 1)
+            self._threshold = max(samples[index], settings.HEDGE_MIN_DELAY)
+        self._expires_at = now + THRESHOLD_REFRESH
+        return self._threshold
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_executor_slots = threading.BoundedSemaphore(HEDGE_THREADS)
+
+
+def get_latency_tracker(provider: Optional[str]) -> LatencyTracker:
+    provider = provider or "unknown"
+    if provider not in _trackers:
+        _trackers[provider] = LatencyTracker(provider)
+    return _trackers[provider]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Celery prefork 워커는 fork 이후에 스레드를 만들어야 하므로 처음 사용할 때 생성
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="hedge")
+        return _executor
+
+
+def _submit(call: Callable[[], Any]) -> Optional[Future]:
+    # 비어 있는 스레드가 있을 때만 실행 (없으면 None), 끝나면 스레드 반환
+    if not _executor_slots.acquire(blocking=False):
+        return None
+    try:
+        future = _get_executor().submit(call)
+    except Exception:
+        _executor_slots.release()
+        raise
+    future.add_done_callback(lambda _: _executor_slots.release())
+    return future
+
+
+def _elapsed(start: float, waits: List[float]) -> float:
+    return max(0.0, time.monotonic() - start - sum(waits))
+
+
+@contextmanager
+def provider_call_timer(llm: Any):
+    """
+    LLM 호출 하나의 응답 시간을 헤징 기준 시간 표본으로 기록합니다. (성공한 호출만, 헤징을 사용하지 않으면 아무것도 하지 않음)
+    동시 호출 슬롯을 얻은 뒤에 시작하고 rate limit 대기 시간은 빼므로 제공자 응답 시간만 기록됩니다.
+    """
+    if not settings.HEDGING_ENABLED:
+        yield
+        return
+    waits: List[float] = []
+    token = rate_limit_waits.set(waits)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        rate_limit_waits.reset(token)
+    get_latency_tracker(get_llm_provider(llm)).record(_elapsed(start, waits))
+
+
+@asynccontextmanager
+async def aprovider_call_timer(llm: Any):
+    if not settings.HEDGING_ENABLED:
+        yield
+        return
+    waits: List[float] = []
+    token = rate_limit_waits.set(waits)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        rate_limit_waits.reset(token)
+    await asyncio.to_thread(get_latency_tracker(get_llm_provider(llm)).record, _elapsed(start, waits))
+
+
+def _pick_error(errors: List[Tuple[str, Exception]]) -> Exception:
+    # 두 요청 모두 실패하면 원래 요청의 에러를 우선 (rate limit 재시도 판단에 사용)
+    for label, error in errors:
+        if label == "primary":
+            return error
+    return errors[0][1]
+
+
+def hedged_call(
+    provider: Optional[str],
+    primary: Callable[[], Any],
+    hedge: Optional[Callable[[], Any]],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> Tuple[Any, bool]:
+    """
+    primary를 실행하고 헤징 기준 시간 안에 끝나지 않으면 hedge를 함께 실행해 먼저 성공한 결과를 반환합니다.
+    on_hedge는 헤징 요청을 보낼 때 호출합니다. (요청 수 통계)
+    반환값: (결과, 헤징 요청의 결과인지 여부)
+    동기 호출은 취소할 수 없으므로 늦게 끝난 요청은 결과만 버립니다. (HEDGE_THREADS 개까지만 동시에 실행)
+    응답 시간 표본은 LLM 호출 안에서 provider_call_timer로 기록합니다.
+    """
+    threshold = get_latency_tracker(provider).threshold() if hedge is not None else None
+    if threshold is None:
+        return primary(), False
+
+    primary_future = _submit(primary)
+    if primary_future is None:
+        # 스레드가 모두 사용 중이면 헤징하지 않음
+        return primary(), False
+    labels = {primary_future: "primary"}
+
+    done, _ = wait([primary_future], timeout=threshold)
+    if not done:
+        hedge_future = _submit(hedge)
+        if hedge_future is None:
+            logger.info(f"[{provider}] 헤징 스레드가 모두 사용 중이어서 헤징하지 않음")
+        else:
+            logger.info(f"[{provider}] 응답이 {threshold:.1f}초를 넘어 헤징 요청 전송")
+            labels[hedge_future] = "hedge"
+            if on_hedge is not None:
+                on_hedge()
+
+    errors: List[Tuple[str, Exception]] = []
+    pending = set(labels)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                errors.append((labels[future], error))
+                continue
+            return future.result(), labels[future] == "hedge"
+    raise _pick_error(errors)
+
+
+async def ahedged_call(
+    provider: Optional[str],
+    primary: Callable[[], Awaitable[Any]],
+    hedge: Optional[Callable[[], Awaitable[Any]]],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> Tuple[Any, bool]:
+    """
+    hedged_call의 비동기 버전입니다. 먼저 성공한 요청의 결과를 사용하고 나머지 요청은 취소합니다.
+    """
+    threshold = get_latency_tracker(provider).threshold() if hedge is not None else None
+    if threshold is None:
+        return await primary(), False
+
+    primary_task = asyncio.ensure_future(primary())
+    labels = {primary_task: "primary"}
+
+    done, _ = await asyncio.wait({primary_task}, timeout=threshold)
+    if not done:
+        logger.info(f"[{provider}] 응답이 {threshold:.1f}초를 넘어 헤징 요청 전송")
+        labels[asyncio.ensure_future(hedge())] = "hedge"
+        if on_hedge is not None:
+            await asyncio.to_thread(on_hedge)
+
+    errors: List[Tuple[str, Exception]] = []
+    pending = set(labels)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    errors.append((labels[task], error))
+                    continue
+                return task.result(), labels[task] == "hedge"
+        raise _pick_error(errors)
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,76 @@
+# 작업 입력 저장 (청크 태스크는 특허 정보 대신 작업 ID와 행 범위만 메시지로 보내고, 특허 정보는 여기서 읽음)
+#
+# 분류할 특허 목록을 작업마다 한 번만 파일로 저장하고, 워커 프로세스는 읽은 작업 입력을 캐시해
+# 같은 작업의 청크는 파일을 다시 읽지 않습니다. (API 서버와 워커가 temp_data를 공유해야 함, 세션 DataFrame과 같음)
+from collections import OrderedDict
+import json
+import os
+import pickle
+import uuid
+from typing import Any, Dict, List
+from app.core.redis import get_redis_client
+
+JOB_INPUT_DIR = "./temp_data/jobs"
+
+# 청크 태스크에서 처리를 마친 특허 결과 보관 시간 (24시간)
+CHUNK_RESULTS_TTL = 86400
+
+# 워커 프로세스에 캐시할 작업 입력 수 (최근에 사용한 작업부터 유지)
+JOB_INPUT_CACHE_SIZE = 4
+
+job_inputs: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+
+def get_job_input_path(job_id: str) -> str:
+    return os.path.join(JOB_INPUT_DIR, f"{job_id}.pkl")
+
+
+def save_job_input(items: List[Dict[str, Any]]) -> str:
+    """
+    분류할 특허 목록을 저장하고 작업 ID를 반환합니다.
+    """
+    job_id = uuid.uuid4().hex
+    os.makedirs(JOB_INPUT_DIR, exist_ok=True)
+    path = get_job_input_path(job_id)
+    # 다 쓰기 전에 워커가 읽지 않도록 임시 파일에 쓴 뒤 이름 변경
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump(items, f)
+    os.replace(temp_path, path)
+    return job_id
+
+
+def load_job_items(job_id: str) -> List[Dict[str, Any]]:
+    """
+    저장된 특허 목록을 반환합니다. (워커 프로세스 캐시 사용)
+    """
+    if job_id in job_inputs:
+        job_inputs.move_to_end(job_id)
+        return job_inputs[job_id]
+
+    with open(get_job_input_path(job_id), "rb") as f:
+        items = pickle.load(f)
+    job_inputs[job_id] = items
+    while len(job_inputs) > JOB_INPUT_CACHE_SIZE:
+        job_inputs.popitem(last=False)
+    return items
+
+
+def _chunk_results_key(job_id: str, start: int) -> str:
+    return f"job:{job_id}:chunk:{start}"
+
+
+def load_chunk_results(job_id: str, start: int) -> Dict[str, Any]:
+    """
+    청크에서 처리를 마친 특허 결과를 반환합니다. (필드 -> 결과)
+    rate limit으로 청크 태스크를 다시 실행할 때 처리한 특허를 건너뛰어 진행률이 중복 집계되지 않도록 합니다.
+    """
+    stored = get_redis_client().hgetall(_chunk_results_key(job_id, start))
+    return {field: json.loads(value) for field, value in stored.items()}
+
+
+def save_chunk_result(job_id: str, start: int, field: str, result: Any) -> None:
+    redis = get_redis_client()
+    key = _chunk_results_key(job_id, start)
+    redis.hset(key, field, json.dumps(result, ensure_ascii=False))
+    redis.expire(key, CHUNK_RESULTS_TTL)
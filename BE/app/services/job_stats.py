@@ -0,0 +1,39 @@
+# 분류 작업 통계 (LLM 호출 생략 비율 등)
+from typing import Dict
+from app.core.redis import get_redis_client
+
+# 통계 보관 시간 (24시간)
+JOB_STATS_TTL = 86400
+
+
+def get_job_stats_key(key: str) -> str:
+    # key는 사용자 모드 session_id, 관리자 모드 {session_id}:{LLM}
+    return f"{key}:stats"
+
+
+def reset_job_stats(key: str) -> None:
+    redis = get_redis_client()
+    redis.delete(get_job_stats_key(key))
+
+
+def increment_job_stat(key: str, field: str, amount: int = 1) -> None:
+    redis = get_redis_client()
+    stats_key = get_job_stats_key(key)
+    pipe = redis.pipeline()
+    pipe.hincrby(stats_key, field, amount)
+    pipe.expire(stats_key, JOB_STATS_TTL)
+    pipe.execute()
+
+
+def get_job_stats(key: str) -> Dict[str, float]:
+    """
+    작업 통계를 반환합니다. 분류된 특허 중 LLM 호출 없이 분류된 비율(bypass_rate)과
+    캐시된 결과를 사용한 비율(cache_hit_ratio)을 함께 계산합니다.
+    """
+    redis = get_redis_client()
+    stats = {field: int(value) for field, value in redis.hgetall(get_job_stats_key(key)).items()}
+
+    classified = stats.get("llm_calls", 0) + stats.get("bypassed", 0) + stats.get("cache_hits", 0)
+    stats["bypass_rate"] = round(stats.get("bypassed", 0) / classified, 4) if classified else 0.0
+    stats["cache_hit_ratio"] = round(stats.get("cache_hits", 0) / classified, 4) if classified else 0.0
+    return stats
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.core.embeddings import EMBEDDING_DIMENSIONS, embeddings_openai
+from app.core.redis import get_redis_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMP_DIR = "./temp_data"
+
+
+def get_patent_info(row: pd.Series) -> Optional[str]:
+    """
+    데이터프레임의 한 행으로 검색 및 분류에 사용할 특허 정보 문자열을 만듭니다.
+    제목과 요약이 모두 비어있으면 None을 반환합니다.
+    """
+    title = row.get('특허명', row.get('발명의 명칭', ''))
+    abstract = row.get('요약', '')
+
+    if not title and not abstract:
+        return None
+
+    return f"특허명: {title} 요약: {abstract}"
+
+
+def get_embedding_matrix_path(session_id: str) -> str:
+    return os.path.join(TEMP_DIR, f"{session_id}.npy")
+
+
+def embed_patent_dataframe(
+    session_id: str,
+    df: pd.DataFrame,
+    batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+    concurrency: int = settings.EMBEDDING_CONCURRENCY,
+) -> str:
+    """
+    업로드된 특허 파일의 모든 행을 큰 배치로 임베딩하여 float32 .npy 파일로 저장합니다.
+    i번째 행의 벡터는 행렬의 i번째 행이며, 비어있는 행은 0 벡터로 남습니다.
+    """
+    redis = get_redis_client()
+    ready_key = f"{session_id}:embeddings"
+    path = get_embedding_matrix_path(session_id)
+
+    # 이전 업로드의 행렬이 새 파일의 행과 섞이지 않도록 먼저 제거
+    redis.delete(ready_key)
+    if os.path.exists(path):
+        os.remove(path)
+
+    rows: List[Tuple[int, str]] = []
+    for position, (_, row) in enumerate(df.iterrows()):
+        patent_info = get_patent_info(row)
+        if patent_info is not None:
+            rows.append((position, patent_info))
+
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(df), EMBEDDING_DIMENSIONS))
+
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    write_lock = threading.Lock()
+
+    def embed_batch(batch: List[Tuple[int, str]]) -> None:
+        vectors = embeddings_openai.embed_documents([patent_info for _, patent_info in batch])
+        with write_lock:
+            for (position, _), vector in zip(batch, vectors):
+                matrix[position] = vector
+
+    # 배치 단위 임베딩 요청을 제한된 동시성으로 실행
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for _ in executor.map(embed_batch, batches):
+            pass
+
+    matrix.flush()
+    os.replace(tmp_path, path)
+
+    redis.set(ready_key, len(df), ex=86400)
+    logger.info(f"[{session_id}] 특허 {len(rows)}건 임베딩 완료 ({len(batches)}회 요청)")
+    return path
+
+
+# 워커 프로세스에서 열어둔 행렬 (경로 -> (수정 시각, 행렬))
+_matrices: Dict[str, Tuple[int, Any]] = {}
+
+
+def load_patent_embedding(session_id: str, row_index: Optional[int]) -> Optional[np.ndarray]:
+    """
+    미리 계산된 특허 임베딩을 행 번호로 읽습니다. 행렬이 없거나 행이 비어있으면 None을 반환합니다.
+    """
+    if row_index is None:
+        return None
+
+    redis = get_redis_client()
+    row_count = redis.get(f"{session_id}:embeddings")
+    path = get_embedding_matrix_path(session_id)
+    if row_count is None or not os.path.exists(path):
+        return None
+
+    mtime = os.stat(path).st_mtime_ns
+    cached = _matrices.get(path)
+    if cached is None or cached[0] != mtime:
+        matrix = np.load(path, mmap_mode="r")
+        _matrices[path] = (mtime, matrix)
+    else:
+        matrix = cached[1]
+
+    if row_index >= matrix.shape[0] or int(row_count) != matrix.shape[0]:
+        return None
+
+    vector = np.array(matrix[row_index])
+    if not vector.any():
+        return None
+    return vector
@@ -0,0 +1,235 @@
+# 특허 분류 체인 (LLM, 분류 체계 벡터 저장소별로 한 번 만들어 재사용)
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from app.core.circuit_breaker import acircuit_guard, circuit_guard
+from app.core.concurrency import allm_slot, llm_slot
+from app.core.config import settings
+from app.schemas.classification import BatchClassificationSchema, ClassificationSchema
+from app.services.hedging import aprovider_call_timer, provider_call_timer
+
+logger = logging.getLogger(__name__)
+
+# 분류 프롬프트 템플릿
+CLASSIFICATION_TEMPLATE = """
+    다음은 특허 분류 데이터베이스에서 검색된 유사한 특허 정보입니다:
+    
+    {context}
+    
+    위 참고 정보를 바탕으로, 다음 특허 정보에 대한 대분류, 중분류, 소분류를 제공해주세요.
+    대분류 코드와 명칭, 중분류 코드와 명칭, 소분류 코드와 명칭을 모두 포함해야 합니다.
+    꼭 context안에 있는 기준으로 결과를 내세요.
+    해당하는게 없으면 미분류로 결과 내세요.
+    이유를 적지말고 응답 형식만 맞게 답 하세요.
+    
+    특허 정보: {query}
+    
+    너는 다음 JSON 형태로만 응답해야 해: {format_instructions}
+    """
+
+# 여러 특허를 한 번에 분류하는 프롬프트 템플릿
+BATCH_CLASSIFICATION_TEMPLATE = """
+    다음은 분류할 특허 목록입니다. 각 특허마다 특허 분류 데이터베이스에서 검색된 유사한 분류 정보가 함께 주어집니다.
+    
+    {patents}
+    
+    각 특허의 참고 정보를 바탕으로, 특허마다 대분류, 중분류, 소분류를 제공해주세요.
+    대분류 코드와 명칭, 중분류 코드와 명칭, 소분류 코드와 명칭을 모두 포함해야 합니다.
+    꼭 해당 특허의 참고 정보 안에 있는 기준으로 결과를 내세요.
+    해당하는게 없으면 미분류로 결과 내세요.
+    이유를 적지말고 응답 형식만 맞게 답 하세요.
+    모든 특허에 대해 출원번호(applicationNumber)를 포함한 결과를 하나씩 내세요.
+    
+    너는 다음 JSON 형태로만 응답해야 해: {format_instructions}
+    """
+
+# 프롬프트와 출력 형식 설명은 모든 요청에서 같으므로 모듈 로드 시 한 번만 만듦
+CLASSIFICATION_PROMPT = ChatPromptTemplate.from_template(CLASSIFICATION_TEMPLATE).partial(
+    format_instructions=PydanticOutputParser(pydantic_object=ClassificationSchema).get_format_instructions()
+)
+BATCH_CLASSIFICATION_PROMPT = ChatPromptTemplate.from_template(BATCH_CLASSIFICATION_TEMPLATE).partial(
+    format_instructions=PydanticOutputParser(pydantic_object=BatchClassificationSchema).get_format_instructions()
+)
+
+# 검색된 분류 체계 사이 구분자
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# 워커 프로세스 당 유지할 분류 체인 개수 (벡터 저장소 캐시 x LLM 수)
+PIPELINE_CACHE_SIZE = settings.VECTORSTORE_CACHE_SIZE * 4
+
+
+# 분류 체계 하나를 메타데이터를 포함한 형식으로 포맷팅 (ClassificationPipeline에서 캐시)
+def format_context_fragment(doc: Document) -> str:
+    metadata = doc.metadata
+
+    # 문서 레벨에 따라 다르게 포맷팅
+    if metadata.get('level') == '중분류':
+        return f"""
+분류 정보:
+- 코드: {metadata.get('code', '')}
+- 명칭: {metadata.get('name', '')}
+- 레벨: {metadata.get('level', '')}
+- 상위 코드: {metadata.get('parent_code', '')}
+- 상위 명칭: {metadata.get('parent_name', '')}
+- 설명: {metadata.get('description', '')}
+
+{doc.page_content}
+"""
+    elif metadata.get('level') == '소분류':
+        return f"""
+분류 정보:
+- 코드: {metadata.get('code', '')}
+- 명칭: {metadata.get('name', '')}
+- 레벨: {metadata.get('level', '')}
+- 상위 코드: {metadata.get('parent_code', '')}
+- 상위 명칭: {metadata.get('parent_name', '')}
+- 최상위 코드: {metadata.get('grand_parent_code', '')}
+- 최상위 명칭: {metadata.get('grand_parent_name', '')}
+- 설명: {metadata.get('description', '')}
+
+{doc.page_content}
+"""
+    # 기타 레벨이나 메타데이터가 없는 경우
+    return doc.page_content
+
+# 메타데이터를 포함한 형식으로 문서 포맷팅
+def format_docs(docs: List[Document]) -> str:
+    return CONTEXT_SEPARATOR.join(format_context_fragment(doc) for doc in docs)
+
+# LLM 응답에서 JSON 추출
+def parse_json_response(result: str) -> Any:
+    cleaned = re.sub(r"```(?:json)?\s*([\s\S]+?)\s*```", r"\1", result.strip())
+    return json.loads(cleaned)
+
+# 파싱된 분류 결과를 응답 형식으로 변환
+def to_classifications(parsed: Dict[str, Any], application_number: str) -> Dict[str, str]:
+    def replace_na(value):
+        return value if value and value != "N/A" else "미분류"
+
+    return {
+        "applicationNumber": application_number,  # 식별자 추가
+        "majorCode": replace_na(parsed.get("majorCode")),
+        "majorTitle": replace_na(parsed.get("majorTitle")),
+        "middleCode": replace_na(parsed.get("middleCode")),
+        "middleTitle": replace_na(parsed.get("middleTitle")),
+        "smallCode": replace_na(parsed.get("smallCode")),
+        "smallTitle": replace_na(parsed.get("smallTitle")),
+    }
+
+# 분류 실패 시 결과
+def unclassified(application_number: str) -> Dict[str, str]:
+    return {
+        "applicationNumber": application_number,
+        "majorCode": "미분류",
+        "middleCode": "미분류",
+        "smallCode": "미분류",
+        "majorTitle": "미분류",
+        "middleTitle": "미분류",
+        "smallTitle": "미분류"
+    }
+
+
+# 파이프라인 당 캐시할 포맷팅된 분류 체계 문자열 수 (검색된 분류 체계만 포맷팅하므로 분류 체계 크기와 관계없음)
+FRAGMENT_CACHE_SIZE = 4096
+
+
+def _fragment_key(doc: Document) -> Tuple[Any, ...]:
+    return tuple(sorted(doc.metadata.items())) + (doc.page_content,)
+
+
+class ClassificationPipeline:
+    """
+    분류 프롬프트, 출력 형식 설명, 실행 체인을 한 번 만들어 두고 특허마다 재사용합니다.
+    검색된 분류 체계는 한 번 포맷팅한 문자열을 캐시해 두고 이어 붙여 프롬프트 context를 만듭니다.
+    LLM 호출은 제공자별 동시 호출 수 한도 안에서 실행하고, 응답 시간을 헤징 기준 시간 표본으로 기록합니다.
+    """
+
+    def __init__(self, llm: Any, vector_store: Any = None):
+        self.llm = llm
+        self.vector_store = vector_store
+        self.context_fragments: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+        self._fragments_lock = threading.Lock()
+        self.chain = CLASSIFICATION_PROMPT | llm | StrOutputParser()
+        self.batch_chain = BATCH_CLASSIFICATION_PROMPT | llm | StrOutputParser()
+
+    def context_fragment(self, doc: Document) -> str:
+        key = _fragment_key(doc)
+        with self._fragments_lock:
+            fragment = self.context_fragments.get(key)
+            if fragment is not None:
+                self.context_fragments.move_to_end(key)
+                return fragment
+        fragment = format_context_fragment(doc)
+        with self._fragments_lock:
+            self.context_fragments[key] = fragment
+            if len(self.context_fragments) > FRAGMENT_CACHE_SIZE:
+                self.context_fragments.popitem(last=False)
+        return fragment
+
+    def format_context(self, docs: List[Document]) -> str:
+        return CONTEXT_SEPARATOR.join(self.context_fragment(doc) for doc in docs)
+
+    def inputs(self, docs: List[Document], patent_info: str) -> Dict[str, str]:
+        return {"context": self.format_context(docs), "query": patent_info}
+
+    def invoke(self, docs: List[Document], patent_info: str) -> str:
+        """
+        LLM을 호출하고 응답 문자열을 반환합니다. (응답 파싱은 parse)
+        """
+        inputs = self.inputs(docs, patent_info)
+        with circuit_guard(self.llm), llm_slot(self.llm), provider_call_timer(self.llm):
+            return self.chain.invoke(inputs)
+
+    async def ainvoke(self, docs: List[Document], patent_info: str) -> str:
+        inputs = self.inputs(docs, patent_info)
+        async with acircuit_guard(self.llm), allm_slot(self.llm), aprovider_call_timer(self.llm):
+            return await self.chain.ainvoke(inputs)
+
+    def parse(self, result: str, application_number: str) -> Dict[str, str]:
+        return to_classifications(parse_json_response(result), application_number)
+
+    def classify(self, docs: List[Document], patent_info: str, application_number: str) -> Dict[str, str]:
+        return self.parse(self.invoke(docs, patent_info), application_number)
+
+    async def aclassify(self, docs: List[Document], patent_info: str, application_number: str) -> Dict[str, str]:
+        return self.parse(await self.ainvoke(docs, patent_info), application_number)
+
+    def classify_batch(self, patents: List[Tuple[str, str, List[Document]]]) -> Any:
+        """
+        patents: [(출원번호, 특허 정보, 검색된 분류 체계), ...]를 하나의 프롬프트로 분류하고 파싱된 응답을 반환합니다.
+        """
+        text = "\n\n===\n\n".join(
+            f"[특허 {number}]\n출원번호: {application_number}\n\n참고 분류 정보:\n{self.format_context(docs)}\n\n특허 정보: {patent_info}"
+            for number, (application_number, patent_info, docs) in enumerate(patents, start=1)
+        )
+        with circuit_guard(self.llm), llm_slot(self.llm):
+            result = self.batch_chain.invoke({"patents": text})
+        return parse_json_response(result)
+
+
+_pipelines: "OrderedDict[Tuple[int, int], ClassificationPipeline]" = OrderedDict()
+
+
+def get_classification_pipeline(llm: Any, vector_store: Any = None) -> ClassificationPipeline:
+    """
+    (LLM, 벡터 저장소)별 분류 체인을 캐시에서 가져오고, 없으면 만듭니다.
+    벡터 저장소가 다시 로드되면 다른 객체가 되므로 새 체인을 만듭니다.
+    """
+    key = (id(llm), id(vector_store))
+    pipeline = _pipelines.get(key)
+    if pipeline is not None and pipeline.llm is llm and pipeline.vector_store is vector_store:
+        _pipelines.move_to_end(key)
+        return pipeline
+
+    pipeline = ClassificationPipeline(llm, vector_store)
+    _pipelines[key] = pipeline
+    while len(_pipelines) > PIPELINE_CACHE_SIZE:
+        _pipelines.popitem(last=False)
+    return pipeline
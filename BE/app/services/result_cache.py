@@ -0,0 +1,45 @@
+# 작업 간 분류 결과 캐시
+import hashlib
+import json
+from typing import Dict, Optional
+from app.core.cache import RedisLRUCache
+from app.core.config import settings
+from app.core.vectorstore import get_taxonomy_hash
+from app.services.dedup import normalize_patent_info
+
+# 캐시에 저장하는 분류 결과 필드 (출원번호는 요청마다 다르므로 제외)
+CLASSIFICATION_FIELDS = ("majorCode", "majorTitle", "middleCode", "middleTitle", "smallCode", "smallTitle")
+
+classification_cache = RedisLRUCache(
+    "classification_cache",
+    settings.CLASSIFICATION_CACHE_MAX_ENTRIES,
+    settings.CLASSIFICATION_CACHE_TTL,
+)
+
+
+def get_classification_cache_key(session_id: str, LLM: str, patent_info: str) -> Optional[str]:
+    """
+    (분류 체계 내용 해시, LLM 이름, 정규화한 특허 정보)로 캐시 키를 만듭니다.
+    분류 체계가 저장된 적이 없으면 None을 반환합니다.
+    """
+    taxonomy_hash = get_taxonomy_hash(session_id)
+    if taxonomy_hash is None:
+        return None
+    # 모의 LLM 결과가 실제 LLM 결과와 섞이지 않도록 백엔드를 키에 포함
+    backend = "" if settings.LLM_BACKEND == "vendor" else f"{settings.LLM_BACKEND}:"
+    text = f"{taxonomy_hash}:{backend}{LLM.upper()}:{normalize_patent_info(patent_info)}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_cached_classification(cache_key: Optional[str]) -> Optional[Dict[str, str]]:
+    if cache_key is None:
+        return None
+    cached = classification_cache.get(cache_key)
+    return json.loads(cached) if cached else None
+
+
+def cache_classification(cache_key: Optional[str], classifications: Dict[str, str]) -> None:
+    if cache_key is None:
+        return
+    value = {field: classifications[field] for field in CLASSIFICATION_FIELDS}
+    classification_cache.set(cache_key, json.dumps(value, ensure_ascii=False))
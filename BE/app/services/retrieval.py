@@ -0,0 +1,177 @@
+import base64
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from app.core.embeddings import embeddings_openai
+from app.core.mmap_store import MmapVectorStore
+from app.core.redis import get_redis_client
+from app.core.vectorstore import get_index_mtime, get_index_version, get_vectorstore_path, load_vectorstore
+from app.services.patent_embedding import load_patent_embedding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 특허 하나 당 검색할 분류 체계 개수 (분류 프롬프트, 평가에서 공통 사용)
+QUERY_CONTEXT_K = 3
+
+# 검색 결과 보관 시간 (24시간)
+QUERY_CONTEXT_TTL = 86400
+
+# 다른 워커가 같은 특허를 검색 중일 때 기다리는 최대 시간(초)
+QUERY_CONTEXT_WAIT = 10
+
+
+def encode_vector(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+
+def get_index_signature(session_id: str) -> str:
+    """
+    현재 저장된 분류 체계 인덱스를 식별하는 값(인덱스 버전, 수정 시각)을 반환합니다.
+    분류 체계가 다시 저장되면 값이 바뀌어 이전 검색 결과를 재사용하지 않습니다.
+    """
+    return f"{get_index_version(session_id)}.{get_index_mtime(get_vectorstore_path(session_id))}"
+
+
+def get_query_context_key(session_id: str, patent_info: str, signature: Optional[str] = None) -> str:
+    """
+    특허 검색 결과를 저장할 Redis 키를 생성합니다.
+    같은 세션, 같은 인덱스, 같은 특허 정보이면 LLM과 상관없이 같은 키를 사용합니다.
+    """
+    if signature is None:
+        signature = get_index_signature(session_id)
+    digest = hashlib.sha1(patent_info.encode("utf-8")).hexdigest()
+    return f"{session_id}:query:{signature}:{digest}"
+
+
+def search_by_vector(vector_store: Any, embedding, k: int = QUERY_CONTEXT_K) -> List[Dict[str, Any]]:
+    """
+    임베딩 벡터로 분류 체계를 검색하고 관련도 점수(0~1)와 함께 반환합니다.
+    similarity_search_with_relevance_scores와 같은 점수 계산을 사용합니다.
+    """
+    relevance_score_fn = vector_store._select_relevance_score_fn()
+    docs_with_distance = vector_store.similarity_search_with_score_by_vector(list(embedding), k=k)
+    return [
+        {
+            "page_content": doc.page_content,
+            "metadata": doc.metadata,
+            "score": float(relevance_score_fn(distance)),
+        }
+        for doc, distance in docs_with_distance
+    ]
+
+
+def search_by_vectors(vector_store: Any, query_vectors: np.ndarray, k: int = 1, chunk_size: int = 1024) -> List[List[Dict[str, Any]]]:
+    """
+    여러 임베딩 벡터를 한 번의 행렬 검색으로 처리하여 행마다 상위 k개의 결과를 반환합니다.
+    메모리 사용량을 제한하기 위해 chunk_size 행씩 나누어 검색합니다.
+    """
+    relevance_score_fn = vector_store._select_relevance_score_fn()
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+
+    if isinstance(vector_store, MmapVectorStore):
+        search = vector_store.search_matrix
+        get_document = vector_store.document
+    else:
+        def search(vectors, k):
+            distances, indices = vector_store.index.search(np.ascontiguousarray(vectors), k)
+            return indices, distances
+
+        def get_document(i):
+            return vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+
+    results: List[List[Dict[str, Any]]] = []
+    for start in range(0, len(query_vectors), chunk_size):
+        indices, distances = search(query_vectors[start:start + chunk_size], k)
+        for row_indices, row_distances in zip(indices, distances):
+            hits = []
+            for i, distance in zip(row_indices, row_distances):
+                if i < 0:
+                    continue
+                doc = get_document(int(i))
+                hits.append({
+                    "page_content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "score": float(relevance_score_fn(distance)),
+                })
+            results.append(hits)
+    return results
+
+
+def compute_query_context(session_id: str, patent_info: str, row_index: Optional[int] = None) -> Dict[str, Any]:
+    """
+    특허 정보를 한 번 임베딩하고 상위 k개의 분류 체계를 검색합니다.
+    업로드 시 미리 계산된 임베딩이 있으면 임베딩 API를 호출하지 않습니다.
+    """
+    vector_store = load_vectorstore(session_id)
+    embedding = load_patent_embedding(session_id, row_index)
+    if embedding is None:
+        embedding = embeddings_openai.embed_query(patent_info)
+    return {
+        "embedding": encode_vector(embedding),
+        "hits": search_by_vector(vector_store, embedding),
+    }
+
+
+def load_query_context(
+    session_id: str,
+    patent_info: str,
+    context_key: Optional[str] = None,
+    row_index: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    특허의 임베딩과 검색 결과를 Redis에서 가져오고, 없으면 계산하여 저장합니다.
+    분류, 벡터 평가, LLM 평가 단계가 같은 키를 참조하므로 특허 당 임베딩 호출은 한 번만 발생합니다.
+    """
+    redis = get_redis_client()
+    if context_key is None:
+        context_key = get_query_context_key(session_id, patent_info)
+
+    cached = redis.get(context_key)
+    if cached:
+        return json.loads(cached)
+
+    # 같은 특허를 다른 워커가 계산 중이면 결과를 기다림
+    lock_key = f"{context_key}:lock"
+    if not redis.set(lock_key, 1, nx=True, ex=QUERY_CONTEXT_WAIT):
+        deadline = time.monotonic() + QUERY_CONTEXT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.2)
+            cached = redis.get(context_key)
+            if cached:
+                return json.loads(cached)
+        logger.warning(f"[{session_id}] 검색 결과 대기 시간 초과, 직접 계산합니다.")
+
+    try:
+        context = compute_query_context(session_id, patent_info, row_index)
+        redis.set(context_key, json.dumps(context, ensure_ascii=False), ex=QUERY_CONTEXT_TTL)
+    finally:
+        redis.delete(lock_key)
+
+    return context
+
+
+def context_documents(context: Dict[str, Any]) -> List[Document]:
+    """
+    저장된 검색 결과를 retriever가 반환하는 것과 같은 Document 리스트로 변환합니다.
+    """
+    return [
+        Document(page_content=hit["page_content"], metadata=hit["metadata"])
+        for hit in context["hits"]
+    ]
+
+
+def top_hit(context: Dict[str, Any]) -> Tuple[Document, float]:
+    """
+    가장 유사한 분류 체계와 관련도 점수를 반환합니다.
+    """
+    hit = context["hits"][0]
+    return Document(page_content=hit["page_content"], metadata=hit["metadata"]), hit["score"]
@@ -0,0 +1,134 @@
+# 같은 LLM 요청 합치기 (single-flight, 여러 워커에서 동시에 보내는 같은 (모델, 프롬프트) 요청은 한 번만 호출)
+#
+# 처음 요청한 쪽이 Redis 락을 잡고 LLM을 호출해 결과 키에 저장하고, 락을 잡지 못한 같은 요청은 결과가 저장될 때까지 기다립니다.
+# 기다리는 중에 락이 풀렸는데 결과가 없으면(호출 실패, 락 만료) 기다리던 요청 중 하나가 락을 잡아 다시 호출하고,
+# SINGLE_FLIGHT_WAIT초가 지나도 결과가 없으면 락과 관계없이 직접 호출합니다.
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from app.core.concurrency import get_llm_provider
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 결과를 기다리며 다시 확인하는 간격(초, 처음 간격부터 두 배씩 늘려 최대 간격까지)
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+# 락을 잡은 요청만 락을 지움
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def request_key(llm: Any, *parts: Any) -> str:
+    """
+    (제공자, 모델명, 프롬프트 구성 요소)로 요청 키를 만듭니다.
+    """
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    text = json.dumps([get_llm_provider(llm), str(model), *parts], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _keys(key: str) -> Tuple[str, str]:
+    return f"single_flight:{key}:lock", f"single_flight:{key}:result"
+
+
+def _try_lead(key: str, token: str) -> Tuple[bool, Optional[str]]:
+    # (락을 잡았는지, 이미 저장된 결과)
+    lock_key, result_key = _keys(key)
+    redis = get_redis_client()
+    stored = redis.get(result_key)
+    if stored is not None:
+        return False, stored
+    return bool(redis.set(lock_key, token, nx=True, ex=settings.SINGLE_FLIGHT_LOCK_TTL)), None
+
+
+def _finish(key: str, token: str, result: Any = None, succeeded: bool = False) -> None:
+    lock_key, result_key = _keys(key)
+    try:
+        redis = get_redis_client()
+        if succeeded:
+            redis.set(result_key, json.dumps(result, ensure_ascii=False), ex=settings.SINGLE_FLIGHT_RESULT_TTL)
+        redis.eval(RELEASE_SCRIPT, 1, lock_key, token)
+    except Exception as e:
+        logger.warning(f"같은 요청 합치기 결과 저장 실패: {e}")
+
+
+def single_flight(key: str, call: Callable[[], Any]) -> Tuple[Any, bool]:
+    """
+    같은 키의 요청이 실행 중이면 그 결과를 기다리고, 아니면 call을 실행해 결과를 공유합니다.
+    반환값: (결과, 다른 요청의 결과인지 여부), 결과는 JSON으로 저장할 수 있어야 합니다.
+    """
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return call(), False
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    interval = POLL_INTERVAL
+    while True:
+        try:
+            leader, stored = _try_lead(key, token)
+        except Exception as e:
+            logger.warning(f"같은 요청 합치기 실패, 직접 호출합니다: {e}")
+            return call(), False
+        if stored is not None:
+            return json.loads(stored), True
+        if leader:
+            break
+        if time.monotonic() >= deadline:
+            logger.info("같은 요청의 결과 대기 시간 초과, 직접 호출합니다.")
+            return call(), False
+        time.sleep(interval)
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    try:
+        result = call()
+    except Exception:
+        _finish(key, token)
+        raise
+    _finish(key, token, result, succeeded=True)
+    return result, False
+
+
+async def asingle_flight(key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """
+    single_flight의 비동기 버전입니다.
+    """
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await call(), False
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    interval = POLL_INTERVAL
+    while True:
+        try:
+            leader, stored = await asyncio.to_thread(_try_lead, key, token)
+        except Exception as e:
+            logger.warning(f"같은 요청 합치기 실패, 직접 호출합니다: {e}")
+            return await call(), False
+        if stored is not None:
+            return json.loads(stored), True
+        if leader:
+            break
+        if time.monotonic() >= deadline:
+            logger.info("같은 요청의 결과 대기 시간 초과, 직접 호출합니다.")
+            return await call(), False
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    try:
+        result = await call()
+    except Exception:
+        await asyncio.to_thread(_finish, key, token)
+        raise
+    await asyncio.to_thread(_finish, key, token, result, True)
+    return result, False
@@ -0,0 +1,201 @@
+# 늦게 끝나는 특허(straggler) 감지 및 재전송 (사용자 모드 Celery 작업)
+#
+# 작업은 가장 늦은 특허가 끝나야 완료되므로, 남은 특허가 전체의 STRAGGLER_TAIL_RATIO 이하이고
+# 중간값 처리 시간보다 훨씬 오래 걸리는 특허는 같은 태스크를 한 번 더 보냅니다.
+# 특허별 결과는 먼저 저장한 쪽이 이기고(HSETNX), 모든 특허의 결과가 모이면 chord를 기다리지 않고 완료 처리합니다.
+#
+# INCREMENTAL_COLLECTION_ENABLED이면 같은 특허별 결과 해시를 작업 결과 수집에 사용합니다.
+# 새로 저장한 결과 수를 완료 수 카운터(INCRBY)에 더하고, 카운터가 전체 특허 수(서로 다른 출원번호 수)가 되면 그 태스크가 완료 처리를 실행합니다.
+import json
+import math
+import statistics
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+# 보관 시간 (24시간)
+STRAGGLER_TTL = 86400
+
+# 중간값 계산에 사용할 최근 처리 시간 수
+DURATION_SAMPLES = 1000
+
+
+def _keys(session_id: str) -> Dict[str, str]:
+    return {
+        "items": f"{session_id}:patent_items",
+        "results": f"{session_id}:patent_results",
+        "started": f"{session_id}:patent_started",
+        "durations": f"{session_id}:patent_durations",
+        "redispatched": f"{session_id}:redispatched",
+        "completed": f"{session_id}:completed",
+        "collected": f"{session_id}:patent_collected",
+        "total": f"{session_id}:patent_total",
+    }
+
+
+def _results_enabled() -> bool:
+    # 특허별 결과 해시 사용 여부 (늦게 끝나는 특허 재전송, 결과 바로 모으기)
+    return settings.STRAGGLER_REDISPATCH_ENABLED or settings.INCREMENTAL_COLLECTION_ENABLED
+
+
+def reset_straggler_state(session_id: str, items: List[Dict[str, Any]]) -> None:
+    """
+    작업 시작 시 이전 실행의 상태를 지우고, 재전송에 사용할 특허별 태스크 인자를 저장합니다.
+    """
+    redis = get_redis_client()
+    keys = _keys(session_id)
+    pipe = redis.pipeline()
+    pipe.delete(*keys.values())
+    if settings.STRAGGLER_REDISPATCH_ENABLED and items:
+        pipe.hset(keys["items"], mapping={
+            str(item["application_number"]): json.dumps(item, ensure_ascii=False) for item in items
+        })
+        pipe.expire(keys["items"], STRAGGLER_TTL)
+    if settings.INCREMENTAL_COLLECTION_ENABLED and items:
+        # 특허별 결과는 출원번호마다 하나만 저장되므로 같은 출원번호의 행(중복 제거를 사용하지 않거나 출원번호가 비어 있는 행)은 한 번만 셈
+        pipe.set(keys["total"], len({str(item["application_number"]) for item in items}), ex=STRAGGLER_TTL)
+    pipe.execute()
+
+
+def mark_started(session_id: str, application_numbers: List[str]) -> None:
+    if not settings.STRAGGLER_REDISPATCH_ENABLED:
+        return
+    redis = get_redis_client()
+    key = _keys(session_id)["started"]
+    now = time.time()
+    pipe = redis.pipeline()
+    for application_number in application_numbers:
+        pipe.hsetnx(key, str(application_number), now)
+    pipe.expire(key, STRAGGLER_TTL)
+    pipe.execute()
+
+
+def record_duration(session_id: str, seconds: float) -> None:
+    if not settings.STRAGGLER_REDISPATCH_ENABLED:
+        return
+    redis = get_redis_client()
+    key = _keys(session_id)["durations"]
+    pipe = redis.pipeline()
+    pipe.lpush(key, round(seconds, 3))
+    pipe.ltrim(key, 0, DURATION_SAMPLES - 1)
+    pipe.expire(key, STRAGGLER_TTL)
+    pipe.execute()
+
+
+def store_patent_result(session_id: str, application_number: str, result: Dict[str, str]) -> bool:
+    """
+    특허 결과를 저장합니다. 같은 특허의 결과가 이미 있으면 저장하지 않고 False를 반환합니다. (먼저 끝난 요청이 이김)
+    재전송과 결과 바로 모으기를 사용하지 않으면 항상 True를 반환합니다.
+    """
+    if not _results_enabled():
+        return True
+    redis = get_redis_client()
+    key = _keys(session_id)["results"]
+    stored = redis.hsetnx(key, str(application_number), json.dumps(result, ensure_ascii=False))
+    redis.expire(key, STRAGGLER_TTL)
+    return bool(stored)
+
+
+def store_missing_results(session_id: str, results: Dict[str, Dict[str, str]]) -> int:
+    """
+    출원번호 -> 결과 중 아직 결과가 없는 특허만 저장하고, 새로 저장한 수를 반환합니다. (태스크가 최종 실패했을 때 사용)
+    재전송과 결과 바로 모으기를 사용하지 않으면 저장하지 않고 0을 반환합니다.
+    """
+    if not _results_enabled():
+        return 0
+    return sum(store_patent_result(session_id, application_number, result) for application_number, result in results.items())
+
+
+def get_patent_result(session_id: str, application_number: str) -> Optional[Dict[str, str]]:
+    if not _results_enabled():
+        return None
+    stored = get_redis_client().hget(_keys(session_id)["results"], str(application_number))
+    return json.loads(stored) if stored else None
+
+
+def add_collected(session_id: str, count: int = 1) -> bool:
+    """
+    새로 저장한 특허 결과 수를 완료 수에 더하고, 이번에 모든 특허의 결과가 모였으면 True를 반환합니다. (작업마다 한 번만 True)
+    진행률을 반영한 뒤 호출해야 완료 알림 뒤에 진행률이 덮어써지지 않습니다.
+    """
+    if not settings.INCREMENTAL_COLLECTION_ENABLED or count <= 0:
+        return False
+    redis = get_redis_client()
+    keys = _keys(session_id)
+    pipe = redis.pipeline()
+    pipe.incrby(keys["collected"], count)
+    pipe.expire(keys["collected"], STRAGGLER_TTL)
+    pipe.get(keys["total"])
+    collected, _, total = pipe.execute()
+    return total is not None and collected == int(total)
+
+
+def iter_patent_results(session_id: str, count: int = 1000) -> Iterator[Dict[str, str]]:
+    """
+    저장된 특허별 결과를 HSCAN으로 나눠 읽습니다.
+    """
+    for _, stored in get_redis_client().hscan_iter(_keys(session_id)["results"], count=count):
+        yield json.loads(stored)
+
+
+def claim_completion(session_id: str) -> bool:
+    """
+    완료 처리를 한 번만 실행하도록 표시합니다. (chord 콜백과 straggler 감시 태스크 중 먼저 실행한 쪽)
+    """
+    return bool(get_redis_client().set(_keys(session_id)["completed"], 1, nx=True, ex=STRAGGLER_TTL))
+
+
+def is_completed(session_id: str) -> bool:
+    return bool(get_redis_client().exists(_keys(session_id)["completed"]))
+
+
+def is_tracked(session_id: str) -> bool:
+    # 재전송용 태스크 인자가 남아 있는지 (재전송을 사용하지 않거나 만료되면 False)
+    return bool(get_redis_client().exists(_keys(session_id)["items"]))
+
+
+def find_stragglers(session_id: str) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    반환값: (모든 특허의 결과가 모였으면 결과 목록, 아니면 None, 다시 보낼 특허의 태스크 인자 목록)
+    """
+    redis = get_redis_client()
+    keys = _keys(session_id)
+    pipe = redis.pipeline()
+    pipe.hgetall(keys["items"])
+    pipe.hgetall(keys["results"])
+    pipe.hgetall(keys["started"])
+    pipe.lrange(keys["durations"], 0, -1)
+    pipe.smembers(keys["redispatched"])
+    pipe.get(f"{session_id}:time")
+    items, results, started, durations, redispatched, job_started = pipe.execute()
+
+    if not items:
+        return None, []
+
+    outstanding = [number for number in items if number not in results]
+    if not outstanding:
+        return [json.loads(result) for result in results.values()], []
+
+    # 남은 특허가 꼬리 부분(전체의 STRAGGLER_TAIL_RATIO 이하)일 때만 재전송
+    if len(outstanding) > max(1, math.ceil(len(items) * settings.STRAGGLER_TAIL_RATIO)):
+        return None, []
+
+    median = statistics.median(float(value) for value in durations) if durations else 0.0
+    wait = max(settings.STRAGGLER_MIN_WAIT, median * settings.STRAGGLER_MEDIAN_FACTOR)
+    now = time.time()
+
+    stragglers = []
+    for number in outstanding:
+        if number in redispatched:
+            continue
+        since = float(started.get(number) or job_started or now)
+        if now - since > wait:
+            stragglers.append(json.loads(items[number]))
+
+    if stragglers:
+        pipe = redis.pipeline()
+        pipe.sadd(keys["redispatched"], *[str(item["application_number"]) for item in stragglers])
+        pipe.expire(keys["redispatched"], STRAGGLER_TTL)
+        pipe.execute()
+    return None, stragglers
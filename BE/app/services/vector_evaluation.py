@@ -0,0 +1,104 @@
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.core.redis import get_redis_client
+from app.core.vectorstore import load_vectorstore
+from app.services.patent_embedding import embed_patent_dataframe, get_embedding_matrix_path, get_patent_info
+from app.services.retrieval import get_index_signature, search_by_vectors
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 유사도 평가 기준점 설정
+THRESHOLD = 0.5  # 단일 임계값으로 변경
+
+# 작업 단위 검색 결과 보관 시간 (24시간)
+VECTOR_MATCHES_TTL = 86400
+
+
+def compute_vector_matches(session_id: str, df: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+    """
+    작업의 모든 특허 임베딩을 쌓아 한 번의 행렬 검색으로 행마다 가장 유사한 분류 체계를 찾습니다.
+    제목과 요약이 비어있는 행은 None입니다.
+    """
+    redis = get_redis_client()
+
+    # 업로드 시 계산된 임베딩 행렬 사용 (없으면 지금 일괄 임베딩)
+    if redis.get(f"{session_id}:embeddings") is None:
+        embed_patent_dataframe(session_id, df)
+    matrix = np.load(get_embedding_matrix_path(session_id), mmap_mode="r")
+
+    positions = [position for position, (_, row) in enumerate(df.iterrows()) if get_patent_info(row) is not None]
+    hits = search_by_vectors(load_vectorstore(session_id), matrix[positions], k=1)
+
+    matches: List[Optional[Dict[str, Any]]] = [None] * len(df)
+    for position, row_hits in zip(positions, hits):
+        if row_hits:
+            matches[position] = {"metadata": row_hits[0]["metadata"], "score": row_hits[0]["score"]}
+    return matches
+
+
+def get_vector_matches(session_id: str, df: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+    """
+    작업 단위 검색 결과를 Redis에서 가져오고, 없으면 계산하여 저장합니다.
+    LLM과 무관하므로 같은 작업의 모든 LLM 평가가 한 번의 검색 결과를 공유합니다.
+    """
+    redis = get_redis_client()
+    key = f"{session_id}:vector_matches:{get_index_signature(session_id)}"
+
+    cached = redis.get(key)
+    if cached:
+        return json.loads(cached)
+
+    # 다른 LLM의 완료 태스크가 계산 중이면 결과를 기다림
+    lock_key = f"{key}:lock"
+    if not redis.set(lock_key, 1, nx=True, ex=300):
+        deadline = time.monotonic() + 300
+        while time.monotonic() < deadline:
+            time.sleep(1)
+            cached = redis.get(key)
+            if cached:
+                return json.loads(cached)
+
+    try:
+        matches = compute_vector_matches(session_id, df)
+        redis.set(key, json.dumps(matches, ensure_ascii=False), ex=VECTOR_MATCHES_TTL)
+    finally:
+        redis.delete(lock_key)
+
+    logger.info(f"[{session_id}] 벡터 평가용 일괄 검색 완료: {len(matches)}건")
+    return matches
+
+
+def evaluate_classifications_by_vector(
+    classifications: List[Dict[str, str]],
+    matches: List[Dict[str, Any]],
+) -> np.ndarray:
+    """
+    LLM 분류 결과와 가장 유사한 분류 체계를 한 번에 비교하여 특허별 정답 여부를 반환합니다.
+    - 미분류: 정규화 유사도가 기준점 이하이면 정답
+    - 분류: 정규화 유사도가 기준점 이상이고 대/중/소분류 코드가 모두 일치하면 정답
+    """
+    if not classifications:
+        return np.zeros(0, dtype=bool)
+
+    # -1~1 범위를 0~1 범위로 변환
+    scores = (np.array([match["score"] for match in matches], dtype=np.float64) + 1) / 2
+
+    def column(rows, key, default=None):
+        return np.array([row.get(key, default) for row in rows], dtype=object)
+
+    metadata = [match["metadata"] for match in matches]
+    major, middle, small = column(classifications, "majorCode"), column(classifications, "middleCode"), column(classifications, "smallCode")
+
+    is_unclassified = (major == "미분류") | (middle == "미분류") | (small == "미분류")
+    codes_match = (
+        (major == column(metadata, "grand_parent_code", "미분류")) &
+        (middle == column(metadata, "parent_code", "미분류")) &
+        (small == column(metadata, "code", "미분류"))
+    )
+
+    return np.where(is_unclassified, scores <= THRESHOLD, (scores >= THRESHOLD) & codes_match)
@@ -1,27 +1,52 @@
+import asyncio
 from datetime import datetime
+import inspect
 import io
 import json
 import logging
 import os
 import pickle
-import re
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 from openai import RateLimitError as OpenAIRateLimitError
 from anthropic import RateLimitError as ClaudeRateLimitError
-from langchain_openai import OpenAIEmbeddings
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
 import pandas as pd
 import requests
+from celery import chord, group
+from celery.signals import task_failure
 from app.core.celery import celery_app
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.concurrency import get_llm_provider
+from app.core.config import settings
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_community.vectorstores import FAISS
 from app.core.redis import get_redis_client
-from app.schemas.classification import ClassificationSchema, Patent
+from app.core.vectorstore import load_vectorstore
+from app.services.bypass import classify_from_context
+from app.services.evaluation import FAILED_EVALUATION, evaluate_batch_with_llm, evaluate_with_llm
+from app.services.hedging import ahedged_call, hedged_call
+from app.services.job_input import load_chunk_results, load_job_items, save_chunk_result
+from app.services.job_stats import get_job_stats, increment_job_stat
+from app.services.pipeline import get_classification_pipeline, to_classifications, unclassified
+from app.services.result_cache import cache_classification, get_cached_classification, get_classification_cache_key
+from app.services.retrieval import context_documents, load_query_context
+from app.services.single_flight import asingle_flight, request_key, single_flight
+from app.services.stragglers import (
+    add_collected,
+    claim_completion,
+    find_stragglers,
+    get_patent_result,
+    is_completed,
+    is_tracked,
+    iter_patent_results,
+    mark_started,
+    record_duration,
+    store_missing_results,
+    store_patent_result,
+)
+from app.services.vector_evaluation import evaluate_classifications_by_vector, get_vector_matches
+from app.schemas.classification import Patent
 from app.core.llm import gpt, claude, gemini, grok
 from app.schemas.message import Message, Progress
 from google.api_core import exceptions
@@ -29,9 +54,6 @@ from google.api_core import exceptions
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 유사도 평가 기준점 설정
-THRESHOLD = 0.5  # 단일 임계값으로 변경
-
 # LLM을 가져오는 함수
 def get_llm_by_name(name: str):
     name = name.upper()
@@ -46,179 +68,226 @@ def get_llm_by_name(name: str):
     else:
         raise ValueError(f"지원하지 않는 LLM 이름입니다: {name}")
 
-# retriever을 가져오는 함수
+# 헤징 요청을 보낼 LLM (사용하지 않으면 None, 관리자 모드는 LLM 비교가 목적이므로 같은 LLM)
+def get_hedge_llm(LLM: str, isAdmin: bool):
+    if not settings.HEDGING_ENABLED:
+        return None
+    if isAdmin or not settings.HEDGE_FALLBACK_LLM:
+        return get_llm_by_name(LLM)
+    return get_llm_by_name(settings.HEDGE_FALLBACK_LLM)
+
+# 서킷이 열렸을 때 대신 호출할 LLM (사용하지 않으면 None, 관리자 모드는 LLM 비교가 목적이므로 바로 실패)
+def get_fallback_llm(LLM: str, isAdmin: bool):
+    fallback = settings.CIRCUIT_BREAKER_FALLBACK_LLM
+    if not settings.CIRCUIT_BREAKER_ENABLED or isAdmin or not fallback or fallback.upper() == LLM.upper():
+        return None
+    return get_llm_by_name(fallback)
+
+# 분류 결과를 평가하는 LLM
+def get_evaluator_llm():
+    return get_llm_by_name(settings.EVALUATOR_LLM)
+
+# retriever을 가져오는 함수 (워커 프로세스 캐시 사용)
 def load_retriever_from_redis(session_id: str):
-    redis = get_redis_client()
-    path = redis.get(f"vectorstore:{session_id}:path")
-    if path is None:
-        raise Exception(f"{session_id}에 해당하는 벡터 저장소가 없습니다.")
-    path = path.decode("utf-8") if isinstance(path, bytes) else path
-
-    logger.info(f"FAISS index 경로: {path}")  # 경로 출력해서 확인
-
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", dimensions=3072)
-
-    vector_store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    vector_store = load_vectorstore(session_id)
 
     return vector_store.as_retriever(search_kwargs={"k": 3})
 
-# 특허 분류 함수
-@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
-def classify_patent(
-    self,
-    LLM: str, 
-    session_id: str, 
-    patent_info: str,
-    application_number: str, 
-    isAdmin: bool
- ) -> Dict[str, str]:
-    redis = get_redis_client()
-    logger.info("celery 시작")
-    # retriever 가져옴
-    retriever = load_retriever_from_redis(session_id)
-    
-    # llm 가져옴
-    llm = get_llm_by_name(LLM)
-
-    # 출력 파서 정의
-    parser = PydanticOutputParser(pydantic_object=ClassificationSchema)
-    
-    # 프롬프트 템플릿 정의
-    template = """
-    다음은 특허 분류 데이터베이스에서 검색된 유사한 특허 정보입니다:
+# 분류 진행률 업데이트 함수
+def update_classification_progress(redis, session_id: str, LLM: str, isAdmin: bool, count: int = 1):
+    progress_key = f"{session_id}:progress"
     
-    {context}
-    
-    위 참고 정보를 바탕으로, 다음 특허 정보에 대한 대분류, 중분류, 소분류를 제공해주세요.
-    대분류 코드와 명칭, 중분류 코드와 명칭, 소분류 코드와 명칭을 모두 포함해야 합니다.
-    꼭 context안에 있는 기준으로 결과를 내세요.
-    해당하는게 없으면 미분류로 결과 내세요.
-    이유를 적지말고 응답 형식만 맞게 답 하세요.
-    
-    특허 정보: {query}
-    
-    너는 다음 JSON 형태로만 응답해야 해: {format_instructions}
-    """
-    prompt = ChatPromptTemplate.from_template(template)
-    
-    # 메타데이터를 포함한 형식으로 문서 포맷팅
-    def format_docs(docs):
-        formatted_docs = []
-        for doc in docs:
-            metadata = doc.metadata
-            
-            # 문서 레벨에 따라 다르게 포맷팅
-            if metadata.get('level') == '중분류':
-                formatted_doc = f"""
-분류 정보:
-- 코드: {metadata.get('code', '')}
-- 명칭: {metadata.get('name', '')}
-- 레벨: {metadata.get('level', '')}
-- 상위 코드: {metadata.get('parent_code', '')}
-- 상위 명칭: {metadata.get('parent_name', '')}
-- 설명: {metadata.get('description', '')}
-
-{doc.page_content}
-"""
-            elif metadata.get('level') == '소분류':
-                formatted_doc = f"""
-분류 정보:
-- 코드: {metadata.get('code', '')}
-- 명칭: {metadata.get('name', '')}
-- 레벨: {metadata.get('level', '')}
-- 상위 코드: {metadata.get('parent_code', '')}
-- 상위 명칭: {metadata.get('parent_name', '')}
-- 최상위 코드: {metadata.get('grand_parent_code', '')}
-- 최상위 명칭: {metadata.get('grand_parent_name', '')}
-- 설명: {metadata.get('description', '')}
+    if not isAdmin:
+        current = redis.incr(f"{session_id}:progress_counter", count)  # +count 누적
+        total = int(redis.get(f"{session_id}:total_count") or 1)
+        percentage = int(current / total * 100)
+    else:
+        progress_key = f"{session_id}:{LLM}:progress"
+        current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.25 * count)) # +0.25 누적
+        total = float(redis.get(f"{session_id}:{LLM}:total_count") or 1)
+        percentage = int(current / total * 100)
 
-{doc.page_content}
-"""
-            else:
-                # 기타 레벨이나 메타데이터가 없는 경우
-                formatted_doc = doc.page_content
-                
-            formatted_docs.append(formatted_doc)
-            
-        return "\n\n---\n\n".join(formatted_docs)
-    
-    rag_chain = (
-        {
-            "context": retriever | format_docs,
-            "query": RunnablePassthrough(),
-            "format_instructions": lambda _: parser.get_format_instructions()
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
+    progress = Progress(
+        current=current,
+        total=total,
+        percentage=percentage
     )
+
+    # 진행 상황 업데이트
+    redis.set(progress_key, progress.model_dump_json())
+    # 진행 상황 알림
+    redis.publish(progress_key, progress.model_dump_json())
+    redis.expire(progress_key, 86400)
+
+# 특허 하나를 LLM으로 분류하는 함수
+# hedge_llm이 있으면 응답이 느릴 때 같은 요청을 hedge_llm으로 한 번 더 보내고 먼저 온 결과 사용
+# fallback_llm이 있으면 llm의 서킷이 열려 있을 때 fallback_llm으로 분류
+# 다른 워커가 같은 LLM으로 같은 프롬프트(분류 체계 context, 특허 정보)를 실행 중이면 그 결과를 사용
+# 반환값: (분류 결과, llm이 응답한 결과인지 여부) - 다른 LLM(대체, 헤징 LLM)의 응답은 llm의 결과 캐시에 저장하지 않음
+def invoke_classification(
+    llm,
+    docs,
+    patent_info: str,
+    application_number: str,
+    session_id: str,
+    hedge_llm=None,
+    stats_key: Optional[str] = None,
+    fallback_llm=None
+) -> Tuple[Dict[str, str], bool]:
+    # 세션 분류 체계별로 한 번 만든 분류 체인 사용
+    pipeline = get_classification_pipeline(llm, load_vectorstore(session_id))
+    stats_key = stats_key or session_id
     
+    # 체인 실행 및 결과 파싱
+    logger.info(f"[{session_id}] rag_chain.invoke 시작")
     try:
-        # 체인 실행
-        logger.info(f"[{session_id}] rag_chain.invoke 시작")
-        result = rag_chain.invoke(patent_info)
-        logger.info(f"[{session_id}] rag_chain.invoke 완료")
-
-        # 결과 파싱
-        cleaned = re.sub(r"```(?:json)?\s*([\s\S]+?)\s*```", r"\1", result.strip())
-        parsed = json.loads(cleaned)
-        def replace_na(value):
-            return value if value and value != "N/A" else "미분류"
-
-        classifications = {
-            "applicationNumber": application_number,  # 식별자 추가
-            "majorCode": replace_na(parsed.get("majorCode")),
-            "majorTitle": replace_na(parsed.get("majorTitle")),
-            "middleCode": replace_na(parsed.get("middleCode")),
-            "middleTitle": replace_na(parsed.get("middleTitle")),
-            "smallCode": replace_na(parsed.get("smallCode")),
-            "smallTitle": replace_na(parsed.get("smallTitle")),
-        }
-        
-        progress_key = f"{session_id}:progress"
-        
-        # 진행률 업데이트
-        if not isAdmin:
-            current = redis.incr(f"{session_id}:progress_counter")  # +1 누적
-            total = int(redis.get(f"{session_id}:total_count") or 1)
-            percentage = int(current / total * 100)
-        else:
-            progress_key = f"{session_id}:{LLM}:progress"
-            current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.25)) # +0.25 누적
-            total = float(redis.get(f"{session_id}:{LLM}:total_count") or 1)
-            percentage = int(current / total * 100)
+        (classifications, answered_by_llm), shared = single_flight(
+            request_key(llm, "classification", pipeline.inputs(docs, patent_info)),
+            lambda: _invoke_pipeline(pipeline, docs, patent_info, application_number, hedge_llm, stats_key),
+        )
+        if shared:
+            increment_job_stat(stats_key, "coalesced_requests")
+            classifications = {**classifications, "applicationNumber": application_number}
+    except CircuitOpenError as e:
+        if fallback_llm is None:
+            raise
+        logger.warning(f"[{session_id}] {e}, 대체 LLM으로 분류합니다.")
+        increment_job_stat(stats_key, "circuit_fallbacks")
+        classifications = get_classification_pipeline(fallback_llm, pipeline.vector_store).classify(docs, patent_info, application_number)
+        answered_by_llm = False
+    logger.info(f"[{session_id}] rag_chain.invoke 완료")
+    return classifications, answered_by_llm
+
+def _invoke_pipeline(pipeline, docs, patent_info: str, application_number: str, hedge_llm, stats_key: str) -> Tuple[Dict[str, str], bool]:
+    if hedge_llm is None:
+        return pipeline.classify(docs, patent_info, application_number), True
+
+    hedge_pipeline = get_classification_pipeline(hedge_llm, pipeline.vector_store)
+    classifications, hedged = hedged_call(
+        get_llm_provider(pipeline.llm),
+        lambda: pipeline.classify(docs, patent_info, application_number),
+        lambda: hedge_pipeline.classify(docs, patent_info, application_number),
+        on_hedge=lambda: increment_job_stat(stats_key, "hedged_requests"),
+    )
+    if hedged:
+        increment_job_stat(stats_key, "hedge_wins")
+    # HEDGE_FALLBACK_LLM(다른 LLM)의 응답이면 llm의 결과 캐시에 저장하지 않음
+    return classifications, not hedged or hedge_pipeline.llm is pipeline.llm
+
+# 비동기 워커용 (이벤트 루프에서 여러 특허를 동시에 분류)
+async def ainvoke_classification(
+    llm,
+    docs,
+    patent_info: str,
+    application_number: str,
+    session_id: str,
+    hedge_llm=None,
+    stats_key: Optional[str] = None,
+    fallback_llm=None
+) -> Tuple[Dict[str, str], bool]:
+    pipeline = get_classification_pipeline(llm, load_vectorstore(session_id))
+    stats_key = stats_key or session_id
 
-        
-        progress = Progress(
-            current=current,
-            total=total,
-            percentage=percentage
+    try:
+        (classifications, answered_by_llm), shared = await asingle_flight(
+            request_key(llm, "classification", pipeline.inputs(docs, patent_info)),
+            lambda: _ainvoke_pipeline(pipeline, docs, patent_info, application_number, hedge_llm, stats_key),
         )
+        if shared:
+            await asyncio.to_thread(increment_job_stat, stats_key, "coalesced_requests")
+            classifications = {**classifications, "applicationNumber": application_number}
+    except CircuitOpenError as e:
+        if fallback_llm is None:
+            raise
+        logger.warning(f"[{session_id}] {e}, 대체 LLM으로 분류합니다.")
+        await asyncio.to_thread(increment_job_stat, stats_key, "circuit_fallbacks")
+        classifications = await get_classification_pipeline(fallback_llm, pipeline.vector_store).aclassify(
+            docs, patent_info, application_number
+        )
+        answered_by_llm = False
+    logger.info(f"[{session_id}] rag_chain.ainvoke 완료")
+    return classifications, answered_by_llm
+
+async def _ainvoke_pipeline(pipeline, docs, patent_info: str, application_number: str, hedge_llm, stats_key: str) -> Tuple[Dict[str, str], bool]:
+    if hedge_llm is None:
+        return await pipeline.aclassify(docs, patent_info, application_number), True
+
+    hedge_pipeline = get_classification_pipeline(hedge_llm, pipeline.vector_store)
+    classifications, hedged = await ahedged_call(
+        get_llm_provider(pipeline.llm),
+        lambda: pipeline.aclassify(docs, patent_info, application_number),
+        lambda: hedge_pipeline.aclassify(docs, patent_info, application_number),
+        on_hedge=lambda: increment_job_stat(stats_key, "hedged_requests"),
+    )
+    if hedged:
+        await asyncio.to_thread(increment_job_stat, stats_key, "hedge_wins")
+    return classifications, not hedged or hedge_pipeline.llm is pipeline.llm
+
+# LLM 호출 전 단계 (캐시, 특허 검색, 검색 결과로 바로 분류)
+# LLM 호출 없이 분류되면 (분류 결과, None, None), 아니면 (None, 분류 체계 문서, 캐시 키)를 반환
+def prepare_classification(
+    LLM: str,
+    session_id: str,
+    patent_info: str,
+    application_number: str,
+    isAdmin: bool,
+    context_key: Optional[str] = None,
+    row_index: Optional[int] = None
+):
+    redis = get_redis_client()
+    stats_key = f"{session_id}:{LLM}" if isAdmin else session_id
+
+    # 같은 분류 체계, 같은 LLM으로 이전 작업에서 분류한 특허면 캐시된 결과 사용
+    cache_key = get_classification_cache_key(session_id, LLM, patent_info)
+    cached = get_cached_classification(cache_key)
+    if cached is not None:
+        logger.info(f"[{session_id}] 분류 결과 캐시 사용: {application_number}")
+        update_classification_progress(redis, session_id, LLM, isAdmin)
+        increment_job_stat(stats_key, "cache_hits")
+        return {"applicationNumber": application_number, **cached}, None, None
+
+    # 특허 검색 결과 가져옴 (특허 당 한 번 임베딩, 이후 단계와 공유)
+    context = load_query_context(session_id, patent_info, context_key, row_index)
+
+    # 검색 결과가 명확하면 LLM 호출 없이 분류 (관리자 모드는 LLM 비교가 목적이므로 제외)
+    if not isAdmin:
+        classifications = classify_from_context(context, application_number)
+        if classifications is not None:
+            logger.info(f"[{session_id}] 검색 결과로 바로 분류: {classifications['smallCode']}")
+            update_classification_progress(redis, session_id, LLM, isAdmin)
+            increment_job_stat(session_id, "bypassed")
+            return classifications, None, None
+
+    return None, context_documents(context), cache_key
+
+# LLM 분류 결과 반영 (진행률, 작업 통계, 결과 캐시)
+def record_classification(LLM: str, session_id: str, isAdmin: bool, cache_key: Optional[str], classifications: Dict[str, str]):
+    redis = get_redis_client()
+    stats_key = f"{session_id}:{LLM}" if isAdmin else session_id
 
-        # 진행 상황 업데이트
-        redis.set(progress_key, progress.model_dump_json())
-        # 진행 상황 알림
-        redis.publish(progress_key, progress.model_dump_json())
-        redis.expire(progress_key, 86400)
+    update_classification_progress(redis, session_id, LLM, isAdmin)
+    increment_job_stat(stats_key, "llm_calls")
+    increment_job_stat(stats_key, "llm_requests")
+    cache_classification(cache_key, classifications)
 
-        return classifications
-    
-    except OpenAIRateLimitError as e:
+# LLM rate limit 에러면 태스크 재시도, 아니면 에러를 다시 발생시키는 함수
+def retry_on_rate_limit(task, session_id: str, e: Exception):
+    if isinstance(e, OpenAIRateLimitError):
         logger.info(f"[{session_id}] OpenAI rate limit 발생")
-        retry_count = self.request.retries
+        retry_count = task.request.retries
         additional_delay = min(retry_count * 5, 60)  # 재시도마다 5초씩 추가, 최대 60초
             
         logger.info(f"[{session_id}] Retrying {retry_count}/20, additional delay: {additional_delay}s")
-        raise self.retry(countdown=additional_delay, max_retries=20)    
+        raise task.retry(countdown=additional_delay, max_retries=20)    
     
-    except ClaudeRateLimitError as e:
+    if isinstance(e, ClaudeRateLimitError):
         logger.info(f"[{session_id}] Claude rate limit 발생")
-        retry_count = self.request.retries
+        retry_count = task.request.retries
         additional_delay = min(retry_count * 5, 60) # 재시도마다 5초씩 추가, 최대 60초
         logger.info(f"[{session_id}] Retrying Claude, count: {retry_count}/20, delay: {additional_delay}s")
-        raise self.retry(countdown=additional_delay, max_retries=20)
+        raise task.retry(countdown=additional_delay, max_retries=20)
     
-    except requests.exceptions.HTTPError as e:
+    if isinstance(e, requests.exceptions.HTTPError):
         if e.response.status_code == 429:
             logger.info(f"[{session_id}] Grok rate limit 발생")
             # 헤더에서 재시도 시간 확인
@@ -235,37 +304,356 @@ def classify_patent(
             if retry_after:
                 logger.warning(f"[{session_id}] Grok 명시적 대기: {retry_after}초")
             
-            raise self.retry(countdown= retry_after, max_retries=20)
-        else:
-            logger.error(f"[{session_id}] HTTP 요청 에러 발생: {e}")
-            raise
+            raise task.retry(countdown= retry_after, max_retries=20)
+        logger.error(f"[{session_id}] HTTP 요청 에러 발생: {e}")
+        raise e
 
-    except exceptions.ResourceExhausted as e:
-        # gemini limit error
-        if e.status_code == 429:
+    if isinstance(e, exceptions.ResourceExhausted):
+        # gemini limit error (ResourceExhausted는 status_code가 없고 code가 HTTP 상태 코드)
+        if e.code == 429:
             logger.info(f"[{session_id}] Gemini rate limit 발생")
             # 지수 백오프
             logger.warning(f"[{session_id}] 백오프")
-            raise self.retry(countdown= 5)
-        else:
-            logger.error(f"[{session_id}] 다른 Gemini API 에러 발생: {e}")
-            raise
+            raise task.retry(countdown= 5)
+        logger.error(f"[{session_id}] 다른 Gemini API 에러 발생: {e}")
+        raise e
+
+    raise e
+
+# 재시도가 필요한 LLM 에러
+RATE_LIMIT_ERRORS = (OpenAIRateLimitError, ClaudeRateLimitError, requests.exceptions.HTTPError, exceptions.ResourceExhausted)
+
+# 재시도가 필요한 rate limit 에러인지 확인 (비동기 워커용)
+def is_rate_limit_error(e: Exception) -> bool:
+    if isinstance(e, requests.exceptions.HTTPError):
+        return e.response is not None and e.response.status_code == 429
+    return isinstance(e, RATE_LIMIT_ERRORS)
+
+# 새로 저장한 특허 결과 수 반영, 모든 특허의 결과가 모였으면 완료 처리 태스크 실행 (사용자 모드, INCREMENTAL_COLLECTION_ENABLED)
+def collect_results(session_id: str, count: int = 1):
+    if add_collected(session_id, count):
+        logger.info(f"[{session_id}] 모든 특허 결과 저장됨, 완료 처리")
+        finalize_classification.delay(session_id)
+
+# 특허 하나를 분류하는 함수 (classify_patent 태스크와 청크 태스크에서 사용, rate limit 에러는 호출한 쪽에서 재시도)
+def classify_one(
+    LLM: str, 
+    session_id: str, 
+    patent_info: str,
+    application_number: str, 
+    isAdmin: bool,
+    context_key: Optional[str] = None,
+    row_index: Optional[int] = None
+ ) -> Dict[str, str]:
+    start = time.monotonic()
+
+    # 사용자 모드: 다시 보낸 같은 특허 태스크가 먼저 끝났으면 그 결과 사용
+    if not isAdmin:
+        stored = get_patent_result(session_id, application_number)
+        if stored is not None:
+            return stored
+        mark_started(session_id, [application_number])
+
+    classifications, docs, cache_key = prepare_classification(
+        LLM, session_id, patent_info, application_number, isAdmin, context_key, row_index
+    )
+    if classifications is not None:
+        if not isAdmin:
+            if store_patent_result(session_id, application_number, classifications):
+                collect_results(session_id)
+            record_duration(session_id, time.monotonic() - start)
+        return classifications
+    
+    # llm 가져옴
+    llm = get_llm_by_name(LLM)
+    stats_key = f"{session_id}:{LLM}" if isAdmin else session_id
+    
+    try:
+        classifications, answered_by_llm = invoke_classification(
+            llm, docs, patent_info, application_number, session_id, get_hedge_llm(LLM, isAdmin), stats_key,
+            get_fallback_llm(LLM, isAdmin)
+        )
+        
+        # 같은 특허의 결과가 먼저 저장되었으면 그 결과 사용 (진행률 중복 반영 방지)
+        if not isAdmin and not store_patent_result(session_id, application_number, classifications):
+            increment_job_stat(session_id, "llm_requests")
+            return get_patent_result(session_id, application_number) or classifications
+
+        # 진행률, 작업 통계, 결과 캐시 반영 (다른 LLM의 응답은 캐시하지 않음)
+        record_classification(LLM, session_id, isAdmin, cache_key if answered_by_llm else None, classifications)
+        if not isAdmin:
+            record_duration(session_id, time.monotonic() - start)
+            collect_results(session_id)
+
+        return classifications
+    
+    except RATE_LIMIT_ERRORS:
+        raise
 
     except Exception as e:
         logger.error(f"[{session_id}] 분류 결과 처리 중 오류 발생: {e}")
-        return {
-            "applicationNumber": application_number,
-            "majorCode": "미분류",
-            "middleCode": "미분류",
-            "smallCode": "미분류",
-            "majorTitle": "미분류",
-            "middleTitle": "미분류",
-            "smallTitle": "미분류"
-        }
+        if isinstance(e, CircuitOpenError):
+            # 서킷이 열려 있으면 재시도하지 않고 바로 미분류 처리
+            increment_job_stat(stats_key, "circuit_rejected")
+        result = unclassified(application_number)
+        if not isAdmin:
+            if not store_patent_result(session_id, application_number, result):
+                return get_patent_result(session_id, application_number) or result
+            collect_results(session_id)
+        return result
+
+# 특허 분류 함수
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def classify_patent(
+    self,
+    LLM: str, 
+    session_id: str, 
+    patent_info: str,
+    application_number: str, 
+    isAdmin: bool,
+    context_key: Optional[str] = None,
+    row_index: Optional[int] = None
+ ) -> Dict[str, str]:
+    logger.info("celery 시작")
+    try:
+        return classify_one(LLM, session_id, patent_info, application_number, isAdmin, context_key, row_index)
+    except RATE_LIMIT_ERRORS as e:
+        retry_on_rate_limit(self, session_id, e)
+
+# 여러 특허를 하나의 프롬프트로 분류하는 함수 (사용자 모드, rate limit 에러는 호출한 쪽에서 재시도)
+# 이미 분류된 특허는 캐시에 저장되어 있어 재시도 시 다시 호출하지 않음
+def classify_batch(
+    LLM: str,
+    session_id: str,
+    items: List[Dict[str, Any]],
+) -> List[Dict[str, str]]:
+    """
+    items: [{"patent_info", "application_number", "context_key", "row_index"}, ...]
+    캐시 및 검색 결과로 분류되지 않은 특허들을 하나의 프롬프트로 분류하고,
+    응답에서 빠지거나 잘못된 특허는 하나씩 다시 분류합니다.
+    """
+    redis = get_redis_client()
+    start = time.monotonic()
+    results: Dict[int, Dict[str, str]] = {}
+    stats = {"cache_hits": 0, "bypassed": 0, "llm_calls": 0, "llm_requests": 0, "batch_fallbacks": 0, "circuit_fallbacks": 0}
+    pending = []
+    mark_started(session_id, [item["application_number"] for item in items])
+
+    for position, item in enumerate(items):
+        application_number = item["application_number"]
+        cache_key = get_classification_cache_key(session_id, LLM, item["patent_info"])
+        cached = get_cached_classification(cache_key)
+        if cached is not None:
+            results[position] = {"applicationNumber": application_number, **cached}
+            stats["cache_hits"] += 1
+            continue
+
+        context = load_query_context(session_id, item["patent_info"], item.get("context_key"), item.get("row_index"))
+        classifications = classify_from_context(context, application_number)
+        if classifications is not None:
+            results[position] = classifications
+            stats["bypassed"] += 1
+            continue
+
+        pending.append((position, item, cache_key, context_documents(context)))
+
+    stats["llm_calls"] = len(pending)
+    llm = get_llm_by_name(LLM)
+    fallback_llm = get_fallback_llm(LLM, False)
+    if pending:
+        # 여러 특허를 하나의 프롬프트로 분류
+        parsed_by_number: Dict[str, Dict[str, Any]] = {}
+        batch_answered_by_llm = True
+        try:
+            pipeline = get_classification_pipeline(llm, load_vectorstore(session_id))
+            logger.info(f"[{session_id}] 특허 {len(pending)}건 일괄 분류 시작")
+            patents = [(item["application_number"], item["patent_info"], docs) for _, item, _, docs in pending]
+            try:
+                parsed = pipeline.classify_batch(patents)
+            except CircuitOpenError as e:
+                if fallback_llm is None:
+                    raise
+                logger.warning(f"[{session_id}] {e}, 대체 LLM으로 분류합니다.")
+                stats["circuit_fallbacks"] += 1
+                parsed = get_classification_pipeline(fallback_llm, pipeline.vector_store).classify_batch(patents)
+                batch_answered_by_llm = False
+            stats["llm_requests"] += 1
+
+            entries = parsed.get("results", []) if isinstance(parsed, dict) else parsed
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("applicationNumber") is not None:
+                    parsed_by_number[str(entry["applicationNumber"])] = entry
+        except RATE_LIMIT_ERRORS:
+            raise
+        except Exception as e:
+            logger.warning(f"[{session_id}] 일괄 분류 응답 처리 실패, 하나씩 분류합니다: {e}")
+
+        for position, item, cache_key, docs in pending:
+            application_number = item["application_number"]
+            entry = parsed_by_number.get(str(application_number))
+            if entry is not None:
+                classifications = to_classifications(entry, application_number)
+                answered_by_llm = batch_answered_by_llm
+            else:
+                # 응답에서 빠진 특허는 하나씩 분류
+                stats["batch_fallbacks"] += 1
+                stats["llm_requests"] += 1
+                try:
+                    classifications, answered_by_llm = invoke_classification(
+                        llm, docs, item["patent_info"], application_number, session_id, get_hedge_llm(LLM, False),
+                        fallback_llm=fallback_llm
+                    )
+                except RATE_LIMIT_ERRORS:
+                    raise
+                except Exception as e:
+                    logger.error(f"[{session_id}] 분류 결과 처리 중 오류 발생: {e}")
+                    results[position] = unclassified(application_number)
+                    continue
+            results[position] = classifications
+            # 대체 LLM, 헤징 LLM의 응답은 LLM의 결과 캐시에 저장하지 않음
+            if answered_by_llm:
+                cache_classification(cache_key, classifications)
+
+
+    # 특허별 결과 저장 (다시 보낸 특허 태스크가 먼저 끝났으면 그 결과 사용, 진행률은 새로 저장한 특허만 반영)
+    stored = 0
+    for position, item in enumerate(items):
+        if store_patent_result(session_id, item["application_number"], results[position]):
+            stored += 1
+        else:
+            results[position] = get_patent_result(session_id, item["application_number"]) or results[position]
+    record_duration(session_id, time.monotonic() - start)
+
+    # 진행률 및 작업 통계 업데이트
+    update_classification_progress(redis, session_id, LLM, False, stored)
+    for field, amount in stats.items():
+        if amount:
+            increment_job_stat(session_id, field, amount)
+    collect_results(session_id, stored)
+
+    return [results[position] for position in range(len(items))]
+
+# 여러 특허 분류 함수 (사용자 모드)
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def classify_patent_batch(
+    self,
+    LLM: str,
+    session_id: str,
+    items: List[Dict[str, Any]],
+) -> List[Dict[str, str]]:
+    try:
+        return classify_batch(LLM, session_id, items)
+    except RATE_LIMIT_ERRORS as e:
+        retry_on_rate_limit(self, session_id, e)
+
+# 저장된 작업 입력의 [start, end) 범위 특허 분류 함수 (사용자 모드)
+# CLASSIFICATION_BATCH_SIZE가 1보다 크면 청크 안에서 그 수만큼 묶어 하나의 프롬프트로 분류
+# rate limit 에러면 태스크를 다시 실행하고, 처리를 마친 특허는 청크 결과에 저장해 두어 건너뜀 (진행률 중복 집계 방지)
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def classify_patent_chunk(self, LLM: str, session_id: str, job_id: str, start: int, end: int) -> List[Dict[str, str]]:
+    items = load_job_items(job_id)[start:end]
+    done = load_chunk_results(job_id, start)
+    logger.info(f"[{session_id}] 특허 {start}~{end - 1} 분류 시작 (이전 실행에서 처리한 특허 {len(done)}건)")
+
+    try:
+        batch_size = settings.CLASSIFICATION_BATCH_SIZE
+        if batch_size > 1:
+            for offset in range(0, len(items), batch_size):
+                positions = [str(position) for position in range(offset, min(offset + batch_size, len(items)))]
+                if all(position in done for position in positions):
+                    continue
+                for position, result in zip(positions, classify_batch(LLM, session_id, items[offset:offset + batch_size])):
+                    save_chunk_result(job_id, start, position, result)
+                    done[position] = result
+        else:
+            for position, item in enumerate(items):
+                if str(position) in done:
+                    continue
+                result = classify_one(
+                    LLM, session_id, item["patent_info"], item["application_number"], False, item["context_key"], item["row_index"]
+                )
+                save_chunk_result(job_id, start, str(position), result)
+                done[str(position)] = result
+    except RATE_LIMIT_ERRORS as e:
+        retry_on_rate_limit(self, session_id, e)
+
+    return [done[str(position)] for position in range(len(items))]
+
+# 저장된 작업 입력의 [start, end) 범위 특허 분류 및 평가 함수 (관리자 모드)
+# EVALUATION_BATCH_SIZE가 1보다 크면 분류만 하고, 평가는 분류가 모두 끝난 뒤 dispatch_batch_evaluation에서 실행
+# rate limit 에러면 태스크를 다시 실행하고, 분류/평가를 마친 특허는 단계별로 청크 결과에 저장해 두어 건너뜀 (진행률 중복 집계 방지)
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def classify_and_evaluate_chunk(self, LLM: str, session_id: str, job_id: str, start: int, end: int) -> List[Dict[str, Any]]:
+    items = load_job_items(job_id)[start:end]
+    done = load_chunk_results(job_id, start)
+    logger.info(f"[{session_id}:{LLM}] 특허 {start}~{end - 1} 분류 시작")
+
+    try:
+        for position, item in enumerate(items):
+            if str(position) in done:
+                continue
+
+            # 분류는 마쳤고 평가에서 rate limit이 발생했던 특허는 분류 결과를 다시 사용
+            classification_result = done.get(f"{position}:classification")
+            if classification_result is None:
+                classification_result = classify_one(
+                    LLM, session_id, item["patent_info"], item["application_number"], True, item["context_key"], item["row_index"]
+                )
+                if settings.EVALUATION_BATCH_SIZE > 1:
+                    save_chunk_result(job_id, start, str(position), classification_result)
+                    done[str(position)] = classification_result
+                    continue
+                save_chunk_result(job_id, start, f"{position}:classification", classification_result)
+
+            reasoning_result = evaluate_one(
+                classification_result, LLM, session_id, item["patent_info"], item["application_number"], item["context_key"], item["row_index"]
+            )
+            result = collect_evaluation_results(reasoning_result, LLM, session_id, item["application_number"])
+            save_chunk_result(job_id, start, str(position), result)
+            done[str(position)] = result
+    except RATE_LIMIT_ERRORS as e:
+        retry_on_rate_limit(self, session_id, e)
+
+    return [done[str(position)] for position in range(len(items))]
+
+# 사용자 모드 분류 태스크가 최종 실패하면 (재시도 초과, 처리하지 못한 에러, 워커 프로세스 종료) 결과가 없는 특허를 미분류로 저장하고 완료 수에 반영
+# 저장하지 않으면 모든 특허의 결과가 모이지 않아 finalize_classification(또는 straggler 감시의 완료 처리)이 실행되지 않음
+@task_failure.connect
+def store_failed_classifications(sender=None, args=None, kwargs=None, exception=None, **_):
+    name = getattr(sender, "name", None)
+    if name not in (classify_patent.name, classify_patent_batch.name, classify_patent_chunk.name):
+        return
+    try:
+        arguments = inspect.signature(sender.run).bind(*(args or ()), **(kwargs or {})).arguments
+        LLM, session_id = arguments["LLM"], arguments["session_id"]
+        if name == classify_patent.name:
+            if arguments["isAdmin"]:
+                return
+            application_numbers = [arguments["application_number"]]
+        elif name == classify_patent_batch.name:
+            application_numbers = [item["application_number"] for item in arguments["items"]]
+        else:
+            items = load_job_items(arguments["job_id"])[arguments["start"]:arguments["end"]]
+            application_numbers = [item["application_number"] for item in items]
+
+        stored = store_missing_results(session_id, {number: unclassified(number) for number in application_numbers})
+        if not stored:
+            return
+        logger.error(f"[{session_id}] 분류 태스크 실패로 특허 {stored}건 미분류 처리: {exception}")
+        update_classification_progress(get_redis_client(), session_id, LLM, False, stored)
+        increment_job_stat(session_id, "failed_tasks")
+        collect_results(session_id, stored)
+    except Exception as e:
+        logger.error(f"실패한 분류 태스크의 결과 처리 중 오류 발생: {e}")
 
 # 모든 작업을 완료했을 때 실행되는 함수
 @celery_app.task
 def classification_completion(results, session_id):
+    # chord 콜백과 straggler 감시 태스크 중 먼저 실행한 쪽만 완료 처리
+    if not claim_completion(session_id):
+        logger.info(f"[{session_id}] 이미 완료 처리된 작업")
+        return
+
     try:
         redis = get_redis_client()
         time_key = f"{session_id}:time"
@@ -284,6 +672,44 @@ def classification_completion(results, session_id):
         with open(f"./temp_data/{session_id}.pkl", "rb") as f:
             df = pickle.load(f)
 
+        # 원본 데이터프레임에 분류 결과 추가 및 특허 정보 저장
+        def apply_result(index, application_number, result):
+            row = df.loc[index]
+
+            title = row.get('특허명', row.get('발명의 명칭', ''))
+            abstract = row.get('요약', '')
+
+            df.loc[index, '대분류코드'] = result["majorCode"]
+            df.loc[index, '중분류코드'] = result["middleCode"]
+            df.loc[index, '소분류코드'] = result["smallCode"]
+            df.loc[index, '대분류명칭'] = result["majorTitle"]
+            df.loc[index, '중분류명칭'] = result["middleTitle"]
+            df.loc[index, '소분류명칭'] = result["smallTitle"]
+
+            # 특허 정보 구성
+            patent_data = Patent(
+                applicationNumber=application_number,
+                title=title,
+                abstract=abstract,
+                majorCode=result["majorCode"],
+                middleCode=result["middleCode"],
+                smallCode=result["smallCode"],
+                majorTitle=result["majorTitle"],
+                middleTitle=result["middleTitle"],
+                smallTitle=result["smallTitle"]
+            )
+            redis.rpush(session_id, patent_data.model_dump_json())
+
+        # 대표 특허 출원번호 -> 같은 분류 결과를 사용할 중복 행 위치
+        duplicates = redis.hgetall(f"{session_id}:duplicates")
+
+        # 일괄 분류 태스크의 결과(리스트)를 특허 단위로 펼침
+        results = [
+            result
+            for task_result in results
+            for result in (task_result if isinstance(task_result, list) else [task_result])
+        ]
+
         for result in results:
             logger.info(f"분류 결과: {result}")
     
@@ -293,37 +719,17 @@ def classification_completion(results, session_id):
             matching_rows = df[df['출원번호'] == application_number]
 
             if not matching_rows.empty:
-                index = matching_rows.index[0]
-                row = df.loc[index]
-
-                title = row.get('특허명', row.get('발명의 명칭', ''))
-                abstract = row.get('요약', '')
-
-                # 원본 데이터프레임에 분류 결과 추가
-                df.loc[index, '대분류코드'] = result["majorCode"]
-                df.loc[index, '중분류코드'] = result["middleCode"]
-                df.loc[index, '소분류코드'] = result["smallCode"]
-                df.loc[index, '대분류명칭'] = result["majorTitle"]
-                df.loc[index, '중분류명칭'] = result["middleTitle"]
-                df.loc[index, '소분류명칭'] = result["smallTitle"]
-
-                # 특허 정보 구성
-                patent_data = Patent(
-                    applicationNumber=application_number,
-                    title=title,
-                    abstract=abstract,
-                    majorCode=result["majorCode"],
-                    middleCode=result["middleCode"],
-                    smallCode=result["smallCode"],
-                    majorTitle=result["majorTitle"],
-                    middleTitle=result["middleTitle"],
-                    smallTitle=result["smallTitle"]
-                )
-                redis.rpush(session_id, patent_data.model_dump_json())
-                redis.expire(session_id, 86400)
+                apply_result(matching_rows.index[0], application_number, result)
             else:
                 logger.warning(f"출원번호 {application_number}에 해당하는 행을 찾을 수 없음")
 
+            # 중복 특허에 대표 특허의 분류 결과 복사
+            for position in json.loads(duplicates.get(str(application_number), "[]")):
+                index = df.index[position]
+                apply_result(index, df.loc[index].get('출원번호', f"KR10-XXXX-{index:07d}"), result)
+
+        redis.expire(session_id, 86400)
+
         # 임시 파일명 생성
         filename = f"{session_id}_classified.xlsx"
         save_path = f"./classified_excels/{filename}"
@@ -347,10 +753,13 @@ def classification_completion(results, session_id):
         # 저장
         wb.save(save_path)
 
-        # 알림
+        # 알림 (작업 통계 포함)
+        stats = get_job_stats(session_id)
+        logger.info(f"[{session_id}] 작업 통계: {stats}")
         message = Message(
             status="completed",
-            message="분류 작업이 완료되었습니다."
+            message="분류 작업이 완료되었습니다.",
+            stats=stats
         )
 
         # 진행 상황 업데이트
@@ -369,167 +778,39 @@ def classification_completion(results, session_id):
         redis.set(f"{session_id}:progress", message.model_dump_json())
         return False
     
+# Redis에 모은 특허별 결과로 완료 처리 (사용자 모드, INCREMENTAL_COLLECTION_ENABLED, 결과 목록은 메시지로 전달하지 않음)
 @celery_app.task
-def evaluate_classification_by_vector(classification_result, LLM, session_id, patent_info, application_number)-> Dict[str, Any]:
-    # 벡터 유사도 평가
-    redis = get_redis_client()
+def finalize_classification(session_id):
+    if is_completed(session_id):
+        return
+    return classification_completion(iter_patent_results(session_id), session_id)
 
-    logger.info(f"벡터 유사도 평가 실행, 특허 분류 결과: {classification_result}")
-    key = f"{session_id}:{LLM}"
-    redis.hset(f"{key}:classifications", application_number, json.dumps(classification_result, ensure_ascii=False))
-    
-    # 1. 특허 정보와 가장 유사한 분류 체계 검색 (유사도 점수 포함)
-    retriever = load_retriever_from_redis(session_id)
-    vectorstore = retriever.vectorstore
-    
-    similar_docs_with_score = vectorstore.similarity_search_with_relevance_scores(patent_info, k=1)
-    best_match, best_score = similar_docs_with_score[0]
-
-    # numpy 타입을 Python 기본 타입으로 변환하고 0~1 사이로 정규화
-    best_score = float(best_score)
-    normalized_score = (best_score + 1) / 2  # -1~1 범위를 0~1 범위로 변환
-    
-    # 2. 평가 로직
-    # LLM이 미분류로 분류한 경우
-    is_unclassified = (
-        classification_result["majorCode"] == "미분류" or
-        classification_result["middleCode"] == "미분류" or
-        classification_result["smallCode"] == "미분류"
-    )
-    
-    # 평가 결과 결정
-    if is_unclassified:
-        # 미분류로 분류한 경우
-        if normalized_score < THRESHOLD:
-            # 유사도가 기준점보다 낮으면 미분류가 정확
-            is_correct = True
-            reason = f"유사도({normalized_score:.2f})가 기준점({THRESHOLD}) 미만이므로 미분류가 정확함"
-        elif normalized_score == THRESHOLD:
-            # 유사도가 기준점보다 낮으면 미분류가 정확
-            is_correct = True
-            reason = "분류 결과가 일치함"
-        else:
-            # 유사도가 기준점보다 높으면 미분류가 부정확
-            is_correct = False
-            reason = f"유사도({normalized_score:.2f})가 기준점({THRESHOLD}) 이상이므로 분류가 필요함"
-    else:
-        # 일반 분류의 경우
-        if normalized_score < THRESHOLD:
-            # 유사도가 기준점보다 낮으면 분류가 부정확
-            is_correct = False
-            reason = f"유사도({normalized_score:.2f})가 기준점({THRESHOLD}) 미만이므로 미분류여야 함"
-        else:
-            # 유사도가 기준점보다 높으면 분류 결과 비교
-            is_correct = (
-                classification_result["majorCode"] == best_match.metadata.get("grand_parent_code", "미분류") and
-                classification_result["middleCode"] == best_match.metadata.get("parent_code", "미분류") and
-                classification_result["smallCode"] == best_match.metadata.get("code", "미분류")
-            )
-            reason = "분류 결과가 일치함" if is_correct else "분류 결과가 일치하지 않음"
-    
-    # 3. 평가 결과 구성
-    level = best_match.metadata.get("level", "")
-    
-    # 레벨에 따라 적절한 메타데이터 매핑
-    if level == "대분류":
-        major_code = best_match.metadata.get("code", "미분류")
-        major_title = best_match.metadata.get("name", "미분류")
-        middle_code = "미분류"
-        middle_title = "미분류"
-        small_code = "미분류"
-        small_title = "미분류"
-    elif level == "중분류":
-        major_code = best_match.metadata.get("parent_code", "미분류")
-        major_title = best_match.metadata.get("parent_name", "미분류")
-        middle_code = best_match.metadata.get("code", "미분류")
-        middle_title = best_match.metadata.get("name", "미분류")
-        small_code = "미분류"
-        small_title = "미분류"
-    elif level == "소분류":
-        major_code = best_match.metadata.get("grand_parent_code", "미분류")
-        major_title = best_match.metadata.get("grand_parent_name", "미분류")
-        middle_code = best_match.metadata.get("parent_code", "미분류")
-        middle_title = best_match.metadata.get("parent_name", "미분류")
-        small_code = best_match.metadata.get("code", "미분류")
-        small_title = best_match.metadata.get("name", "미분류")
-    else:
-        major_code = "미분류"
-        major_title = "미분류"
-        middle_code = "미분류"
-        middle_title = "미분류"
-        small_code = "미분류"
-        small_title = "미분류"
-
-    progress_key = f"{session_id}:{LLM}:progress"
-    current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.25)) # +0.25 누적
-    total = float(redis.get(f"{session_id}:{LLM}:total_count") or 1)
-    percentage = int(current / total * 100)
-
-    progress = Progress(
-            current=current,
-            total=total,
-            percentage=percentage
+# 늦게 끝나는 특허 감시 (사용자 모드, 작업이 끝날 때까지 STRAGGLER_CHECK_INTERVAL초마다 실행)
+@celery_app.task
+def watch_stragglers(LLM, session_id):
+    if is_completed(session_id) or not is_tracked(session_id):
+        return
+
+    results, stragglers = find_stragglers(session_id)
+
+    # 모든 특허의 결과가 모였으면 남은 원래 태스크(재시도 대기 등)를 기다리지 않고 완료 처리
+    if results is not None:
+        logger.info(f"[{session_id}] 모든 특허 결과 저장됨, 완료 처리")
+        classification_completion(results, session_id)
+        return
+
+    for item in stragglers:
+        logger.info(f"[{session_id}] 늦게 끝나는 특허 다시 보냄: {item['application_number']}")
+        classify_patent.delay(
+            LLM, session_id, item["patent_info"], item["application_number"], False, item["context_key"], item["row_index"]
         )
+    if stragglers:
+        increment_job_stat(session_id, "redispatched", len(stragglers))
 
-    # 진행 상황 업데이트
-    redis.set(progress_key, progress.model_dump_json())
-    # 진행 상황 알림
-    redis.publish(progress_key, progress.model_dump_json())
-
+    watch_stragglers.apply_async((LLM, session_id), countdown=settings.STRAGGLER_CHECK_INTERVAL)
 
-    return {
-        "similarity_score": normalized_score,
-        "best_match": {
-            "majorCode": major_code,
-            "majorTitle": major_title,
-            "middleCode": middle_code,
-            "middleTitle": middle_title,
-            "smallCode": small_code,
-            "smallTitle": small_title
-        },
-        "llm_classification": classification_result,
-        "evaluation": {
-            "is_correct": is_correct,
-            "reason": reason
-        }
-    }
-
-# LLM 평가 함수
-@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
-def evaluate_classification_by_reasoning(
-    self, 
-    classification_result, 
-    LLM, 
-    session_id, 
-    patent_info, 
-    application_number):
-    # LLM 평가
-    redis = get_redis_client()
-
-    logger.info(f"LLM 평가 실행, 특허 분류 결과: {classification_result}")
-    key = f"{session_id}:{LLM}"
-    redis.hset(f"{key}:classifications", application_number, json.dumps(classification_result, ensure_ascii=False))
-  
-    # 유사도 기반 분류 체계 검색
-    retriever = load_retriever_from_redis(session_id)
-    similar_docs = retriever.invoke(patent_info)
-    # 유사도 기반 분류 체계 포맷팅
-    similar_classifications = []
-    for doc in similar_docs:
-        metadata = doc.metadata
-        classification = f"""
-분류 체계:
-- 대분류: {metadata.get('grand_parent_code', '')} ({metadata.get('grand_parent_name', '')})
-- 중분류: {metadata.get('parent_code', '')} ({metadata.get('parent_name', '')})
-- 소분류: {metadata.get('code', '')} ({metadata.get('name', '')})
-- 설명: {metadata.get('description', '')}
-"""
-        similar_classifications.append(classification)
-    
-    similar_classifications_text = "\n---\n".join(similar_classifications)
-
-    # 프롬프트 템플릿 정의
-    template = """
+# LLM 평가 프롬프트 템플릿
+EVALUATION_TEMPLATE = """
     당신은 특허 분류 전문가입니다. 다음 특허의 분류 결과를 평가해주세요.
     특허 정보는 대상 특허 데이터의 특허명과 요약을 포함합니다.
     현재 분류 결과는 저장된 분류 체계를 기반으로 분류한 결과입니다.
@@ -549,24 +830,72 @@ def evaluate_classification_by_reasoning(
     {similar_classifications}
 
     [평가 요구사항]
-    1. 분석: 유사도 기반 추천 분류 체계와 현재 분류 결과를 비교하여 평가해주세요.
-    2. 점수: 0.0부터 1.0 사이의 점수로 평가해주세요.
+    1. 분석(analysis): 유사도 기반 추천 분류 체계와 현재 분류 결과를 비교하여 평가해주세요.
+    2. 점수(score): 0.0, 0.5, 1.0 중 하나의 점수로 평가해주세요.
        - 0.0: 완전히 부적절한 분류
        - 0.5: 부분적으로 적절한 분류
        - 1.0: 완벽하게 적절한 분류
-    3. 이유: 분석을 1줄 요약하여 작성해주세요.
+    3. 이유(reason): 분석을 1줄 요약하여 작성해주세요.
 
     [주의사항]
     1. 반드시 분류 체계를 기반으로 평가해야 합니다.
     2. 분류 체계에 없는 분류는 '미분류'로 간주합니다.
     - 미분류의 예시: 특허 정보가 제시된 분류 체계만으로 분류할 수 없다고 판단될 경우, 미분류로 판단합니다.
-    3. 평가 요구 사항의 포맷 [1. 분석 2. 점수 3. 이유]를 반드시 지킵니다.
+    3. 평가 요구사항의 항목 [분석, 점수, 이유]를 모두 응답합니다.
     """
 
-    prompt = ChatPromptTemplate.from_template(template)
+# 여러 특허의 분류 결과를 한 번에 평가하는 프롬프트 템플릿 (평가 기준은 한 번만 포함)
+BATCH_EVALUATION_TEMPLATE = """
+    당신은 특허 분류 전문가입니다. 다음 특허들의 분류 결과를 각각 평가해주세요.
+    특허 정보는 대상 특허 데이터의 특허명과 요약을 포함합니다.
+    현재 분류 결과는 저장된 분류 체계를 기반으로 분류한 결과입니다.
+    유사도 기반 추천 분류 체계는 분류 체계 중 특허 정보와 가장 유사한 3개의 분류입니다.
+    당신의 목표는 이것들을 기준으로 각 특허 분류가 정확한지 평가하는 것입니다.
+    평가 요구사항과 주의사항에 맞게 잘 평가해 주세요.
+
+    {patents}
+
+    [평가 요구사항]
+    1. 분석(analysis): 특허마다 유사도 기반 추천 분류 체계와 현재 분류 결과를 비교하여 평가해주세요.
+    2. 점수(score): 0.0, 0.5, 1.0 중 하나의 점수로 평가해주세요.
+       - 0.0: 완전히 부적절한 분류
+       - 0.5: 부분적으로 적절한 분류
+       - 1.0: 완벽하게 적절한 분류
+    3. 이유(reason): 분석을 1줄 요약하여 작성해주세요.
+
+    [주의사항]
+    1. 반드시 분류 체계를 기반으로 평가해야 합니다.
+    2. 분류 체계에 없는 분류는 '미분류'로 간주합니다.
+    - 미분류의 예시: 특허 정보가 제시된 분류 체계만으로 분류할 수 없다고 판단될 경우, 미분류로 판단합니다.
+    3. 모든 특허에 대해 출원번호(applicationNumber)를 포함한 결과를 하나씩 내세요.
+    """
+
+# 유사도 기반 분류 체계 포맷팅
+def format_similar_classifications(similar_docs) -> str:
+    similar_classifications = []
+    for doc in similar_docs:
+        metadata = doc.metadata
+        classification = f"""
+분류 체계:
+- 대분류: {metadata.get('grand_parent_code', '')} ({metadata.get('grand_parent_name', '')})
+- 중분류: {metadata.get('parent_code', '')} ({metadata.get('parent_name', '')})
+- 소분류: {metadata.get('code', '')} ({metadata.get('name', '')})
+- 설명: {metadata.get('description', '')}
+"""
+        similar_classifications.append(classification)
+    
+    return "\n---\n".join(similar_classifications)
+
+# LLM 평가 프롬프트 생성 (분류 단계에서 계산한 검색 결과 재사용)
+def build_evaluation_prompt(session_id, patent_info, classification_result, context_key=None, row_index=None) -> str:
+    # 유사도 기반 분류 체계 검색
+    similar_docs = context_documents(load_query_context(session_id, patent_info, context_key, row_index))
+    similar_classifications_text = format_similar_classifications(similar_docs)
+
+    prompt = ChatPromptTemplate.from_template(EVALUATION_TEMPLATE)
     
     # 프롬프트에 값 채우기
-    filled_prompt = prompt.format(
+    return prompt.format(
         patent_info=patent_info,
         major_code=classification_result["majorCode"],
         major_title=classification_result["majorTitle"],
@@ -576,60 +905,183 @@ def evaluate_classification_by_reasoning(
         small_title=classification_result["smallTitle"],
         similar_classifications=similar_classifications_text
     )
+
+# 여러 특허의 LLM 평가 프롬프트 생성
+# entries: [{"patent_info", "application_number", "context_key", "row_index", "classification"}, ...]
+def build_batch_evaluation_prompt(session_id, entries: List[Dict[str, Any]]) -> str:
+    blocks = []
+    for number, entry in enumerate(entries, start=1):
+        result = entry["classification"]
+        similar_docs = context_documents(
+            load_query_context(session_id, entry["patent_info"], entry.get("context_key"), entry.get("row_index"))
+        )
+        blocks.append(f"""[특허 {number}]
+출원번호: {entry["application_number"]}
+
+[특허 정보]
+{entry["patent_info"]}
+
+[현재 분류 결과]
+대분류: {result["majorCode"]} ({result["majorTitle"]})
+중분류: {result["middleCode"]} ({result["middleTitle"]})
+소분류: {result["smallCode"]} ({result["smallTitle"]})
+
+[유사도 기반 추천 분류 체계]
+{format_similar_classifications(similar_docs)}""")
+
+    prompt = ChatPromptTemplate.from_template(BATCH_EVALUATION_TEMPLATE)
+    return prompt.format(patents="\n\n===\n\n".join(blocks))
+
+# 분류 결과 하나를 LLM으로 평가하는 함수 (rate limit 에러는 호출한 쪽에서 재시도)
+def evaluate_one(
+    classification_result, 
+    LLM, 
+    session_id, 
+    patent_info, 
+    application_number,
+    context_key=None,
+    row_index=None):
+    # LLM 평가
+    redis = get_redis_client()
+
+    logger.info(f"LLM 평가 실행, 특허 분류 결과: {classification_result}")
+    key = f"{session_id}:{LLM}"
+    redis.hset(f"{key}:classifications", application_number, json.dumps(classification_result, ensure_ascii=False))
+  
+    evaluator = get_evaluator_llm()
     try:
-        response = claude.invoke(filled_prompt)
+        filled_prompt = build_evaluation_prompt(session_id, patent_info, classification_result, context_key, row_index)
+        reasoning_result = evaluate_with_llm(evaluator, filled_prompt, key)
+        increment_job_stat(key, "evaluator_requests")
+
+        # 진행률 업데이트 (+0.25)
+        update_classification_progress(redis, session_id, LLM, True)
         
-        # 응답에서 점수 추출 (0.0~1.0 사이의 숫자)
-        try:
-            score_match = re.search(r'0\.\d+|1\.0', response.content)
-            if score_match:
-                score = float(score_match.group())
-            else:
-                score = 0.0
-                logger.warning("점수를 찾을 수 없어 기본값 0.0을 사용합니다.")
-        except Exception as e:
-            logger.error(f"점수를 추출 중 오류 발생: {str(e)}")
-            score = 0.0
+        return reasoning_result
 
-        # 응답에서 평가 이유 추출
-        reason_match = re.search(r"이유.*?[:：\s]\s*(.+?)(?:\n##|$)", response.content, re.DOTALL)
-        reason = reason_match.group(1).strip() if reason_match else ""
+    except CircuitOpenError as e:
+        # 평가 LLM 서킷이 열려 있으면 재시도하지 않고 평가 실패(0점)로 처리
+        logger.warning(f"[{session_id}] {e}, 평가 결과를 0점으로 처리합니다.")
+        increment_job_stat(key, "circuit_rejected")
+        update_classification_progress(redis, session_id, LLM, True)
+        return dict(FAILED_EVALUATION)
 
-        progress_key = f"{session_id}:{LLM}:progress"
-        current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.25)) # +0.25 누적
-        total = float(redis.get(f"{session_id}:{LLM}:total_count") or 1)
-        percentage = int(current / total * 100)
+# LLM 평가 함수
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def evaluate_classification_by_reasoning(
+    self, 
+    classification_result, 
+    LLM, 
+    session_id, 
+    patent_info, 
+    application_number,
+    context_key=None,
+    row_index=None):
+    try:
+        return evaluate_one(classification_result, LLM, session_id, patent_info, application_number, context_key, row_index)
+    except RATE_LIMIT_ERRORS as e:
+        if not is_rate_limit_error(e):
+            raise
+        logger.info(f"[{session_id}] {settings.EVALUATOR_LLM} rate limit 발생")
+        raise self.retry(countdown= 5)
 
-        progress = Progress(
-                current=current,
-                total=total,
-                percentage=percentage
-            )
+# 분류가 모두 끝나면 평가 태스크를 EVALUATION_BATCH_SIZE건씩 묶어 실행 (관리자 모드)
+@celery_app.task
+def dispatch_batch_evaluation(classification_results, LLM, session_id, items=None, job_id=None):
+    redis = get_redis_client()
+    key = f"{session_id}:{LLM}"
 
-        # 진행 상황 업데이트
-        redis.set(progress_key, progress.model_dump_json())
-        # 진행 상황 알림
-        redis.publish(progress_key, progress.model_dump_json())
-        
-        return {
-            "score": score,
-            "reason": reason
-        } 
-    
-    except ClaudeRateLimitError as e:
-        logger.info(f"[{session_id}] Claude rate limit 발생")
+    # 청크 태스크는 청크별 결과 리스트를 반환하고, 특허 목록은 저장된 작업 입력에서 읽음
+    if job_id is not None:
+        classification_results = [result for chunk in classification_results for result in chunk]
+        items = load_job_items(job_id)
+
+    # 분류 결과 저장 (evaluation_completion에서 사용), 분류 태스크 결과는 items와 같은 순서
+    entries = [{**item, "classification": result} for item, result in zip(items, classification_results)]
+    if entries:
+        redis.hset(f"{key}:classifications", mapping={
+            entry["application_number"]: json.dumps(entry["classification"], ensure_ascii=False) for entry in entries
+        })
+
+    batch_size = settings.EVALUATION_BATCH_SIZE
+    tasks = [
+        evaluate_classifications_batch.s(LLM, session_id, entries[start:start + batch_size])
+        for start in range(0, len(entries), batch_size)
+    ]
+    logger.info(f"[{key}] 평가 태스크 {len(tasks)}개 시작 (특허 {len(entries)}건)")
+    if tasks:
+        chord(group(tasks))(evaluation_completion.s(LLM, session_id).on_error(evaluation_failed.s(LLM, session_id)))
+    else:
+        evaluation_completion.delay([], LLM, session_id)
+
+# 여러 특허의 분류 결과를 하나의 평가 요청으로 평가 (관리자 모드)
+@celery_app.task(bind=True, retry_backoff=True, retry_backoff_max=10, retry_kwargs={'max_retries': 12})
+def evaluate_classifications_batch(self, LLM, session_id, entries):
+    """
+    entries: [{"patent_info", "application_number", "context_key", "row_index", "classification"}, ...]
+    응답에서 빠지거나 형식이 잘못된 특허는 하나씩 다시 평가합니다.
+    """
+    key = f"{session_id}:{LLM}"
+    evaluator = get_evaluator_llm()
+    evaluations: Dict[str, Dict[str, Any]] = {}
+    stats = {"evaluator_requests": 0, "evaluation_fallbacks": 0, "circuit_rejected": 0}
+
+    try:
+        try:
+            filled_prompt = build_batch_evaluation_prompt(session_id, entries)
+            stats["evaluator_requests"] += 1
+            evaluations = evaluate_batch_with_llm(evaluator, filled_prompt, key)
+        except CircuitOpenError as e:
+            # 평가 LLM 서킷이 열려 있으면 하나씩 평가하지 않고 모두 평가 실패(0점)로 처리
+            logger.warning(f"[{key}] {e}, 평가 결과를 0점으로 처리합니다.")
+            stats["circuit_rejected"] += len(entries)
+            evaluations = {str(entry["application_number"]): dict(FAILED_EVALUATION) for entry in entries}
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise
+            logger.warning(f"[{key}] 일괄 평가 응답 처리 실패, 하나씩 평가합니다: {e}")
+
+        for entry in entries:
+            application_number = str(entry["application_number"])
+            if application_number in evaluations:
+                continue
+            # 응답에서 빠진 특허는 하나씩 평가
+            stats["evaluation_fallbacks"] += 1
+            stats["evaluator_requests"] += 1
+            filled_prompt = build_evaluation_prompt(
+                session_id, entry["patent_info"], entry["classification"], entry.get("context_key"), entry.get("row_index")
+            )
+            try:
+                evaluations[application_number] = evaluate_with_llm(evaluator, filled_prompt, key)
+            except CircuitOpenError:
+                stats["circuit_rejected"] += 1
+                evaluations[application_number] = dict(FAILED_EVALUATION)
+
+    except RATE_LIMIT_ERRORS as e:
+        if not is_rate_limit_error(e):
+            raise
+        logger.info(f"[{session_id}] {settings.EVALUATOR_LLM} rate limit 발생")
         raise self.retry(countdown= 5)
 
+    # 진행률 (+0.25, 결과 합침에서 +0.5) 및 작업 통계 업데이트
+    update_classification_progress(get_redis_client(), session_id, LLM, True, len(entries))
+    for field, amount in stats.items():
+        if amount:
+            increment_job_stat(key, field, amount)
+
+    return [
+        collect_evaluation_results(evaluations[str(entry["application_number"])], LLM, session_id, entry["application_number"])
+        for entry in entries
+    ]
+
 # 결과 합침
 @celery_app.task
-def collect_evaluation_results(evaluation_results, LLM, session_id, application_number):#ㅋㅋ
-    # 진행도 계산, 두 결과 합침
+def collect_evaluation_results(reasoning_result, LLM, session_id, application_number):#ㅋㅋ
+    # 진행도 계산, 평가 결과 저장 (벡터 기반 평가는 작업 완료 시 일괄 수행)
     
-    logger.info(f"진행도 계산, 두결과 합침, 평가 결과: {evaluation_results}")
+    logger.info(f"진행도 계산, 평가 결과: {reasoning_result}")
 
     redis = get_redis_client()
-    vector_result = evaluation_results[0]
-    reasoning_result = evaluation_results[1]
 
     key = f"{session_id}:{LLM}"
     
@@ -638,7 +1090,7 @@ def collect_evaluation_results(evaluation_results, LLM, session_id, application_
   
     # 진행도 계산
     progress_key = f"{session_id}:{LLM}:progress"
-    current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.25)) # +0.25 누적
+    current = float(redis.incrbyfloat(f"{session_id}:{LLM}:progress_counter", 0.5)) # +0.5 누적 (벡터 평가 몫 포함)
     total = float(redis.get(f"{session_id}:{LLM}:total_count") or 1)
     percentage = int(current / total * 100)
 
@@ -654,25 +1106,17 @@ def collect_evaluation_results(evaluation_results, LLM, session_id, application_
     redis.publish(progress_key, progress.model_dump_json())
     
     return {
-        "vector_based": vector_result,
         "reasoning": reasoning_result
     }
 
-def calculate_vector_based_score(patent_evaluations):
-    total_patents = len(patent_evaluations)
+def calculate_vector_based_score(vector_correct, reasoning_scores):
+    total_patents = len(reasoning_scores)
     
     # 벡터 기반 평가 점수 계산
-    vector_correct_classifications = sum(
-        1 for eval in patent_evaluations 
-        if eval["vector_based"]["evaluation"]["is_correct"] == True
-    )
+    vector_correct_classifications = int(sum(vector_correct))
     vector_accuracy = (vector_correct_classifications / total_patents) * 100
     
     # Reasoning LLM 평가 점수 계산 (평균 점수)
-    reasoning_scores = [
-        eval["reasoning"]["score"] 
-        for eval in patent_evaluations
-    ]
     reasoning_average_score = sum(reasoning_scores) / total_patents * 100
     
     # 간소화된 평가 점수만 반환
@@ -682,6 +1126,20 @@ def calculate_vector_based_score(patent_evaluations):
         "reasoning_score": reasoning_average_score
     }
 
+# 분류/평가 태스크가 최종 실패해 chord 콜백(evaluation_completion)이 실행되지 않을 때 실행되는 함수 (관리자 모드)
+# 진행률을 오류로 바꿔 작업이 끝나지 않은 채 남지 않도록 함
+@celery_app.task
+def evaluation_failed(request, exc, traceback, LLM, session_id):
+    key = f"{session_id}:{LLM}"
+    logger.error(f"[{key}] 분류/평가 태스크 실패로 작업 중단: {exc}")
+    redis = get_redis_client()
+    message = Message(
+        status="error",
+        message=f"분류 작업 중 오류가 발생했습니다: {str(exc)}"
+    )
+    redis.publish(f"{key}:progress", message.model_dump_json())
+    redis.set(f"{key}:progress", message.model_dump_json())
+
 # 분류 및 평가가 모두 끝났을 때 실행되는 함수
 @celery_app.task
 def evaluation_completion(results, LLM, session_id):
@@ -708,8 +1166,13 @@ def evaluation_completion(results, LLM, session_id):
         with open(f"./temp_data/{session_id}.pkl", "rb") as f:
             df = pickle.load(f)
 
+        # 벡터 기반 평가용 분류 결과와 검색 결과 (행 순서)
+        row_classifications = []
+        row_matches = []
+        matches = get_vector_matches(session_id, df)
+
         # df에 맞게 patents에 특허 저장, reasoning 다시
-        for index, row in df.iterrows():
+        for row_index, (index, row) in enumerate(df.iterrows()):
             # 출원번호와 특허 정보 확인
             application_number = str(row.get('출원번호', f"KR10-XXXX-{index:07d}"))
             title = str(row.get('특허명', row.get('발명의 명칭', '')))
@@ -717,6 +1180,9 @@ def evaluation_completion(results, LLM, session_id):
             classifications_json = redis.hget(f"{key}:classifications", application_number)
             if classifications_json:
                 classifications = json.loads(classifications_json)
+                if matches[row_index] is not None:
+                    row_classifications.append(classifications)
+                    row_matches.append(matches[row_index])
             
             # 특허 정보 구성
             patent_data = Patent(
@@ -744,8 +1210,19 @@ def evaluation_completion(results, LLM, session_id):
         redis.delete(f"{key}:reasoning")
         redis.delete(f"{key}:classifications")
 
+        # 벡터 기반 평가 (작업의 모든 특허를 한 번에 비교)
+        vector_correct = evaluate_classifications_by_vector(row_classifications, row_matches)
+
+        # 일괄 평가 태스크의 결과(리스트)를 특허 단위로 펼침
+        results = [
+            result
+            for task_result in results
+            for result in (task_result if isinstance(task_result, list) else [task_result])
+        ]
+
         # 최종 평가 점수 계산 (간소화된 버전)
-        evaluation_score = calculate_vector_based_score(results)
+        reasoning_scores = [result["reasoning"]["score"] for result in results]
+        evaluation_score = calculate_vector_based_score(vector_correct, reasoning_scores)
 
         # Redis에 간소화된 평가 점수만 저장
         simplified_evaluation = {
@@ -761,9 +1238,12 @@ def evaluation_completion(results, LLM, session_id):
         redis.expire(f"{key}", 86400)
         
         # 알림
+        stats = get_job_stats(key)
+        logger.info(f"[{key}] 작업 통계: {stats}")
         message = Message(
             status="completed",
-            message="분류 및 평가 작업이 완료되었습니다."
+            message="분류 및 평가 작업이 완료되었습니다.",
+            stats=stats
         )
         
         # 진행 상황 업데이트
@@ -0,0 +1,33 @@
+# 테스트 공통 설정 (LLM 클라이언트 생성에 필요한 API 키, Redis 대신 fakeredis 사용)
+import os
+import sys
+
+for name in ("OPENAI_API_KEY", "CLAUDE_API_KEY", "GEMINI_API_KEY", "GROK3_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis(redis_server, monkeypatch):
+    """
+    fakeredis 클라이언트를 반환하고, 로드된 app 모듈의 get_redis_client가 이 클라이언트를 반환하도록 바꿉니다.
+    (모듈마다 `from app.core.redis import get_redis_client`로 가져오므로 모듈 단위로 바꿈, Lua 스크립트는 lupa로 실행)
+    """
+    client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    for module_name, module in list(sys.modules.items()):
+        if module_name.startswith("app.") and hasattr(module, "get_redis_client"):
+            monkeypatch.setattr(module, "get_redis_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def async_redis(redis, redis_server):
+    # redis 픽스처와 같은 데이터를 보는 비동기 클라이언트
+    return fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
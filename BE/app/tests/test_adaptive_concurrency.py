@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+import pytest
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.messages import AIMessage
+from app.core import concurrency
+from app.core.concurrency import (
+    POLL_INTERVAL,
+    AdaptiveConcurrencyController,
+    RateLimitHeaderCallback,
+    classify_failure,
+    parse_duration,
+)
+
+
+@pytest.fixture
+def controller(redis):
+    return AdaptiveConcurrencyController("openai", initial=2, minimum=1, maximum=4, latency_target=10, decrease_factor=0.5)
+
+
+def limit(redis, controller):
+    return float(redis.hget(controller.state_key, "limit"))
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def test_slots_are_limited_and_released(controller):
+    assert controller.try_acquire("a") == 0.0
+    assert controller.try_acquire("b") == 0.0
+    assert controller.try_acquire("c") == POLL_INTERVAL
+
+    controller.release("a", 1.0, "ok")
+
+    assert controller.try_acquire("c") == 0.0
+
+
+def test_additive_increase_on_fast_success(redis, controller):
+    controller.release(controller.acquire(), 1.0, "ok")
+    assert limit(redis, controller) == pytest.approx(2.5)
+
+    # 목표 지연 시간보다 느린 성공은 늘리지 않음
+    controller.release(controller.acquire(), 30.0, "ok")
+    assert limit(redis, controller) == pytest.approx(2.5)
+
+    for _ in range(10):
+        controller.release(controller.acquire(), 1.0, "ok")
+    assert limit(redis, controller) == 4
+
+
+def test_multiplicative_decrease_once_per_cooldown(redis, controller):
+    controller.release(controller.acquire(), 1.0, "throttled")
+    assert limit(redis, controller) == 1.0
+
+    # 같은 폭주의 다른 429는 다시 줄이지 않고, 최소값 아래로 줄이지 않음
+    redis.hset(controller.state_key, "limit", 3)
+    controller.release(controller.acquire(), 1.0, "timeout")
+    assert limit(redis, controller) == 3
+
+    redis.hset(controller.state_key, "last_decrease", 0)
+    controller.release(controller.acquire(), 1.0, "timeout")
+    assert limit(redis, controller) == 1.5
+    redis.hset(controller.state_key, "last_decrease", 0)
+    controller.release(controller.acquire(), 1.0, "throttled")
+    assert limit(redis, controller) == 1.0
+
+
+def test_other_errors_do_not_change_limit(redis, controller):
+    controller.release(controller.acquire(), 1.0, "error")
+
+    assert limit(redis, controller) == 2
+
+
+def test_retry_after_pauses_new_calls(controller):
+    controller.observe_headers({"Retry-After": "30"})
+
+    assert controller.try_acquire("a") == pytest.approx(30, abs=1)
+    assert controller.snapshot()["paused_for"] == pytest.approx(30, abs=1)
+
+
+def test_exhausted_requests_pause_until_reset(controller):
+    controller.observe_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "6m0s"})
+
+    assert controller.try_acquire("a") == pytest.approx(360, abs=1)
+
+
+def test_low_remaining_tokens_hold_increase(redis, controller, monkeypatch):
+    monkeypatch.setattr(concurrency.settings, "LLM_ESTIMATED_TOKENS_PER_REQUEST", 1000)
+    controller.observe_headers({"x-ratelimit-remaining-tokens": "1500", "x-ratelimit-reset-tokens": "20s"})
+
+    # 새 호출은 멈추지 않고 한도 증가만 멈춤
+    lease = controller.acquire()
+    controller.release(lease, 1.0, "ok")
+    assert limit(redis, controller) == 2
+
+
+def test_slot_records_throttled_call_and_headers(redis, controller):
+    with pytest.raises(HTTPError):
+        with controller.slot():
+            raise HTTPError(429, {"retry-after": "5"})
+
+    assert limit(redis, controller) == 1.0
+    assert redis.zcard(controller.leases_key) == 0
+    assert controller.snapshot()["paused_for"] == pytest.approx(5, abs=1)
+
+
+def test_header_callback_observes_successful_response(controller):
+    message = AIMessage(content="", response_metadata={"headers": {"retry-after": "3"}})
+    RateLimitHeaderCallback(controller).on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+    assert controller.snapshot()["paused_for"] == pytest.approx(3, abs=1)
+
+
+def test_calls_without_limit_when_redis_is_unavailable(controller, monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis")
+
+    monkeypatch.setattr(concurrency, "get_redis_client", unavailable)
+
+    assert controller.try_acquire("a") == 0.0
+    controller.release("a", 1.0, "throttled")
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("5", 5), ("0.5", 0.5), ("1s", 1), ("6m0s", 360), ("20ms", 0.02), ("1h2m", 3720), ("soon", None), (None, None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+@pytest.mark.parametrize("error, outcome", [
+    (HTTPError(429), "throttled"),
+    (SimpleNamespace(status_code=429), "throttled"),
+    (TimeoutError(), "timeout"),
+    (type("APITimeoutError", (Exception,), {})(), "timeout"),
+    (HTTPError(500), "error"),
+    (ValueError(), "error"),
+])
+def test_classify_failure(error, outcome):
+    assert classify_failure(error) == outcome
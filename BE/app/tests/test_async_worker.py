@@ -0,0 +1,131 @@
+import asyncio
+import json
+import pytest
+from app.services.evaluation import FAILED_EVALUATION
+from app.workers import async_worker
+from app.workers.async_worker import (
+    JOB_QUEUE,
+    PROCESSING_KEY,
+    WORKERS_KEY,
+    AsyncClassificationWorker,
+    enqueue_classification_jobs,
+)
+
+ITEMS = [
+    {"patent_info": f"특허 {i}", "application_number": f"KR{i}", "context_key": None, "row_index": i}
+    for i in range(3)
+]
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    calls = []
+    monkeypatch.setattr(async_worker, "classification_completion", lambda results, session_id: calls.append((session_id, results)))
+    monkeypatch.setattr(async_worker, "evaluation_completion", lambda results, LLM, session_id: calls.append((session_id, results)))
+    return calls
+
+
+@pytest.fixture
+def worker(async_redis):
+    return AsyncClassificationWorker(async_redis, "w1")
+
+
+def queued_jobs(redis):
+    # 큐의 오른쪽부터 꺼내므로 처리 순서대로 반환
+    return [json.loads(raw) for raw in reversed(redis.lrange(JOB_QUEUE, 0, -1))]
+
+
+def classify_by_number(worker, monkeypatch):
+    async def classify(job):
+        return {"applicationNumber": job["application_number"], "smallCode": "A"}
+
+    monkeypatch.setattr(worker, "classify", classify)
+
+
+def test_completes_once_with_results_in_position_order(redis, worker, completions, monkeypatch):
+    classify_by_number(worker, monkeypatch)
+    enqueue_classification_jobs("s1", "GPT", False, ITEMS)
+    jobs = queued_jobs(redis)
+
+    async def run():
+        for job in reversed(jobs):
+            await worker.handle(job)
+
+    asyncio.run(run())
+
+    assert completions == [("s1", [{"applicationNumber": f"KR{i}", "smallCode": "A"} for i in range(3)])]
+    assert not redis.exists("s1:async_results", "s1:async_pending")
+
+
+def test_redelivered_job_is_counted_once(redis, worker, completions, monkeypatch):
+    classify_by_number(worker, monkeypatch)
+    enqueue_classification_jobs("s1", "GPT", False, ITEMS)
+    jobs = queued_jobs(redis)
+
+    async def run():
+        await worker.handle(jobs[0])
+        await worker.handle(jobs[0])
+        await worker.handle(jobs[1])
+
+    asyncio.run(run())
+
+    assert completions == []
+    assert redis.get("s1:async_pending") == "1"
+
+
+def test_redelivered_last_job_completes_when_worker_died_before_completion(redis, worker, completions, monkeypatch):
+    classify_by_number(worker, monkeypatch)
+    enqueue_classification_jobs("s1", "GPT", False, ITEMS[:1])
+    job = queued_jobs(redis)[0]
+    # 결과 저장, 남은 작업 수 차감까지 하고 완료 처리 전에 종료된 상태
+    redis.hset("s1:async_results", 0, json.dumps({"applicationNumber": "KR0", "smallCode": "B"}))
+    redis.set("s1:async_pending", 0)
+
+    asyncio.run(worker.handle(job))
+
+    assert completions == [("s1", [{"applicationNumber": "KR0", "smallCode": "B"}])]
+
+
+def test_admin_failure_stores_classification_and_failed_evaluation(redis, worker, completions, monkeypatch):
+    async def classify(job):
+        raise RuntimeError("처리하지 못한 에러")
+
+    monkeypatch.setattr(worker, "classify", classify)
+    monkeypatch.setattr(
+        async_worker, "collect_evaluation_results",
+        lambda reasoning, LLM, session_id, application_number: {"applicationNumber": application_number, "reasoning": reasoning},
+    )
+    enqueue_classification_jobs("s1", "GPT", True, ITEMS[:1])
+
+    asyncio.run(worker.handle(queued_jobs(redis)[0]))
+
+    assert completions == [("s1", [{"applicationNumber": "KR0", "reasoning": FAILED_EVALUATION}])]
+    assert json.loads(redis.hget("s1:GPT:classifications", "KR0"))["smallCode"] == "미분류"
+
+
+def test_processed_job_is_removed_from_processing_list(redis, worker, completions, monkeypatch):
+    classify_by_number(worker, monkeypatch)
+    enqueue_classification_jobs("s1", "GPT", False, ITEMS[:1])
+    raw = redis.lmove(JOB_QUEUE, worker.processing_key, "RIGHT", "LEFT")
+
+    asyncio.run(worker.process(raw))
+
+    assert redis.llen(worker.processing_key) == 0
+    assert len(completions) == 1
+
+
+def test_requeues_jobs_of_workers_whose_heartbeat_expired(redis, async_redis, worker):
+    enqueue_classification_jobs("s1", "GPT", False, ITEMS)
+    # 종료된 워커(하트비트 없음)와 실행 중인 워커가 각각 작업 하나씩 처리 중
+    redis.lmove(JOB_QUEUE, PROCESSING_KEY.format(worker_id="dead"), "RIGHT", "LEFT")
+    redis.lmove(JOB_QUEUE, PROCESSING_KEY.format(worker_id="alive"), "RIGHT", "LEFT")
+    redis.sadd(WORKERS_KEY, "dead", "alive")
+    alive = AsyncClassificationWorker(async_redis, "alive")
+    asyncio.run(alive.heartbeat())
+
+    assert asyncio.run(worker.requeue_orphaned()) == 1
+
+    # 되돌린 작업은 다음에 꺼낼 위치에 있음
+    assert [job["position"] for job in queued_jobs(redis)] == [0, 2]
+    assert redis.smembers(WORKERS_KEY) == {"alive"}
+    assert redis.llen(PROCESSING_KEY.format(worker_id="alive")) == 1
@@ -0,0 +1,92 @@
+import pytest
+from app import tasks
+
+ITEMS = [
+    {"patent_info": f"특허 {i}", "application_number": f"KR{i}", "context_key": None, "row_index": i}
+    for i in range(3)
+]
+
+
+def entry(number, code):
+    return {"applicationNumber": number, "majorCode": code, "middleCode": code, "smallCode": code}
+
+
+class FakePipeline:
+    def __init__(self, response):
+        self.response = response
+        self.llm = "GPT"
+        self.vector_store = None
+        self.batches = []
+
+    def classify_batch(self, patents):
+        self.batches.append([number for number, _, _ in patents])
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+@pytest.fixture
+def batch(redis, monkeypatch):
+    singles = []
+
+    def invoke_classification(llm, docs, patent_info, application_number, session_id, hedge_llm=None, stats_key=None, fallback_llm=None):
+        singles.append(application_number)
+        return entry(application_number, "single"), True
+
+    monkeypatch.setattr(tasks, "load_query_context", lambda *args: {})
+    monkeypatch.setattr(tasks, "classify_from_context", lambda context, application_number: None)
+    monkeypatch.setattr(tasks, "context_documents", lambda context: [])
+    monkeypatch.setattr(tasks, "load_vectorstore", lambda session_id: None)
+    monkeypatch.setattr(tasks, "invoke_classification", invoke_classification)
+
+    def run(response):
+        pipeline = FakePipeline(response)
+        monkeypatch.setattr(tasks, "get_classification_pipeline", lambda llm, vector_store: pipeline)
+        results = tasks.classify_batch("GPT", "s1", ITEMS)
+        return [result["smallCode"] for result in results], pipeline, singles
+
+    return run
+
+
+def test_results_follow_item_order_when_response_is_reordered(redis, batch):
+    codes, pipeline, singles = batch({"results": [entry("KR2", "C"), entry("KR0", "A"), entry("KR1", "B")]})
+
+    assert codes == ["A", "B", "C"]
+    assert pipeline.batches == [["KR0", "KR1", "KR2"]]
+    assert singles == []
+    assert redis.hget("s1:stats", "llm_requests") == "1"
+
+
+def test_missing_or_invalid_entries_are_classified_one_by_one(redis, batch):
+    codes, _, singles = batch([entry("KR0", "A"), {"majorCode": "X"}, "응답 형식 오류"])
+
+    assert codes == ["A", "single", "single"]
+    assert singles == ["KR1", "KR2"]
+    assert redis.hget("s1:stats", "batch_fallbacks") == "2"
+    assert redis.hget("s1:stats", "llm_requests") == "3"
+
+
+def test_failed_batch_response_falls_back_to_single_calls(redis, batch):
+    codes, _, singles = batch(ValueError("JSON 파싱 실패"))
+
+    assert codes == ["single", "single", "single"]
+    assert singles == ["KR0", "KR1", "KR2"]
+
+
+def test_rate_limit_error_is_raised_for_retry(batch):
+    with pytest.raises(tasks.RATE_LIMIT_ERRORS):
+        batch(tasks.exceptions.ResourceExhausted("quota"))
+
+
+def test_unknown_application_numbers_are_ignored(batch):
+    codes, _, singles = batch({"results": [entry("KR0", "A"), entry("KR1", "B"), entry("KR9", "Z")]})
+
+    assert codes == ["A", "B", "single"]
+    assert singles == ["KR2"]
+
+
+def test_progress_counts_each_patent_once(redis, batch):
+    redis.set("s1:total_count", 3)
+    batch({"results": [entry("KR0", "A"), entry("KR1", "B"), entry("KR2", "C")]})
+
+    assert redis.get("s1:progress_counter") == "3"
@@ -0,0 +1,90 @@
+import json
+import pytest
+from app import tasks
+from app.core.circuit_breaker import CircuitOpenError
+from app.services.evaluation import FAILED_EVALUATION
+
+ENTRIES = [
+    {"patent_info": f"특허 {i}", "application_number": f"KR{i}", "context_key": None, "row_index": i,
+     "classification": {"applicationNumber": f"KR{i}", "smallCode": "A"}}
+    for i in range(3)
+]
+
+
+def evaluation(score):
+    return {"score": score, "reason": f"이유 {score}"}
+
+
+@pytest.fixture
+def evaluate(redis, monkeypatch):
+    singles = []
+
+    def evaluate_with_llm(llm, prompt, stats_key=None):
+        singles.append(prompt)
+        return evaluation(0.5)
+
+    monkeypatch.setattr(tasks, "build_batch_evaluation_prompt", lambda session_id, entries: "batch")
+    monkeypatch.setattr(tasks, "build_evaluation_prompt", lambda session_id, patent_info, *args: patent_info)
+    monkeypatch.setattr(tasks, "evaluate_with_llm", evaluate_with_llm)
+    monkeypatch.setattr(
+        tasks, "collect_evaluation_results",
+        lambda reasoning, LLM, session_id, application_number: (application_number, reasoning["score"]),
+    )
+
+    def run(batch_result):
+        def evaluate_batch_with_llm(llm, prompt, stats_key=None):
+            if isinstance(batch_result, Exception):
+                raise batch_result
+            return batch_result
+
+        monkeypatch.setattr(tasks, "evaluate_batch_with_llm", evaluate_batch_with_llm)
+        return tasks.evaluate_classifications_batch.apply(args=("GPT", "s1", ENTRIES)).get(), singles
+
+    return run
+
+
+def test_results_follow_entry_order(redis, evaluate):
+    results, singles = evaluate({"KR2": evaluation(0.0), "KR0": evaluation(1.0), "KR1": evaluation(0.5)})
+
+    assert results == [("KR0", 1.0), ("KR1", 0.5), ("KR2", 0.0)]
+    assert singles == []
+    assert redis.hget("s1:GPT:stats", "evaluator_requests") == "1"
+
+
+def test_missing_entries_are_evaluated_one_by_one(redis, evaluate):
+    results, singles = evaluate({"KR1": evaluation(1.0), "KR9": evaluation(0.0)})
+
+    assert results == [("KR0", 0.5), ("KR1", 1.0), ("KR2", 0.5)]
+    assert singles == ["특허 0", "특허 2"]
+    assert redis.hget("s1:GPT:stats", "evaluation_fallbacks") == "2"
+
+
+def test_failed_batch_response_falls_back_to_single_evaluations(evaluate):
+    results, singles = evaluate(ValueError("응답 처리 실패"))
+
+    assert results == [("KR0", 0.5), ("KR1", 0.5), ("KR2", 0.5)]
+    assert len(singles) == 3
+
+
+def test_open_circuit_fails_all_entries_without_single_calls(redis, evaluate):
+    results, singles = evaluate(CircuitOpenError("openai", 30))
+
+    assert results == [(f"KR{i}", FAILED_EVALUATION["score"]) for i in range(3)]
+    assert singles == []
+    assert redis.hget("s1:GPT:stats", "circuit_rejected") == "3"
+
+
+def test_dispatch_pairs_chunk_results_with_stored_items(redis, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(tasks, "load_job_items", lambda job_id: [{k: v for k, v in entry.items() if k != "classification"} for entry in ENTRIES])
+    monkeypatch.setattr(tasks, "chord", lambda header: lambda callback: dispatched.extend(header.tasks))
+    monkeypatch.setattr(tasks.settings, "EVALUATION_BATCH_SIZE", 2)
+
+    # 청크 태스크 결과는 청크별 리스트
+    chunks = [[entry["classification"] for entry in ENTRIES[:2]], [ENTRIES[2]["classification"]]]
+    tasks.dispatch_batch_evaluation(chunks, "GPT", "s1", None, "job")
+
+    batches = [signature.args[2] for signature in dispatched]
+    assert [[entry["application_number"] for entry in batch] for batch in batches] == [["KR0", "KR1"], ["KR2"]]
+    assert all(entry["classification"]["applicationNumber"] == entry["application_number"] for batch in batches for entry in batch)
+    assert json.loads(redis.hget("s1:GPT:classifications", "KR2")) == ENTRIES[2]["classification"]
@@ -0,0 +1,63 @@
+import pytest
+from app.core.config import settings
+from app.services.bypass import classify_from_context
+
+SMALL = {
+    "level": "소분류", "code": "A0101", "name": "소분류",
+    "parent_code": "A01", "parent_name": "중분류",
+    "grand_parent_code": "A", "grand_parent_name": "대분류",
+}
+
+
+@pytest.fixture(autouse=True)
+def bypass(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BYPASS_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_BYPASS_MIN_SCORE", 0.9)
+    monkeypatch.setattr(settings, "LLM_BYPASS_MIN_MARGIN", 0.1)
+
+
+def context(*hits):
+    return {"hits": [{"page_content": "", "metadata": metadata, "score": score} for metadata, score in hits]}
+
+
+def test_classifies_from_unambiguous_small_category():
+    result = classify_from_context(context((SMALL, 0.95), (SMALL, 0.8)), "KR1")
+
+    assert result == {
+        "applicationNumber": "KR1",
+        "majorCode": "A", "majorTitle": "대분류",
+        "middleCode": "A01", "middleTitle": "중분류",
+        "smallCode": "A0101", "smallTitle": "소분류",
+    }
+
+
+@pytest.mark.parametrize("hits", [
+    # 점수가 기준보다 낮음
+    [(SMALL, 0.85), (SMALL, 0.5)],
+    # 2순위와의 점수 차이가 기준보다 작음
+    [(SMALL, 0.95), (SMALL, 0.9)],
+    # 1순위가 소분류가 아님
+    [({**SMALL, "level": "중분류"}, 0.99), (SMALL, 0.5)],
+    # 검색 결과 없음
+    [],
+])
+def test_falls_back_to_llm(hits):
+    assert classify_from_context(context(*hits), "KR1") is None
+
+
+def test_single_hit_only_needs_score():
+    assert classify_from_context(context((SMALL, 0.95)), "KR1") is not None
+
+
+def test_disabled_by_setting(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BYPASS_ENABLED", False)
+
+    assert classify_from_context(context((SMALL, 0.99), (SMALL, 0.1)), "KR1") is None
+
+
+def test_missing_parent_metadata_is_unclassified():
+    result = classify_from_context(context(({"level": "소분류", "code": "A0101", "name": "소분류"}, 0.99)), "KR1")
+
+    assert result["majorCode"] == "미분류"
+    assert result["middleTitle"] == "미분류"
+    assert result["smallCode"] == "A0101"
@@ -0,0 +1,68 @@
+import httpx
+import pytest
+from openai import RateLimitError
+from app import tasks
+
+ITEMS = [
+    {"patent_info": f"특허 {i}", "application_number": f"KR{i}", "context_key": None, "row_index": i}
+    for i in range(3)
+]
+
+
+def rate_limit_error():
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com"))
+    return RateLimitError("rate limit", response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def job(redis, monkeypatch):
+    monkeypatch.setattr(tasks, "load_job_items", lambda job_id: ITEMS)
+
+
+def test_retried_chunk_skips_finished_patents(monkeypatch):
+    calls = []
+    failures = {"KR1": 1}
+
+    def classify_one(LLM, session_id, patent_info, application_number, isAdmin, context_key, row_index):
+        calls.append(application_number)
+        if failures.get(application_number):
+            failures[application_number] -= 1
+            raise rate_limit_error()
+        return {"applicationNumber": application_number}
+
+    monkeypatch.setattr(tasks, "classify_one", classify_one)
+
+    # eager 실행에서는 self.retry가 태스크를 바로 다시 실행
+    results = tasks.classify_patent_chunk.apply(args=("GPT", "s1", "job", 0, 3)).get()
+
+    assert [result["applicationNumber"] for result in results] == ["KR0", "KR1", "KR2"]
+    assert calls == ["KR0", "KR1", "KR1", "KR2"]
+
+
+def test_admin_chunk_reuses_classification_when_evaluation_is_rate_limited(monkeypatch):
+    calls = []
+    failures = {"KR1": 1}
+
+    def classify_one(LLM, session_id, patent_info, application_number, isAdmin, context_key, row_index):
+        calls.append(f"classify:{application_number}")
+        return {"applicationNumber": application_number}
+
+    def evaluate_one(classification_result, LLM, session_id, patent_info, application_number, context_key, row_index):
+        calls.append(f"evaluate:{application_number}")
+        if failures.get(application_number):
+            failures[application_number] -= 1
+            raise rate_limit_error()
+        return {"score": 1, "reason": ""}
+
+    monkeypatch.setattr(tasks, "classify_one", classify_one)
+    monkeypatch.setattr(tasks, "evaluate_one", evaluate_one)
+    monkeypatch.setattr(tasks, "collect_evaluation_results", lambda reasoning, LLM, session_id, number: {"reasoning": reasoning})
+
+    results = tasks.classify_and_evaluate_chunk.apply(args=("GPT", "s1", "job", 0, 3)).get()
+
+    assert len(results) == 3
+    assert calls == [
+        "classify:KR0", "evaluate:KR0",
+        "classify:KR1", "evaluate:KR1", "evaluate:KR1",
+        "classify:KR2", "evaluate:KR2",
+    ]
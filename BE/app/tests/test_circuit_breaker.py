@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, counts_as_failure
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def breaker(redis):
+    return CircuitBreaker("openai", failure_threshold=2, open_seconds=30, max_open_seconds=120)
+
+
+def fail(breaker, error=None):
+    with pytest.raises(type(error or TimeoutError())):
+        with breaker.guard():
+            raise error or TimeoutError()
+
+
+def expire_open(redis, breaker):
+    # 열린 시간이 지난 것으로 만듦
+    redis.hset(breaker.state_key, "open_until", 0)
+
+
+def state(redis, breaker):
+    return redis.hget(breaker.state_key, "state") or "closed"
+
+
+def test_opens_after_consecutive_failures(redis, breaker):
+    fail(breaker)
+    assert state(redis, breaker) == "closed"
+    fail(breaker)
+    assert state(redis, breaker) == "open"
+
+    with pytest.raises(CircuitOpenError) as error:
+        with breaker.guard():
+            pass
+    assert error.value.retry_after == pytest.approx(30, abs=1)
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_success_resets_failure_count(redis, breaker):
+    fail(breaker)
+    with breaker.guard():
+        pass
+    fail(breaker)
+
+    assert state(redis, breaker) == "closed"
+
+
+def test_half_open_probe_success_closes(redis, breaker):
+    fail(breaker)
+    fail(breaker)
+    expire_open(redis, breaker)
+
+    with breaker.guard():
+        # 시험 호출 중에는 다른 호출을 거부
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+    assert state(redis, breaker) == "closed"
+    assert breaker.snapshot()["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_half_open_probe_failure_reopens_with_backoff(redis, breaker):
+    fail(breaker)
+    fail(breaker)
+    expire_open(redis, breaker)
+
+    fail(breaker)
+
+    assert state(redis, breaker) == "open"
+    assert float(redis.hget(breaker.state_key, "open_seconds")) == 60
+    assert breaker.snapshot()["open_for"] == pytest.approx(60, abs=1)
+
+
+def test_unrelated_error_on_probe_closes(redis, breaker):
+    fail(breaker)
+    fail(breaker)
+    expire_open(redis, breaker)
+
+    fail(breaker, ValueError("응답 파싱 실패"))
+
+    assert state(redis, breaker) == "closed"
+
+
+def test_async_guard_records_failures(redis, breaker):
+    async def call():
+        async with breaker.aguard():
+            raise TimeoutError()
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            asyncio.run(call())
+
+    assert state(redis, breaker) == "open"
+
+
+@pytest.mark.parametrize("error, expected", [
+    (TimeoutError(), True),
+    (StatusError(503), True),
+    (type("APIConnectionError", (Exception,), {})(), True),
+    # 429는 태스크에서 재시도하므로 집계하지 않음
+    (StatusError(429), False),
+    (StatusError(400), False),
+    (ValueError(), False),
+    (CircuitOpenError("openai", 1), False),
+])
+def test_counts_as_failure(error, expected):
+    assert counts_as_failure(error) is expected
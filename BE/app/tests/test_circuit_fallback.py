@@ -0,0 +1,52 @@
+import pytest
+from app import tasks
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+
+
+class FakePipeline:
+    def __init__(self, llm, vector_store=None):
+        self.llm = llm
+        self.vector_store = vector_store
+
+    def inputs(self, docs, patent_info):
+        return {"context": "", "query": patent_info}
+
+    def classify(self, docs, patent_info, application_number):
+        if self.llm in ("primary", tasks.gpt):
+            raise CircuitOpenError("openai", 30)
+        return {"applicationNumber": application_number, "smallCode": str(self.llm)}
+
+
+@pytest.fixture(autouse=True)
+def pipelines(redis, monkeypatch):
+    monkeypatch.setattr(tasks, "get_classification_pipeline", FakePipeline)
+    monkeypatch.setattr(tasks, "load_vectorstore", lambda session_id: None)
+
+
+def test_fallback_answer_is_not_attributed_to_primary(redis):
+    classifications, answered_by_llm = tasks.invoke_classification(
+        "primary", [], "특허", "KR1", "s1", fallback_llm="fallback"
+    )
+
+    assert classifications["smallCode"] == "fallback"
+    assert answered_by_llm is False
+    assert redis.hget("s1:stats", "circuit_fallbacks") == "1"
+
+
+def test_open_circuit_without_fallback_raises():
+    with pytest.raises(CircuitOpenError):
+        tasks.invoke_classification("primary", [], "특허", "KR1", "s1")
+
+
+def test_classify_one_does_not_cache_fallback_answer(redis, monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", True)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_FALLBACK_LLM", "CLAUDE")
+    monkeypatch.setattr(tasks, "prepare_classification", lambda *args: (None, [], "cache-key"))
+    cached = []
+    monkeypatch.setattr(tasks, "cache_classification", lambda key, value: cached.append(key))
+
+    result = tasks.classify_one("GPT", "s1", "특허", "KR1", False)
+
+    assert result["smallCode"] != "미분류"
+    assert cached == [None]
@@ -0,0 +1,95 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app import tasks
+from app.core.config import settings
+from app.services import celery_classification, dedup
+from app.services.dedup import group_duplicate_rows
+
+
+@pytest.fixture
+def embeddings(redis, tmp_path, monkeypatch):
+    # 업로드 시 저장된 특허 임베딩 행렬
+    def save(vectors):
+        path = tmp_path / "s1.npy"
+        np.save(path, np.array(vectors, dtype=np.float32))
+        monkeypatch.setattr(dedup, "get_embedding_matrix_path", lambda session_id: str(path))
+        redis.set("s1:embeddings", 1)
+
+    return save
+
+
+def test_groups_rows_with_the_same_normalized_text(redis):
+    patent_infos = {
+        0: "특허명: 배터리 요약: ABC",
+        1: "특허명:  배터리\n요약: abc",
+        2: "특허명: 배터리 요약: ＡＢＣ",  # 전각 문자
+        3: "특허명: 모터 요약: ABC",
+    }
+
+    assert group_duplicate_rows("s1", patent_infos) == {0: [1, 2], 3: []}
+
+
+def test_merges_similar_groups_above_threshold(embeddings, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_SIMILARITY_THRESHOLD", 0.95)
+    embeddings([[1, 0], [1, 0], [0.99, 0.1], [0, 1]])
+    patent_infos = {0: "특허 A", 1: "특허 A", 2: "특허 A'", 3: "특허 B"}
+
+    # 정확히 같은 행(1)과 유사한 행(2)은 앞쪽 대표 행에 묶임
+    assert group_duplicate_rows("s1", patent_infos) == {0: [1, 2], 3: []}
+
+
+def test_skips_similarity_without_embeddings(redis, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_SIMILARITY_THRESHOLD", 0.95)
+
+    assert group_duplicate_rows("s1", {0: "특허 A", 1: "특허 B"}) == {0: [], 1: []}
+
+
+def patent_frame():
+    return pd.DataFrame({
+        "출원번호": ["KR1", "KR2", "KR3", "KR4"],
+        "특허명": ["배터리", "모터", "배터리 ", "배터리"],
+        "요약": ["요약", "요약", "요약", "요약"],
+    })
+
+
+def test_classifies_only_representative_rows(redis, monkeypatch):
+    queued = []
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    monkeypatch.setattr(settings, "CLASSIFICATION_WORKER", "async")
+    monkeypatch.setattr(celery_classification, "get_index_signature", lambda session_id: "sig")
+    monkeypatch.setattr(celery_classification, "get_query_context_key", lambda session_id, patent_info, signature: None)
+    monkeypatch.setattr(celery_classification, "enqueue_classification_jobs", lambda session_id, LLM, isAdmin, items: queued.extend(items))
+
+    celery_classification.process_patent_classification("s1", "GPT", patent_frame(), redis)
+
+    assert [item["application_number"] for item in queued] == ["KR1", "KR2"]
+    assert json.loads(redis.hget("s1:duplicates", "KR1")) == [2, 3]
+    assert redis.get("s1:total_count") == "2"
+    assert redis.hget("s1:stats", "deduplicated") == "2"
+
+
+def test_completion_copies_result_to_duplicate_rows(redis, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_data").mkdir()
+    patent_frame().to_pickle(tmp_path / "temp_data" / "s1.pkl")
+    redis.set("s1:time", 0)
+    redis.hset("s1:duplicates", "KR1", json.dumps([2, 3]))
+
+    def result(number, code):
+        return {
+            "applicationNumber": number, "majorCode": code, "majorTitle": code, "middleCode": code,
+            "middleTitle": code, "smallCode": code, "smallTitle": code,
+        }
+
+    # 일괄 분류 태스크의 결과(리스트)와 특허 하나의 결과가 섞여 있음
+    tasks.classification_completion([[result("KR1", "A")], result("KR2", "B")], "s1")
+
+    classified = pd.read_excel(tmp_path / "classified_excels" / "s1_classified.xlsx")
+    assert classified["소분류코드"].tolist() == ["A", "B", "A", "A"]
+    patents = [json.loads(entry) for entry in redis.lrange("s1", 0, -1)]
+    assert [(patent["applicationNumber"], patent["smallCode"]) for patent in patents] == [
+        ("KR1", "A"), ("KR3", "A"), ("KR4", "A"), ("KR2", "B"),
+    ]
+    assert json.loads(redis.get("s1:progress"))["status"] == "completed"
@@ -0,0 +1,76 @@
+import itertools
+from types import SimpleNamespace
+import pytest
+from app.core import cache as cache_module
+from app.core.cache import RedisLRUCache
+from app.core.embeddings import CachedEmbeddings
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [0.0, 0.0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 같은 시각에 저장된 항목의 순서가 바뀌지 않도록 호출마다 1초씩 증가
+    ticks = itertools.count(1)
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: next(ticks)))
+
+
+def test_lru_cache_evicts_least_recently_used(redis, clock):
+    cache = RedisLRUCache("test_cache", max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get_many(["a", "c"]) == ["1", "3"]
+    assert redis.zcard("test_cache:lru") == 2
+
+
+def test_embeds_only_missing_texts(redis, clock):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, "model", 2, RedisLRUCache("embedding_cache", 100))
+
+    first = embeddings.embed_documents(["가", "나나", "가"])
+    second = embeddings.embed_documents(["나나", "다다다"])
+
+    # 중복 텍스트는 한 번만, 캐시에 있는 텍스트는 다시 임베딩하지 않음
+    assert underlying.calls == [["가", "나나"], ["다다다"]]
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+
+
+def test_cache_key_depends_on_model_and_dimensions(redis, clock):
+    cache = RedisLRUCache("embedding_cache", 100)
+    small = CachedEmbeddings(CountingEmbeddings(), "model", 2, cache)
+    other_model = CachedEmbeddings(CountingEmbeddings(), "other", 2, cache)
+    other_dimensions = CachedEmbeddings(CountingEmbeddings(), "model", 3, cache)
+
+    small.embed_documents(["가"])
+    other_model.embed_documents(["가"])
+    other_dimensions.embed_documents(["가"])
+
+    assert other_model.underlying.calls == [["가"]]
+    assert other_dimensions.underlying.calls == [["가"]]
+    assert redis.zcard("embedding_cache:lru") == 3
+
+
+def test_evicted_embedding_is_computed_again(redis, clock):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, "model", 2, RedisLRUCache("embedding_cache", 1))
+
+    embeddings.embed_documents(["가"])
+    embeddings.embed_documents(["나"])
+    embeddings.embed_documents(["가"])
+
+    assert underlying.calls == [["가"], ["나"], ["가"]]
@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.messages import AIMessage
+from app.schemas.classification import EvaluationSchema
+from app.services.evaluation import (
+    FAILED_EVALUATION,
+    _batch_evaluation_result,
+    _evaluation_result,
+    get_evaluation_stats,
+    load_json_loosely,
+    repair_batch_evaluation,
+    repair_evaluation,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"score": 1.0, "reason": "적절"}\n```', {"score": 1.0, "reason": "적절"}),
+    ('평가 결과입니다.\n{"score": 0.5, "reason": "일부 적절",}\n감사합니다.', {"score": 0.5, "reason": "일부 적절"}),
+    ('{“score”: 0.0, “reason”: “부적절”}', {"score": 0.0, "reason": "부적절"}),
+    ("## 점수: 0.5\n## 이유: 중분류만 일치", {"score": 0.5, "reason": "중분류만 일치"}),
+    ("**Score**: 0.9\nReason: close match", {"score": 1.0, "reason": "close match"}),
+    ("분류가 대체로 맞아 0.5로 판단합니다.", {"score": 0.5, "reason": ""}),
+])
+def test_repairs_score_and_reason_from_text(text, expected):
+    assert repair_evaluation(AIMessage(content=text)) == expected
+
+
+def test_repairs_from_tool_call_arguments():
+    raw = AIMessage(content="", tool_calls=[{"name": "EvaluationSchema", "args": {"score": "0.4", "reason": " 이유 "}, "id": "1"}])
+
+    assert repair_evaluation(raw) == {"score": 0.5, "reason": "이유"}
+
+
+def test_repairs_from_anthropic_tool_use_block():
+    raw = AIMessage(content=[
+        {"type": "text", "text": "평가합니다."},
+        {"type": "tool_use", "id": "1", "name": "EvaluationSchema", "input": {"score": 1, "reason": "일치"}},
+    ])
+
+    assert repair_evaluation(raw) == {"score": 1.0, "reason": "일치"}
+
+
+@pytest.mark.parametrize("raw", [None, AIMessage(content="점수를 매길 수 없습니다."), AIMessage(content='{"reason": "점수 없음"}')])
+def test_returns_none_without_score(raw):
+    assert repair_evaluation(raw) is None
+
+
+def test_load_json_loosely_returns_none_for_non_json():
+    assert load_json_loosely("JSON이 아닌 응답") is None
+
+
+def test_repairs_batch_entries_and_drops_invalid_ones():
+    text = """```json
+    {"results": [
+        {"applicationNumber": "KR1", "score": 1.0, "reason": "일치"},
+        {"applicationNumber": "KR2", "score": "잘못된 점수"},
+        {"score": 0.5, "reason": "출원번호 없음"},
+        {"applicationNumber": 3, "score": 0.4, "reason": "부분 일치",},
+    ]}
+    ```"""
+
+    assert repair_batch_evaluation(AIMessage(content=text)) == {
+        "KR1": {"score": 1.0, "reason": "일치"},
+        "3": {"score": 0.5, "reason": "부분 일치"},
+    }
+
+
+def test_repairs_batch_from_plain_list():
+    raw = AIMessage(content='[{"applicationNumber": "KR1", "score": 0.0, "reason": "불일치"}]')
+
+    assert repair_batch_evaluation(raw) == {"KR1": {"score": 0.0, "reason": "불일치"}}
+    assert repair_batch_evaluation(AIMessage(content="응답 없음")) == {}
+
+
+def test_records_outcome_per_provider(redis):
+    parsed = EvaluationSchema(analysis="", score=1.0, reason="일치")
+
+    assert _evaluation_result(None, {"parsed": parsed}, "s1:GPT") == {"score": 1.0, "reason": "일치"}
+    assert _evaluation_result(None, {"parsed": None, "raw": AIMessage(content="점수: 0.5")}, "s1:GPT")["score"] == 0.5
+    assert _evaluation_result(None, {"parsed": None, "raw": AIMessage(content="응답 없음")}, "s1:GPT") == FAILED_EVALUATION
+    assert _batch_evaluation_result(None, {"parsed": None, "raw": AIMessage(content="응답 없음")}, "s1:GPT") == {}
+
+    assert get_evaluation_stats() == {"unknown": {"structured": 1, "repaired": 1, "failed": 2, "repair_rate": 0.75}}
+    # 작업 통계에는 복구/실패만 기록
+    assert redis.hget("s1:GPT:stats", "evaluation_repaired") == "1"
+    assert redis.hget("s1:GPT:stats", "evaluation_failed") == "2"
+    assert redis.hget("s1:GPT:stats", "evaluation_structured") is None
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+import pytest
+from app import tasks
+from app.core.config import settings
+from app.core.rate_limit import _record_wait
+from app.services import hedging
+from app.services.hedging import LatencyTracker, ahedged_call, hedged_call, provider_call_timer
+
+THRESHOLD = 0.05
+
+
+@pytest.fixture(autouse=True)
+def hedging_settings(redis, monkeypatch):
+    monkeypatch.setattr(settings, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(hedging, "_trackers", {})
+
+
+@pytest.fixture
+def threshold(redis):
+    # 응답 시간 표본을 채워 헤징 기준 시간을 THRESHOLD로 만듦
+    redis.rpush("latency:unknown", *[THRESHOLD] * 5)
+
+
+def slow(result, seconds=0.5):
+    def call():
+        time.sleep(seconds)
+        return result
+
+    return call
+
+
+def failing(message, seconds=0.0):
+    def call():
+        time.sleep(seconds)
+        raise RuntimeError(message)
+
+    return call
+
+
+def test_threshold_needs_enough_samples(redis):
+    tracker = LatencyTracker("openai")
+    redis.rpush(tracker.key, 1.0, 2.0)
+    assert tracker.threshold() is None
+
+    tracker = LatencyTracker("openai")
+    redis.rpush(tracker.key, *range(3, 21))
+    assert tracker.threshold() == 19.0  # 20개 중 95 백분위
+
+
+def test_threshold_is_at_least_min_delay(redis, monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_MIN_DELAY", 5)
+    tracker = LatencyTracker("openai")
+    redis.rpush(tracker.key, 0.1, 0.2, 0.3)
+
+    assert tracker.threshold() == 5
+
+
+def test_calls_primary_inline_without_threshold():
+    caller = threading.get_ident()
+
+    assert hedged_call(None, lambda: threading.get_ident(), slow("hedge")) == (caller, False)
+
+
+def test_fast_primary_sends_no_hedge(threshold):
+    hedges = []
+
+    assert hedged_call(None, lambda: "primary", slow("hedge"), on_hedge=lambda: hedges.append(1)) == ("primary", False)
+    assert hedges == []
+
+
+def test_hedge_wins_when_primary_is_slow(threshold):
+    hedges = []
+
+    assert hedged_call(None, slow("primary"), lambda: "hedge", on_hedge=lambda: hedges.append(1)) == ("hedge", True)
+    assert hedges == [1]
+
+
+def test_failed_hedge_waits_for_primary(threshold):
+    assert hedged_call(None, slow("primary", 0.2), failing("hedge")) == ("primary", False)
+
+
+def test_both_failing_raises_primary_error(threshold):
+    with pytest.raises(RuntimeError, match="primary"):
+        hedged_call(None, failing("primary", 0.2), failing("hedge"))
+
+
+def test_runs_primary_inline_when_hedge_threads_are_busy(threshold, monkeypatch):
+    monkeypatch.setattr(hedging, "_executor_slots", threading.BoundedSemaphore(1))
+    hedging._executor_slots.acquire()
+    caller = threading.get_ident()
+
+    assert hedged_call(None, lambda: threading.get_ident(), lambda: "hedge") == (caller, False)
+
+
+def test_async_hedge_win_cancels_primary(threshold):
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def hedge():
+        return "hedge"
+
+    assert asyncio.run(ahedged_call(None, primary, hedge)) == ("hedge", True)
+    assert cancelled == [True]
+
+
+def test_timer_records_provider_time_without_rate_limit_waits(redis):
+    with provider_call_timer(None):
+        time.sleep(0.2)
+        _record_wait(0.15)
+
+    assert float(redis.lindex("latency:unknown", 0)) == pytest.approx(0.05, abs=0.03)
+
+
+def test_timer_skips_failed_calls_and_disabled_hedging(redis, monkeypatch):
+    with pytest.raises(RuntimeError):
+        with provider_call_timer(None):
+            raise RuntimeError("호출 실패")
+    monkeypatch.setattr(settings, "HEDGING_ENABLED", False)
+    with provider_call_timer(None):
+        pass
+
+    assert redis.llen("latency:unknown") == 0
+
+
+class FakePipeline:
+    def __init__(self, llm, vector_store=None):
+        self.llm = llm
+        self.vector_store = vector_store
+
+    def classify(self, docs, patent_info, application_number):
+        if self.llm == "primary":
+            time.sleep(0.5)
+        return {"applicationNumber": application_number, "smallCode": self.llm}
+
+
+@pytest.mark.parametrize("hedge_llm, answered_by_llm", [("primary", True), ("other", False)])
+def test_hedge_win_is_attributed_to_the_answering_llm(redis, threshold, monkeypatch, hedge_llm, answered_by_llm):
+    # 같은 LLM으로 헤징하면 헤징 요청도 느리므로 다른 객체로 빠르게 응답
+    pipeline = FakePipeline("primary")
+    hedge_pipeline = FakePipeline(hedge_llm)
+    if hedge_llm == "primary":
+        hedge_pipeline.classify = lambda docs, patent_info, application_number: {"applicationNumber": application_number}
+    monkeypatch.setattr(tasks, "get_classification_pipeline", lambda llm, vector_store: hedge_pipeline)
+
+    _, attributed = tasks._invoke_pipeline(pipeline, [], "특허", "KR1", hedge_llm, "s1")
+
+    assert attributed is answered_by_llm
+    assert redis.hget("s1:stats", "hedge_wins") == "1"
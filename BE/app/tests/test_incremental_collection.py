@@ -0,0 +1,83 @@
+import pytest
+from app import tasks
+from app.core.config import settings
+from app.services.stragglers import (
+    add_collected,
+    iter_patent_results,
+    reset_straggler_state,
+    store_missing_results,
+    store_patent_result,
+)
+
+ITEMS = [
+    {"patent_info": f"특허 {i}", "application_number": f"KR{i}", "context_key": None, "row_index": i}
+    for i in range(3)
+]
+
+
+@pytest.fixture(autouse=True)
+def incremental(redis, monkeypatch):
+    monkeypatch.setattr(settings, "INCREMENTAL_COLLECTION_ENABLED", True)
+    reset_straggler_state("s1", ITEMS)
+
+
+def test_completes_exactly_once_when_last_result_is_collected():
+    assert add_collected("s1", 2) is False
+    assert add_collected("s1", 1) is True
+    # 이후에 늦게 도착한 결과로 다시 완료 처리하지 않음
+    assert add_collected("s1", 1) is False
+
+
+def test_zero_count_does_not_complete():
+    add_collected("s1", 3)
+
+    assert add_collected("s1", 0) is False
+
+
+def test_first_stored_result_wins():
+    assert store_patent_result("s1", "KR0", {"smallCode": "A"}) is True
+    assert store_patent_result("s1", "KR0", {"smallCode": "B"}) is False
+
+    assert store_missing_results("s1", {"KR0": {"smallCode": "C"}, "KR1": {"smallCode": "C"}}) == 1
+    assert sorted(result["smallCode"] for result in iter_patent_results("s1")) == ["A", "C"]
+
+
+def test_failed_chunk_stores_unclassified_and_finishes_job(redis, monkeypatch):
+    finalized = []
+    monkeypatch.setattr(tasks, "load_job_items", lambda job_id: ITEMS)
+    monkeypatch.setattr(tasks.finalize_classification, "delay", finalized.append)
+
+    def classify_one(LLM, session_id, patent_info, application_number, isAdmin, context_key, row_index):
+        if application_number == "KR1":
+            raise RuntimeError("처리하지 못한 에러")
+        store_patent_result(session_id, application_number, {"applicationNumber": application_number, "smallCode": "A"})
+        tasks.collect_results(session_id)
+        return {"applicationNumber": application_number, "smallCode": "A"}
+
+    monkeypatch.setattr(tasks, "classify_one", classify_one)
+
+    result = tasks.classify_patent_chunk.apply(args=("GPT", "s1", "job", 0, 3))
+
+    assert result.failed()
+    # 처리한 KR0은 그대로, 처리하지 못한 KR1, KR2는 미분류로 저장하고 작업 완료
+    results = {result["applicationNumber"]: result["smallCode"] for result in iter_patent_results("s1")}
+    assert results == {"KR0": "A", "KR1": "미분류", "KR2": "미분류"}
+    assert finalized == ["s1"]
+    assert redis.hget("s1:stats", "failed_tasks") == "1"
+
+
+def test_rows_with_the_same_application_number_complete_the_job(monkeypatch):
+    finalized = []
+    monkeypatch.setattr(tasks.finalize_classification, "delay", finalized.append)
+    # 중복 제거를 사용하지 않으면 같은 출원번호(또는 비어 있는 출원번호 "nan")의 행이 각각 분류됨
+    items = [
+        {"patent_info": f"특허 {i}", "application_number": number, "context_key": None, "row_index": i}
+        for i, number in enumerate(["KR1", "KR1", "nan", "nan"])
+    ]
+    reset_straggler_state("s2", items)
+
+    for item in items:
+        if store_patent_result("s2", item["application_number"], {"applicationNumber": item["application_number"]}):
+            tasks.collect_results("s2")
+
+    assert finalized == ["s2"]
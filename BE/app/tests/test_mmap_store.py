@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.core import mmap_store
+from app.core.mmap_store import MmapVectorStore, export_native_store
+
+DIMENSIONS = 8
+ROOTS = 4
+CHILDREN_PER_ROOT = 6
+
+
+class QueryEmbeddings(Embeddings):
+    # 쿼리 문자열 -> 미리 정한 벡터
+    def __init__(self, queries):
+        self.queries = queries
+
+    def embed_query(self, text):
+        return list(self.queries[text])
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def taxonomy(seed=0, description="설명"):
+    # 대분류마다 떨어진 중심 벡터 주변에 하위 분류 벡터가 모인 분류 체계
+    import faiss
+
+    rng = np.random.default_rng(seed)
+    centers = np.eye(ROOTS, DIMENSIONS, dtype=np.float32) * 10
+    vectors, documents = [], {}
+    for root in range(ROOTS):
+        for child in range(CHILDREN_PER_ROOT):
+            i = len(vectors)
+            vectors.append(centers[root] + rng.normal(scale=0.3, size=DIMENSIONS).astype(np.float32))
+            metadata = {
+                "code": f"R{root}-{child}", "level": "중분류", "name": f"중분류 {i}",
+                "parent_code": f"R{root}", "parent_name": f"대분류 {root}", "description": f"{description} {i}",
+            }
+            documents[str(i)] = Document(page_content=f"중분류 {i}", metadata=metadata)
+    index = faiss.IndexFlatL2(DIMENSIONS)
+    index.add(np.array(vectors, dtype=np.float32))
+    queries = {
+        f"q{root}": centers[root] + rng.normal(scale=0.3, size=DIMENSIONS).astype(np.float32)
+        for root in range(ROOTS)
+    }
+    embeddings = QueryEmbeddings(queries)
+    return FAISS(embeddings, index, InMemoryDocstore(documents), {i: str(i) for i in range(len(vectors))}), embeddings
+
+
+def results(store, query, k=3):
+    return [(doc.metadata["code"], score) for doc, score in store.similarity_search_with_relevance_scores(query, k=k)]
+
+
+def assert_same_results(store, vectordb, query):
+    # 같은 문서, 같은 순서, float32 계산 순서 차이 이내의 같은 점수
+    actual, expected = results(store, query), results(vectordb, query)
+    assert [code for code, _ in actual] == [code for code, _ in expected]
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected], abs=1e-3)
+
+
+@pytest.mark.parametrize("branches", [0, 1])
+def test_search_matches_faiss(tmp_path, branches):
+    vectordb, embeddings = taxonomy()
+    export_native_store(vectordb, str(tmp_path))
+    store = MmapVectorStore(str(tmp_path), embeddings, branches=branches)
+
+    assert store.hierarchical is bool(branches)
+    for query in embeddings.queries:
+        assert_same_results(store, vectordb, query)
+
+
+def test_documents_round_trip(tmp_path):
+    vectordb, embeddings = taxonomy()
+    export_native_store(vectordb, str(tmp_path))
+    store = MmapVectorStore(str(tmp_path), embeddings)
+
+    for i in range(store.ntotal):
+        assert store.document(i) == vectordb.docstore.search(str(i))
+
+
+def test_interrupted_save_keeps_previous_build(tmp_path, monkeypatch):
+    vectordb, embeddings = taxonomy(description="이전 설명")
+    export_native_store(vectordb, str(tmp_path))
+
+    # 같은 문서 수로 설명만 바꾼 저장이 저장소 정보를 교체하기 전에 중단됨
+    def interrupted(path, write):
+        raise OSError("중단")
+
+    monkeypatch.setattr(mmap_store, "_replace_atomic", interrupted)
+    changed, _ = taxonomy(seed=1, description="새 설명")
+    with pytest.raises(OSError):
+        export_native_store(changed, str(tmp_path))
+
+    store = MmapVectorStore(str(tmp_path), embeddings)
+    assert store.document(0).metadata["description"] == "이전 설명 0"
+    assert_same_results(store, vectordb, "q0")
+
+
+def test_save_switches_build_and_keeps_only_previous_build(tmp_path):
+    vectordb, embeddings = taxonomy(description="첫 번째")
+    export_native_store(vectordb, str(tmp_path))
+    first = MmapVectorStore(str(tmp_path), embeddings)
+    export_native_store(taxonomy(description="두 번째")[0], str(tmp_path))
+    export_native_store(taxonomy(description="세 번째")[0], str(tmp_path))
+
+    store = MmapVectorStore(str(tmp_path), embeddings)
+    assert store.document(0).metadata["description"] == "세 번째 0"
+    # 현재 빌드와 직전 빌드의 파일만 남음
+    builds = {path.name.split(".")[1] for path in tmp_path.glob("vectors.*.npy")}
+    assert store.build in builds and first.build not in builds and len(builds) == 2
+    # 이미 연 저장소는 파일이 삭제되어도 계속 검색 가능
+    assert first.document(0).metadata["description"] == "첫 번째 0"
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from app.core.rate_limit import RedisTokenBucketRateLimiter
+
+
+def rewind(redis, key, seconds):
+    # 마지막 충전 시각을 앞당겨 seconds초가 지난 것으로 만듦
+    redis.hset(key, "ts", float(redis.hget(key, "ts")) - seconds)
+
+
+def test_deducts_one_request_per_acquire(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=3, tokens_per_minute=0, estimated_tokens=100)
+
+    assert [limiter.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 분당 3회 -> 초당 0.05개 충전, 1개를 채우려면 약 20초
+    assert limiter.try_acquire() == pytest.approx(20, abs=0.1)
+    assert float(redis.hget(limiter.requests_key, "tokens")) == pytest.approx(0, abs=0.01)
+
+
+def test_refills_with_elapsed_time(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=60, tokens_per_minute=0, estimated_tokens=100)
+    for _ in range(60):
+        assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() > 0
+
+    rewind(redis, limiter.requests_key, 2)
+
+    assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() > 0
+
+
+def test_refill_is_capped_at_capacity(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=2, tokens_per_minute=0, estimated_tokens=100)
+    limiter.try_acquire()
+    rewind(redis, limiter.requests_key, 3600)
+
+    assert [limiter.try_acquire() for _ in range(2)] == [0.0, 0.0]
+    assert limiter.try_acquire() > 0
+
+
+def test_deducts_from_all_buckets_only_when_all_have_room(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=100, tokens_per_minute=1000, estimated_tokens=400)
+
+    assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() == 0.0
+    # 토큰 버킷에 200개만 남아 거부되고, 요청 수 버킷은 차감하지 않음
+    assert limiter.try_acquire() == pytest.approx(200 / (1000 / 60), abs=0.1)
+    assert float(redis.hget(limiter.requests_key, "tokens")) == pytest.approx(98, abs=0.1)
+    assert float(redis.hget(limiter.tokens_key, "tokens")) == pytest.approx(200, abs=1)
+
+
+def test_record_usage_adjusts_for_actual_tokens(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=0, tokens_per_minute=1000, estimated_tokens=400)
+    limiter.try_acquire()
+
+    # 예상보다 600개 더 사용
+    limiter.record_usage(1000)
+    assert float(redis.hget(limiter.tokens_key, "tokens")) == pytest.approx(0, abs=1)
+
+    # 예상보다 300개 적게 사용하면 반환
+    limiter.record_usage(100)
+    assert float(redis.hget(limiter.tokens_key, "tokens")) == pytest.approx(300, abs=1)
+
+
+def test_headroom_scales_capacity(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=10, tokens_per_minute=0, estimated_tokens=100, headroom=0.5)
+
+    assert [limiter.try_acquire() for _ in range(5)] == [0.0] * 5
+    assert limiter.try_acquire() > 0
+
+
+def test_non_blocking_acquire(redis):
+    limiter = RedisTokenBucketRateLimiter("openai", requests_per_minute=1, tokens_per_minute=0, estimated_tokens=100)
+
+    assert limiter.acquire(blocking=False) is True
+    assert limiter.acquire(blocking=False) is False
+    assert asyncio.run(limiter.aacquire(blocking=False)) is False
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import pytest
+from app import tasks
+from app.core.config import settings
+from app.services.admin_classification import classify_with_llm
+from app.services.pipeline import ClassificationPipeline
+from app.services.result_cache import cache_classification, get_cached_classification, get_classification_cache_key
+
+CLASSIFICATION = {
+    "applicationNumber": "KR1",
+    "majorCode": "A", "majorTitle": "대분류",
+    "middleCode": "A01", "middleTitle": "중분류",
+    "smallCode": "A0101", "smallTitle": "소분류",
+}
+
+
+@pytest.fixture(autouse=True)
+def taxonomy(redis):
+    redis.set("vectorstore:s1:content_hash", "taxonomy-1")
+    redis.set("vectorstore:s2:content_hash", "taxonomy-1")
+
+
+def test_key_ignores_session_and_text_formatting():
+    key = get_classification_cache_key("s1", "gpt", "특허명: 배터리  요약: ABC")
+
+    assert key == get_classification_cache_key("s2", "GPT", "특허명: 배터리 요약: abc")
+
+
+def test_key_depends_on_taxonomy_llm_and_backend(redis, monkeypatch):
+    key = get_classification_cache_key("s1", "GPT", "특허")
+
+    assert key != get_classification_cache_key("s1", "CLAUDE", "특허")
+    redis.set("vectorstore:s2:content_hash", "taxonomy-2")
+    assert key != get_classification_cache_key("s2", "GPT", "특허")
+    monkeypatch.setattr(settings, "LLM_BACKEND", "mock")
+    assert key != get_classification_cache_key("s1", "GPT", "특허")
+
+
+def test_no_key_without_saved_taxonomy():
+    assert get_classification_cache_key("unknown", "GPT", "특허") is None
+
+
+def test_cached_result_has_no_application_number():
+    key = get_classification_cache_key("s1", "GPT", "특허")
+    cache_classification(key, CLASSIFICATION)
+
+    cached = get_cached_classification(key)
+    assert "applicationNumber" not in cached
+    assert cached["smallCode"] == "A0101"
+    # 키가 없으면 저장, 조회하지 않음
+    cache_classification(None, CLASSIFICATION)
+    assert get_cached_classification(None) is None
+
+
+def test_cache_hit_uses_requested_application_number(redis, monkeypatch):
+    cache_classification(get_classification_cache_key("s1", "GPT", "특허"), CLASSIFICATION)
+
+    classifications, docs, cache_key = tasks.prepare_classification("GPT", "s2", "특허", "KR9", False)
+
+    assert classifications == {**CLASSIFICATION, "applicationNumber": "KR9"}
+    assert docs is None and cache_key is None
+    assert redis.hget("s2:stats", "cache_hits") == "1"
+
+
+def test_failed_llm_call_is_not_cached(redis, monkeypatch):
+    monkeypatch.setattr(tasks, "prepare_classification", lambda *args: (None, [], "cache-key"))
+
+    def invoke_classification(*args, **kwargs):
+        raise ValueError("응답 파싱 실패")
+
+    monkeypatch.setattr(tasks, "invoke_classification", invoke_classification)
+
+    result = tasks.classify_one("GPT", "s1", "특허", "KR1", False)
+
+    assert result["smallCode"] == "미분류"
+    assert get_cached_classification("cache-key") is None
+
+
+class FakeRetriever:
+    async def ainvoke(self, patent_info):
+        return []
+
+
+class FakePipeline(ClassificationPipeline):
+    def __init__(self, response):
+        self.response = response
+
+    async def ainvoke(self, docs, patent_info):
+        return self.response
+
+
+def test_admin_classification_reports_unparsed_response():
+    classifications, parsed = asyncio.run(classify_with_llm(FakePipeline("JSON이 아닌 응답"), FakeRetriever(), "특허", "KR1"))
+
+    assert classifications["smallCode"] == "미분류"
+    assert parsed is False
+
+    classifications, parsed = asyncio.run(classify_with_llm(FakePipeline(json.dumps(CLASSIFICATION)), FakeRetriever(), "특허", "KR1"))
+
+    assert classifications["smallCode"] == "A0101"
+    assert parsed is True
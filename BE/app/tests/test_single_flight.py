@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from app.core.config import settings
+from app.services.single_flight import asingle_flight, request_key, single_flight
+
+
+@pytest.fixture(autouse=True)
+def enabled(redis, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_WAIT", 5)
+
+
+def test_concurrent_requests_share_one_call(redis):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"smallCode": "A0101"}
+
+    results = {}
+    leader = threading.Thread(target=lambda: results.setdefault("leader", single_flight("key", call)))
+    leader.start()
+    started.wait(5)
+
+    follower = threading.Thread(target=lambda: results.setdefault("follower", single_flight("key", call)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert results["leader"] == ({"smallCode": "A0101"}, False)
+    assert results["follower"] == ({"smallCode": "A0101"}, True)
+
+
+def test_failed_call_releases_lock_without_result(redis):
+    def fail():
+        raise RuntimeError("LLM 에러")
+
+    with pytest.raises(RuntimeError):
+        single_flight("key", fail)
+
+    assert redis.get("single_flight:key:lock") is None
+    assert single_flight("key", lambda: "retry") == ("retry", False)
+
+
+def test_disabled_calls_directly(redis, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_ENABLED", False)
+
+    assert single_flight("key", lambda: "a") == ("a", False)
+    assert single_flight("key", lambda: "b") == ("b", False)
+    assert redis.keys("single_flight:*") == []
+
+
+def test_async_requests_share_one_call(redis):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return ["결과"]
+
+    async def run():
+        return await asyncio.gather(asingle_flight("key", call), asingle_flight("key", call))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+    assert all(result == ["결과"] for result, _ in results)
+
+
+def test_request_key_depends_on_model_and_prompt():
+    gpt = SimpleNamespace(model_name="gpt-4o")
+    mini = SimpleNamespace(model_name="gpt-4o-mini")
+
+    assert request_key(gpt, "classification", {"query": "a"}) == request_key(gpt, "classification", {"query": "a"})
+    assert request_key(gpt, "classification", {"query": "a"}) != request_key(mini, "classification", {"query": "a"})
+    assert request_key(gpt, "classification", {"query": "a"}) != request_key(gpt, "classification", {"query": "b"})
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from app.core.vectorstore import VectorStoreCache
+
+
+def store():
+    return SimpleNamespace(index=SimpleNamespace(ntotal=10, d=4))
+
+
+def test_get_returns_cached_store_and_counts_hits():
+    cache = VectorStoreCache(2)
+    vector_store = store()
+    cache.put(("s1", "/p1", 0, 1), vector_store)
+
+    assert cache.get(("s1", "/p1", 0, 1)) is vector_store
+    assert cache.get(("s2", "/p2", 0, 1)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used_store():
+    cache = VectorStoreCache(2)
+    cache.put(("s1", "/p1", 0, 1), store())
+    cache.put(("s2", "/p2", 0, 1), store())
+
+    # s1을 사용해 s2가 가장 오래 사용하지 않은 저장소가 됨
+    cache.get(("s1", "/p1", 0, 1))
+    cache.put(("s3", "/p3", 0, 1), store())
+
+    assert cache.get(("s2", "/p2", 0, 1)) is None
+    assert cache.get(("s1", "/p1", 0, 1)) is not None
+    assert cache.get(("s3", "/p3", 0, 1)) is not None
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_new_version_of_session_replaces_old_one():
+    cache = VectorStoreCache(4)
+    cache.put(("s1", "/p1", 0, 1), store())
+    cache.put(("s1", "/p1", 0, 2), store())
+
+    assert cache.get(("s1", "/p1", 0, 1)) is None
+    assert cache.stats()["size"] == 1
+    assert cache.invalidations == 1
+    assert cache.evictions == 0
+
+
+def test_invalidate_removes_all_versions_of_session():
+    cache = VectorStoreCache(4)
+    cache.put(("s1", "/p1", 0, 1), store())
+    cache.put(("s2", "/p2", 0, 1), store())
+
+    cache.invalidate("s1")
+
+    assert cache.get(("s1", "/p1", 0, 1)) is None
+    assert cache.get(("s2", "/p2", 0, 1)) is not None
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import pytest
+from app.core import vectorstore
+from app.core.vectorstore import VectorStoreCache, load_vectorstore
+
+
+@pytest.fixture
+def session(redis, tmp_path, monkeypatch):
+    # FAISS pickle 형식 저장소 (load_local 호출마다 새 객체)
+    (tmp_path / "index.faiss").write_bytes(b"")
+    loads = []
+
+    def load_local(path, embeddings, allow_dangerous_deserialization=False):
+        loads.append(path)
+        return SimpleNamespace(index=SimpleNamespace(ntotal=1, d=4))
+
+    monkeypatch.setattr(vectorstore, "FAISS", SimpleNamespace(load_local=load_local))
+    monkeypatch.setattr(vectorstore, "vectorstore_cache", VectorStoreCache(4))
+    redis.set("vectorstore:s1:path", str(tmp_path))
+    return loads
+
+
+def test_reuses_loaded_store_while_version_is_unchanged(session):
+    first = load_vectorstore("s1")
+
+    assert load_vectorstore("s1") is first
+    assert len(session) == 1
+
+
+def test_reloads_store_after_version_bump(redis, session):
+    first = load_vectorstore("s1")
+    redis.incr("vectorstore:s1:version")
+
+    second = load_vectorstore("s1")
+
+    assert second is not first
+    assert len(session) == 2
+    # 이전 버전은 캐시에서 제거
+    assert vectorstore.vectorstore_cache.stats()["size"] == 1
+    assert vectorstore.vectorstore_cache.invalidations == 1
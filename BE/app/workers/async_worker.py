@@ -0,0 +1,333 @@
+# 비동기 분류 워커 (하나의 프로세스에서 여러 LLM 호출을 동시에 실행)
+#
+# 실행: python -m app.workers.async_worker
+#
+# Celery prefork 워커는 LLM 응답을 기다리는 동안 프로세스 하나가 멈추므로 처리량이 프로세스 수에 묶입니다.
+# 이 워커는 Redis 큐에서 특허 단위 작업을 가져와 이벤트 루프에서 ainvoke로 동시에 실행합니다.
+# 진행률 키와 작업 완료 처리(classification_completion, evaluation_completion)는 Celery 태스크와 같습니다.
+#
+# 작업은 BLMOVE로 워커별 처리 중 목록에 옮겨 가져오고, 처리를 마치면 목록에서 지웁니다. (Celery의 ack와 같은 역할)
+# 워커가 처리 도중 종료되면 하트비트 키가 만료되고, 다른 워커(또는 다시 시작한 워커)가 그 워커의 처리 중 목록을 큐로 되돌립니다.
+# 같은 작업이 두 번 처리되어도 결과 저장과 남은 작업 수 차감은 위치마다 한 번만 반영합니다.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.concurrency import get_llm_provider
+from app.core.config import settings
+from app.core.redis import get_redis_client, redis_async_pool_client
+from app.tasks import (
+    ainvoke_classification,
+    build_evaluation_prompt,
+    classification_completion,
+    collect_evaluation_results,
+    evaluation_completion,
+    get_evaluator_llm,
+    get_fallback_llm,
+    get_hedge_llm,
+    get_llm_by_name,
+    is_rate_limit_error,
+    prepare_classification,
+    record_classification,
+    update_classification_progress,
+)
+from app.services.evaluation import FAILED_EVALUATION, aevaluate_with_llm
+from app.services.job_stats import increment_job_stat
+from app.services.pipeline import unclassified
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 특허 단위 작업 큐 (Redis 리스트)
+JOB_QUEUE = "classification:async_jobs"
+
+# 실행 중인 워커 ID 집합, 워커별 하트비트 키와 처리 중인 작업 목록
+WORKERS_KEY = "classification:async_workers"
+HEARTBEAT_KEY = "classification:async_worker:{worker_id}:heartbeat"
+PROCESSING_KEY = "classification:async_worker:{worker_id}:processing"
+
+# 하트비트 갱신 주기, 만료 시간 (만료되면 처리 중인 작업을 큐로 되돌림)
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TTL = 60
+
+# 결과를 저장하고 남은 작업 수를 차감 (같은 위치의 결과가 이미 있으면 차감하지 않고 남은 작업 수만 반환, 완료 처리되어 키가 없으면 -1)
+STORE_RESULT_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return redis.call('DECR', KEYS[2])
+end
+local pending = redis.call('GET', KEYS[2])
+if pending then
+    return tonumber(pending)
+end
+return -1
+"""
+
+# rate limit 에러 재시도 (Celery 태스크와 같은 횟수, 최대 대기 시간)
+MAX_RETRIES = 12
+MAX_RETRY_DELAY = 10
+
+# 캐시 확인, 임베딩, 벡터 검색 등 동기 단계를 실행하는 스레드 수
+PREPARE_THREADS = 32
+
+
+def get_job_key(session_id: str, LLM: str, isAdmin: bool) -> str:
+    return f"{session_id}:{LLM}" if isAdmin else session_id
+
+
+def enqueue_classification_jobs(session_id: str, LLM: str, isAdmin: bool, items: List[Dict[str, Any]]) -> None:
+    """
+    특허 단위 작업을 큐에 넣습니다. 남은 작업 수가 0이 되면 마지막 작업을 처리한 워커가 완료 처리를 실행합니다.
+    """
+    redis = get_redis_client()
+    key = get_job_key(session_id, LLM, isAdmin)
+
+    if not items:
+        if isAdmin:
+            evaluation_completion.delay([], LLM, session_id)
+        else:
+            classification_completion.delay([], session_id)
+        return
+
+    pipe = redis.pipeline()
+    pipe.delete(f"{key}:async_results")
+    pipe.set(f"{key}:async_pending", len(items), ex=86400)
+    pipe.lpush(JOB_QUEUE, *[
+        json.dumps({"session_id": session_id, "LLM": LLM, "isAdmin": isAdmin, "position": position, **item}, ensure_ascii=False)
+        for position, item in enumerate(items)
+    ])
+    pipe.execute()
+
+
+class AsyncClassificationWorker:
+    """
+    큐에서 작업을 가져와 최대 ASYNC_WORKER_CONCURRENCY건을 동시에 처리하고,
+    LLM 호출은 제공자별로 ASYNC_WORKER_PROVIDER_CONCURRENCY건까지 동시에 실행합니다.
+    (적응형 동시 호출 수 제어를 사용하면 그 한도가 더 작을 때 그 한도를 따름)
+    가져온 작업은 처리를 마칠 때까지 워커별 처리 중 목록에 남겨 두어, 워커가 종료되면 다른 워커가 큐로 되돌립니다.
+    """
+
+    def __init__(self, redis=None, worker_id: Optional[str] = None):
+        self.redis = redis or redis_async_pool_client
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = PROCESSING_KEY.format(worker_id=self.worker_id)
+        self.store_result = self.redis.register_script(STORE_RESULT_SCRIPT)
+        self.slots = asyncio.Semaphore(settings.ASYNC_WORKER_CONCURRENCY)
+        self.provider_slots: Dict[Optional[str], asyncio.Semaphore] = {}
+        self.running = set()
+        self.stopping = False
+
+    async def call_llm(self, llm: Any, session_id: str, call):
+        """
+        제공자별 동시 호출 수 안에서 LLM을 호출하고, rate limit 에러는 지수 백오프로 재시도합니다.
+        """
+        provider = get_llm_provider(llm)
+        if provider not in self.provider_slots:
+            self.provider_slots[provider] = asyncio.Semaphore(settings.ASYNC_WORKER_PROVIDER_CONCURRENCY)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.provider_slots[provider]:
+                    return await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == MAX_RETRIES:
+                    raise
+                delay = min(2 ** attempt, MAX_RETRY_DELAY) + random.uniform(0, 1)
+                logger.info(f"[{session_id}] {provider} rate limit 발생, {delay:.1f}초 후 재시도 ({attempt + 1}/{MAX_RETRIES})")
+                await asyncio.sleep(delay)
+
+    async def classify(self, job: Dict[str, Any]) -> Dict[str, str]:
+        session_id, LLM, isAdmin = job["session_id"], job["LLM"], job["isAdmin"]
+        application_number = job["application_number"]
+
+        classifications, docs, cache_key = await asyncio.to_thread(
+            prepare_classification,
+            LLM, session_id, job["patent_info"], application_number, isAdmin, job.get("context_key"), job.get("row_index"),
+        )
+        if classifications is not None:
+            return classifications
+
+        llm = get_llm_by_name(LLM)
+        hedge_llm = get_hedge_llm(LLM, isAdmin)
+        fallback_llm = get_fallback_llm(LLM, isAdmin)
+        stats_key = get_job_key(session_id, LLM, isAdmin)
+        try:
+            classifications, answered_by_llm = await self.call_llm(
+                llm,
+                session_id,
+                lambda: ainvoke_classification(
+                    llm, docs, job["patent_info"], application_number, session_id, hedge_llm, stats_key, fallback_llm
+                ),
+            )
+        except Exception as e:
+            logger.error(f"[{session_id}] 분류 결과 처리 중 오류 발생: {e}")
+            if isinstance(e, CircuitOpenError):
+                await asyncio.to_thread(increment_job_stat, stats_key, "circuit_rejected")
+            return unclassified(application_number)
+
+        # 대체 LLM, 헤징 LLM의 응답은 LLM의 결과 캐시에 저장하지 않음
+        await asyncio.to_thread(
+            record_classification, LLM, session_id, isAdmin, cache_key if answered_by_llm else None, classifications
+        )
+        return classifications
+
+    async def evaluate(self, job: Dict[str, Any], classification_result: Dict[str, str]) -> Dict[str, Any]:
+        # evaluate_classification_by_reasoning, collect_evaluation_results와 같은 키에 저장
+        session_id, LLM = job["session_id"], job["LLM"]
+        application_number = job["application_number"]
+        key = f"{session_id}:{LLM}"
+        await self.redis.hset(f"{key}:classifications", application_number, json.dumps(classification_result, ensure_ascii=False))
+
+        filled_prompt = await asyncio.to_thread(
+            build_evaluation_prompt,
+            session_id, job["patent_info"], classification_result, job.get("context_key"), job.get("row_index"),
+        )
+        evaluator = get_evaluator_llm()
+
+        try:
+            reasoning_result = await self.call_llm(
+                evaluator, session_id, lambda: aevaluate_with_llm(evaluator, filled_prompt, key)
+            )
+            await asyncio.to_thread(increment_job_stat, key, "evaluator_requests")
+        except Exception as e:
+            logger.error(f"[{session_id}] LLM 평가 중 오류 발생: {e}")
+            reasoning_result = dict(FAILED_EVALUATION)
+
+        await asyncio.to_thread(update_classification_progress, get_redis_client(), session_id, LLM, True)
+        return await asyncio.to_thread(collect_evaluation_results, reasoning_result, LLM, session_id, application_number)
+
+    async def fail_evaluation(self, job: Dict[str, Any], classification_result: Dict[str, str]) -> Dict[str, Any]:
+        # 처리에 실패한 특허도 분류 결과와 평가 실패(0점)를 저장해야 evaluation_completion에서 행과 결과가 어긋나지 않음
+        session_id, LLM = job["session_id"], job["LLM"]
+        application_number = job["application_number"]
+        try:
+            await self.redis.hset(f"{session_id}:{LLM}:classifications", application_number, json.dumps(classification_result, ensure_ascii=False))
+            return await asyncio.to_thread(collect_evaluation_results, dict(FAILED_EVALUATION), LLM, session_id, application_number)
+        except Exception as e:
+            logger.error(f"[{session_id}] 평가 실패 결과 저장 중 오류 발생: {e}")
+            return {"reasoning": dict(FAILED_EVALUATION)}
+
+    async def handle(self, job: Dict[str, Any]) -> None:
+        session_id, LLM, isAdmin = job["session_id"], job["LLM"], job["isAdmin"]
+        key = get_job_key(session_id, LLM, isAdmin)
+
+        classification_result: Optional[Dict[str, str]] = None
+        try:
+            classification_result = await self.classify(job)
+            result = await self.evaluate(job, classification_result) if isAdmin else classification_result
+        except Exception as e:
+            logger.error(f"[{key}] 작업 처리 중 오류 발생: {e}")
+            classification_result = classification_result or unclassified(job["application_number"])
+            result = await self.fail_evaluation(job, classification_result) if isAdmin else classification_result
+
+        pending = await self.store_result(
+            keys=[f"{key}:async_results", f"{key}:async_pending"],
+            args=[job["position"], json.dumps(result, ensure_ascii=False), 86400],
+        )
+
+        # 마지막 작업이면 완료 처리 (Celery chord 콜백과 같은 함수)
+        # 마지막 작업을 처리한 워커가 완료 처리 전에 종료되어 다시 전달된 경우도 남은 작업 수가 0이므로 완료 처리
+        if pending == 0:
+            await self.complete(session_id, LLM, isAdmin)
+
+    async def complete(self, session_id: str, LLM: str, isAdmin: bool) -> None:
+        key = get_job_key(session_id, LLM, isAdmin)
+        stored = await self.redis.hgetall(f"{key}:async_results")
+        results = [json.loads(stored[position]) for position in sorted(stored, key=int)]
+
+        logger.info(f"[{key}] 비동기 작업 완료, 결과 {len(results)}건")
+        if isAdmin:
+            await asyncio.to_thread(evaluation_completion, results, LLM, session_id)
+        else:
+            await asyncio.to_thread(classification_completion, results, session_id)
+
+        # 완료 처리 후 삭제 (완료 처리 전에 종료되면 다시 전달된 작업이 완료 처리)
+        await self.redis.delete(f"{key}:async_results", f"{key}:async_pending")
+
+    async def process(self, raw: str) -> None:
+        # 처리를 마치면(실패 포함) 처리 중 목록에서 지움
+        try:
+            await self.handle(json.loads(raw))
+        finally:
+            await self.redis.lrem(self.processing_key, 1, raw)
+
+    async def heartbeat(self) -> None:
+        await self.redis.set(HEARTBEAT_KEY.format(worker_id=self.worker_id), 1, ex=HEARTBEAT_TTL)
+        await self.redis.sadd(WORKERS_KEY, self.worker_id)
+
+    async def requeue_orphaned(self) -> int:
+        """
+        하트비트가 만료된 워커의 처리 중인 작업을 큐로 되돌리고, 되돌린 작업 수를 반환합니다.
+        """
+        requeued = 0
+        for worker_id in await self.redis.smembers(WORKERS_KEY):
+            if worker_id == self.worker_id or await self.redis.exists(HEARTBEAT_KEY.format(worker_id=worker_id)):
+                continue
+            processing_key = PROCESSING_KEY.format(worker_id=worker_id)
+            # 큐의 꺼내는 쪽(오른쪽)에 넣어 먼저 처리
+            while await self.redis.lmove(processing_key, JOB_QUEUE, "RIGHT", "RIGHT") is not None:
+                requeued += 1
+            await self.redis.srem(WORKERS_KEY, worker_id)
+        if requeued:
+            logger.warning(f"종료된 워커가 처리하던 작업 {requeued}건을 큐로 되돌림")
+        return requeued
+
+    async def keep_alive(self) -> None:
+        while not self.stopping:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.heartbeat()
+                await self.requeue_orphaned()
+            except Exception as e:
+                logger.error(f"하트비트 갱신 중 오류 발생: {e}")
+
+    def stop(self) -> None:
+        logger.info("종료 신호 수신, 진행 중인 작업을 마친 뒤 종료합니다.")
+        self.stopping = True
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=PREPARE_THREADS))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        logger.info(
+            f"비동기 분류 워커 {self.worker_id} 시작 (동시 처리 {settings.ASYNC_WORKER_CONCURRENCY}건, "
+            f"제공자별 LLM 호출 {settings.ASYNC_WORKER_PROVIDER_CONCURRENCY}건)"
+        )
+        await self.heartbeat()
+        await self.requeue_orphaned()
+        keep_alive = asyncio.create_task(self.keep_alive())
+
+        while not self.stopping:
+            await self.slots.acquire()
+            raw = await self.redis.blmove(JOB_QUEUE, self.processing_key, 1, "RIGHT", "LEFT")
+            if raw is None:
+                self.slots.release()
+                continue
+
+            task = asyncio.create_task(self.process(raw))
+            self.running.add(task)
+            task.add_done_callback(self.finish)
+
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+
+        # 정상 종료하면 처리 중인 작업이 없으므로 등록 해제
+        keep_alive.cancel()
+        await self.redis.srem(WORKERS_KEY, self.worker_id)
+        await self.redis.delete(HEARTBEAT_KEY.format(worker_id=self.worker_id), self.processing_key)
+
+    def finish(self, task: asyncio.Task) -> None:
+        self.running.discard(task)
+        self.slots.release()
+
+
+if __name__ == "__main__":
+    asyncio.run(AsyncClassificationWorker().run())
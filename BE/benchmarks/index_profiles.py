@@ -0,0 +1,141 @@
+"""
+분류 체계 인덱스 프로파일 벤치마크
+
+저장된 세션의 분류 체계 벡터로 프로파일별 인덱스를 만들고, 3072차원 float32 전체 검색(flat) 대비
+recall@k, 쿼리 당 검색 지연 시간, 검색에 사용하는 벡터/인덱스 크기를 출력합니다.
+
+사용 예 (BE 디렉터리에서 실행):
+    python -m benchmarks.index_profiles --vectorstore ./vectorstores/<session_id> --queries ./temp_data/<session_id>.npy
+    python -m benchmarks.index_profiles --synthetic 20000
+
+--queries를 지정하지 않으면 분류 체계 벡터에 잡음을 더한 벡터를 쿼리로 사용합니다.
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+import numpy as np
+from app.core.index_profile import PROFILES, IndexProfile
+from app.core.mmap_store import ANN_FILE, VECTORS_FILE, MmapVectorStore, export_native_store
+
+
+def load_taxonomy(path: str):
+    from langchain_community.vectorstores import FAISS
+    from app.core.embeddings import embeddings_openai
+    return FAISS.load_local(path, embeddings_openai, allow_dangerous_deserialization=True)
+
+
+def synthetic_taxonomy(count: int, dimensions: int, seed: int):
+    # 대분류 당 100개 내외의 하위 분류가 모여 있는 정규화된 임의 벡터
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from app.core.embeddings import embeddings_openai
+
+    rng = np.random.default_rng(seed)
+    roots = rng.normal(size=(max(1, count // 100), dimensions)).astype(np.float32)
+    root_of = rng.integers(0, len(roots), size=count)
+    vectors = roots[root_of] + 0.5 * rng.normal(size=(count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = faiss.IndexFlatL2(dimensions)
+    index.add(vectors)
+    documents = {
+        str(i): Document(page_content=str(i), metadata={"code": str(i), "level": "소분류", "grand_parent_code": f"H{root_of[i]}"})
+        for i in range(count)
+    }
+    return FAISS(embeddings_openai, index, InMemoryDocstore(documents), {i: str(i) for i in range(count)})
+
+
+def make_queries(vectordb, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = vectordb.index.reconstruct_n(0, vectordb.index.ntotal)
+    queries = vectors[rng.integers(0, len(vectors), size=count)]
+    queries = queries + noise * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+
+
+def store_bytes(store: MmapVectorStore) -> int:
+    # 검색 시 읽는 파일 크기 (벡터, FAISS 인덱스)
+    return sum(
+        os.path.getsize(store.file_path(filename))
+        for filename in (VECTORS_FILE, ANN_FILE)
+        if os.path.exists(store.file_path(filename))
+    )
+
+
+def run(vectordb, queries: np.ndarray, profiles: List[IndexProfile], k: int, branches: int) -> None:
+    print(f"분류 체계 {vectordb.index.ntotal}건, {vectordb.index.d}차원, 쿼리 {len(queries)}건, k={k}")
+
+    with tempfile.TemporaryDirectory() as root:
+        baseline_path = os.path.join(root, "baseline")
+        export_native_store(vectordb, baseline_path, PROFILES["flat"])
+        truth, _ = MmapVectorStore(baseline_path, None).search_matrix(queries, k)
+
+        print(f"{'profile':<14}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'size MB':>10}{'build s':>10}")
+        for profile in profiles:
+            path = os.path.join(root, profile.name)
+            started = time.perf_counter()
+            export_native_store(vectordb, path, profile)
+            build_seconds = time.perf_counter() - started
+
+            store = MmapVectorStore(path, None, branches=branches)
+            indices, latencies = [], []
+            for query in queries:
+                started = time.perf_counter()
+                if store.hierarchical:
+                    row, _ = store.search_branches(query, k)
+                else:
+                    row, _ = store.search_matrix(query, k)
+                    row = row[0]
+                latencies.append((time.perf_counter() - started) * 1000)
+                indices.append(row)
+
+            print(
+                f"{profile.name:<14}"
+                f"{recall_at_k(indices, truth):>10.4f}"
+                f"{np.percentile(latencies, 50):>10.3f}"
+                f"{np.percentile(latencies, 95):>10.3f}"
+                f"{store_bytes(store) / 2 ** 20:>10.1f}"
+                f"{build_seconds:>10.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="분류 체계 인덱스 프로파일 벤치마크")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--vectorstore", help="save_faiss_database로 저장된 세션 디렉터리")
+    source.add_argument("--synthetic", type=int, help="임의로 생성할 분류 체계 벡터 수")
+    parser.add_argument("--dimensions", type=int, default=3072, help="--synthetic 벡터 차원")
+    parser.add_argument("--queries", help="쿼리 임베딩 .npy 파일 (업로드 시 저장되는 특허 임베딩 행렬)")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.5, help="--queries가 없을 때 쿼리에 더할 잡음 크기")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--branches", type=int, default=0, help="계층 검색 대분류 개수 (0이면 사용 안 함)")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.vectorstore:
+        vectordb = load_taxonomy(args.vectorstore)
+    else:
+        vectordb = synthetic_taxonomy(args.synthetic, args.dimensions, args.seed)
+
+    if args.queries:
+        queries = np.load(args.queries, mmap_mode="r")[:args.num_queries].astype(np.float32)
+        queries = queries[np.linalg.norm(queries, axis=1) > 0]
+    else:
+        queries = make_queries(vectordb, args.num_queries, args.noise, args.seed)
+
+    run(vectordb, queries, [PROFILES[name] for name in args.profiles], args.k, args.branches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+분류 체인 구성 비용 벤치마크
+
+특허마다 출력 파서, 프롬프트 템플릿, 실행 체인을 새로 만들고 검색 결과를 포맷팅하던 방식과
+미리 만든 ClassificationPipeline(출력 형식 설명을 미리 계산, 분류 체계별 문자열 캐시)을 재사용하는 방식의
+특허 당 CPU 시간을 비교합니다. LLM은 고정된 응답을 반환하는 가짜 모델을 사용하므로 네트워크 시간은 포함되지 않습니다.
+
+사용 예 (BE 디렉터리에서 실행):
+    python -m benchmarks.pipeline_overhead --patents 2000 --taxonomy 5000
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import List
+import numpy as np
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnablePassthrough
+from app.core.mmap_store import MmapVectorStore, export_native_store
+from app.schemas.classification import ClassificationSchema
+from app.services.pipeline import (
+    CLASSIFICATION_TEMPLATE,
+    ClassificationPipeline,
+    format_docs,
+    parse_json_response,
+    to_classifications,
+)
+
+RESPONSE = json.dumps({
+    "majorCode": "A",
+    "majorTitle": "대분류",
+    "middleCode": "A01",
+    "middleTitle": "중분류",
+    "smallCode": "A0101",
+    "smallTitle": "소분류",
+}, ensure_ascii=False)
+
+
+def synthetic_taxonomy(count: int, dimensions: int, seed: int):
+    # 분류 체계와 비슷한 메타데이터(대분류 10개, 중분류 100개, 나머지 소분류)를 가진 임의 벡터
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from app.core.embeddings import embeddings_openai
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = faiss.IndexFlatL2(dimensions)
+    index.add(vectors)
+
+    documents = {}
+    for i in range(count):
+        major, middle = f"M{i % 10}", f"M{i % 10}-{i % 100:02d}"
+        if i < 10:
+            metadata = {"code": major, "name": f"대분류 {i}", "level": "대분류"}
+        elif i < 100:
+            metadata = {"code": middle, "name": f"중분류 {i}", "level": "중분류", "parent_code": major, "parent_name": f"대분류 {i % 10}"}
+        else:
+            metadata = {
+                "code": f"{middle}-{i}", "name": f"소분류 {i}", "level": "소분류",
+                "parent_code": middle, "parent_name": f"중분류 {i % 100}",
+                "grand_parent_code": major, "grand_parent_name": f"대분류 {i % 10}",
+            }
+        metadata["description"] = f"분류 {i}에 대한 설명입니다. " * 4
+        documents[str(i)] = Document(page_content=f"{metadata['name']} {metadata['description']}", metadata=metadata)
+    return FAISS(embeddings_openai, index, InMemoryDocstore(documents), {i: str(i) for i in range(count)})
+
+
+def legacy_classify(llm, docs: List[Document], patent_info: str, application_number: str):
+    # 특허마다 파서, 프롬프트, 체인을 새로 만들던 이전 방식
+    parser = PydanticOutputParser(pydantic_object=ClassificationSchema)
+    prompt = ChatPromptTemplate.from_template(CLASSIFICATION_TEMPLATE)
+    rag_chain = (
+        {
+            "context": lambda _: format_docs(docs),
+            "query": RunnablePassthrough(),
+            "format_instructions": lambda _: parser.get_format_instructions()
+        }
+        | prompt
+        | llm
+        | StrOutputParser()
+    )
+    return to_classifications(parse_json_response(rag_chain.invoke(patent_info)), application_number)
+
+
+def measure(label: str, fn, queries) -> float:
+    start = time.perf_counter()
+    for docs, patent_info in queries:
+        fn(docs, patent_info)
+    elapsed = time.perf_counter() - start
+    per_patent = elapsed / len(queries) * 1e6
+    print(f"{label:<28} {per_patent:>10.1f} us/특허 (총 {elapsed:.2f}초)")
+    return per_patent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="분류 체인 구성 비용 벤치마크")
+    parser.add_argument("--patents", type=int, default=2000, help="분류할 특허 수")
+    parser.add_argument("--taxonomy", type=int, default=5000, help="분류 체계 벡터 수")
+    parser.add_argument("--k", type=int, default=3, help="특허 당 검색 결과 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectordb = synthetic_taxonomy(args.taxonomy, 64, args.seed)
+    rng = np.random.default_rng(args.seed)
+    queries = []
+    for i in range(args.patents):
+        picks = rng.integers(0, args.taxonomy, size=args.k)
+        docs = [vectordb.docstore.search(str(int(j))) for j in picks]
+        queries.append((docs, f"특허명: 임의 특허 {i} 요약: " + "특허 요약 문장입니다. " * 20))
+
+    llm = FakeListChatModel(responses=[RESPONSE])
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        export_native_store(vectordb, path)
+        store = MmapVectorStore(path, None)
+        pipeline = ClassificationPipeline(llm, store)
+        print(f"분류 체계 {args.taxonomy}건 저장 및 분류 체인 생성: {time.perf_counter() - start:.2f}초 (작업 당 한 번)")
+
+        legacy = measure("특허마다 체인 생성", lambda docs, info: legacy_classify(llm, docs, info, "KR"), queries)
+        reused = measure("ClassificationPipeline 재사용", lambda docs, info: pipeline.classify(docs, info, "KR"), queries)
+        baseline = measure("LLM 호출만 (가짜 모델)", lambda docs, info: llm.invoke(info), queries)
+
+        print(
+            f"\n특허 당 체인 구성/포맷팅 비용: {legacy - baseline:.1f} us -> {reused - baseline:.1f} us "
+            f"({(legacy - reused) / max(legacy - baseline, 1e-9) * 100:.0f}% 감소)"
+        )
+
+
+if __name__ == "__main__":
+    main()